@@ -0,0 +1,49 @@
+"""
+Compares building a Model reaction by reaction with add_reaction_from_str against the bulk add_reactions_from_strs
+and add_reactions_from_tuples builders.
+"""
+
+import time
+
+from set_up_grasp_models.model.model import Model
+from set_up_grasp_models.model.parser import ReactionParser
+
+
+def make_rxn_strings(n_rxns: int, n_mets: int) -> list:
+    return [f'R_{i}: m_{i % n_mets} + 2 m_{(i * 7) % n_mets} <-> m_{(i * 13 + 1) % n_mets}' for i in range(n_rxns)]
+
+
+def build_one_by_one(rxn_strings: list) -> float:
+    start = time.perf_counter()
+    model = Model('bench')
+    for rxn_str in rxn_strings:
+        model.add_reaction_from_str(rxn_str, clear_tmp=False)
+    model.metabolite_reaction_lookup()
+    return time.perf_counter() - start
+
+
+def build_from_strs(rxn_strings: list) -> float:
+    start = time.perf_counter()
+    model = Model('bench')
+    model.add_reactions_from_strs(rxn_strings)
+    model.metabolite_reaction_lookup()
+    return time.perf_counter() - start
+
+
+def build_from_tuples(rxn_tuples: list) -> float:
+    start = time.perf_counter()
+    model = Model('bench')
+    model.add_reactions_from_tuples(rxn_tuples)
+    model.metabolite_reaction_lookup()
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = ReactionParser()
+    for n_rxns in [1000, 10000, 100000]:
+        rxn_strings = make_rxn_strings(n_rxns, n_rxns // 2)
+        rxn_tuples = [parser.parse_reaction(rxn_str) for rxn_str in rxn_strings]
+
+        print(f'{n_rxns} reactions: one by one {build_one_by_one(rxn_strings):.3f}s, '
+              f'bulk from strings {build_from_strs(rxn_strings):.3f}s, '
+              f'bulk from tuples {build_from_tuples(rxn_tuples):.3f}s')
@@ -0,0 +1,55 @@
+"""
+Compares the time to copy a Model with Model.copy() against a full deepcopy.
+Model.copy() shares the metabolites, reactions and compartments with the original model, so it only copies the
+containers. The elements are copied later, the first time they are accessed through the copy, which is timed
+separately: a knockout (remove a reaction and change another one) and a full pass over the copied reactions.
+"""
+
+import time
+from copy import deepcopy
+
+from set_up_grasp_models.model.model import Model
+
+
+def build_model(n_rxns: int, n_mets: int) -> Model:
+    model = Model('bench')
+    for i in range(n_rxns):
+        model.add_reaction_from_str(f'R_{i}: m_{i % n_mets} + m_{(i * 7) % n_mets} <-> m_{(i * 13 + 1) % n_mets}',
+                                    clear_tmp=False)
+    return model
+
+
+def time_per_copy(func, n_copies: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n_copies):
+        func()
+    return (time.perf_counter() - start) / n_copies
+
+
+def knockout(model: Model) -> Model:
+    model_copy = model.copy()
+    model_copy.remove_reaction('R_0')
+    model_copy.reactions['R_1'].reversible = False
+    return model_copy
+
+
+def copy_and_access_all(model: Model) -> Model:
+    model_copy = model.copy()
+    for reaction in model_copy.reactions.values():
+        pass
+    return model_copy
+
+
+if __name__ == '__main__':
+    n_copies = 20
+
+    for n_rxns in [1000, 5000, 10000]:
+        model = build_model(n_rxns, n_rxns // 2)
+
+        deepcopy_time = time_per_copy(lambda: deepcopy(model), n_copies)
+        copy_time = time_per_copy(model.copy, n_copies)
+        knockout_time = time_per_copy(lambda: knockout(model), n_copies)
+        access_time = time_per_copy(lambda: copy_and_access_all(model), n_copies)
+
+        print(f'{n_rxns:>6} reactions: deepcopy {deepcopy_time * 1e3:.2f} ms, Model.copy {copy_time * 1e3:.2f} ms, ' +
+              f'copy + knockout {knockout_time * 1e3:.2f} ms, copy + access all {access_time * 1e3:.2f} ms')
@@ -0,0 +1,54 @@
+"""
+Times interleaved edits and topology queries on a Model of increasing size.
+With incremental lookups the time per operation should stay roughly constant, i.e. total time should grow
+linearly with the number of operations.
+With read_matrix=True the sparse stoichiometric matrix is also read after every edit. Only the edited columns are
+rebuilt, but each read still copies the matrix arrays, so a read costs time proportional to the number of non-zero
+entries in the matrix (about 1 ms at 5000 reactions, against about 8 ms for a full rebuild). The time per operation
+should still stay constant as the number of operations grows.
+"""
+
+import random
+import time
+
+from set_up_grasp_models.model.model import Model
+
+
+def build_model(n_rxns: int, n_mets: int) -> Model:
+    model = Model('bench')
+    for i in range(n_rxns):
+        model.add_reaction_from_str(f'R_{i}: m_{i % n_mets} + m_{(i * 7) % n_mets} <-> m_{(i * 13 + 1) % n_mets}',
+                                    clear_tmp=False)
+    return model
+
+
+def run_mixed_ops(model: Model, n_ops: int, n_mets: int, seed: int = 0, read_matrix: bool = False) -> float:
+    rng = random.Random(seed)
+    start = time.perf_counter()
+
+    for i in range(n_ops):
+        op = i % 4
+        if op == 0:
+            model.add_reaction_from_str(f'NEW_{i}: m_{rng.randrange(n_mets)} <-> m_{rng.randrange(n_mets)}')
+        elif op == 1:
+            model.get_metabolite_producers(f'm_{rng.randrange(n_mets)}')
+        elif op == 2:
+            model.remove_reaction(f'NEW_{i - 2}')
+        else:
+            model.get_metabolite_reactions(f'm_{rng.randrange(n_mets)}')
+
+        if read_matrix and op in (0, 2):
+            model.sparse_stoichiometric_matrix()
+
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    n_mets = 2000
+    model = build_model(5000, n_mets)
+
+    for read_matrix in [False, True]:
+        label = 'with matrix reads' if read_matrix else 'without matrix reads'
+        for n_ops in [2500, 5000, 10000]:
+            elapsed = run_mixed_ops(model.copy(), n_ops, n_mets, read_matrix=read_matrix)
+            print(f'{n_ops:>6} mixed edits/queries {label}: {elapsed:.3f} s ({elapsed / n_ops * 1e6:.1f} us/op)')
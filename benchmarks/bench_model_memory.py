@@ -0,0 +1,29 @@
+"""
+Measures the memory held per metabolite and per reaction of a Model, using tracemalloc.
+"""
+
+import tracemalloc
+
+from set_up_grasp_models.model.model import Model
+
+
+def build_model(n_rxns: int, n_mets: int) -> Model:
+    model = Model('bench')
+    for i in range(n_rxns):
+        model.add_reaction_from_str(f'R_{i}: m_{i % n_mets} + m_{(i * 7) % n_mets} <-> m_{(i * 13 + 1) % n_mets}',
+                                    clear_tmp=False)
+    return model
+
+
+if __name__ == '__main__':
+    n_rxns = 20000
+    n_mets = 5000
+
+    tracemalloc.start()
+    model = build_model(n_rxns, n_mets)
+    model._parser = None
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f'{n_rxns} reactions, {n_mets} metabolites: {current / 1e6:.2f} MB ' +
+          f'({current / n_rxns:.0f} bytes per reaction, metabolites included)')
@@ -0,0 +1,45 @@
+"""
+Measures ReactionParser throughput, in reactions per second, for the regex and tokenizer modes on a 100k line
+plaintext model.
+"""
+
+import os
+import tempfile
+import time
+
+from set_up_grasp_models.model.parser import ReactionParser
+
+
+def write_model_file(filename: str, n_rxns: int, n_mets: int):
+    with open(filename, 'w') as f_out:
+        for i in range(n_rxns):
+            direction = '<->' if i % 3 else '-->'
+            f_out.write(f'R_{i}: m_{i % n_mets} + 2 m_{(i * 7) % n_mets} {direction} '
+                        f'0.5 m_{(i * 13 + 1) % n_mets} + m_{(i * 17 + 2) % n_mets} [-1000, 1000]\n')
+
+
+def run_parser(rxn_strings: list, mode: str, kind: str = None, n_repeats: int = 3) -> float:
+    parser = ReactionParser(mode=mode)
+    parse_reaction = parser.parse_reaction
+
+    best_time = float('inf')
+    for _ in range(n_repeats):
+        start = time.perf_counter()
+        for rxn_str in rxn_strings:
+            parse_reaction(rxn_str, kind=kind)
+        best_time = min(best_time, time.perf_counter() - start)
+
+    return len(rxn_strings) / best_time
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        model_file = os.path.join(tmp_dir, 'model.txt')
+        write_model_file(model_file, 100000, 20000)
+
+        with open(model_file, 'r') as f_in:
+            rxn_strings = [line.strip() for line in f_in]
+
+    for kind in [None, 'cb']:
+        for mode in ['regex', 'tokenizer']:
+            print(f'mode={mode}, kind={kind}: {run_parser(rxn_strings, mode, kind):,.0f} reactions/s')
@@ -0,0 +1,27 @@
+"""
+Times import_model_from_plaintext on a large plaintext model file with an increasing number of processes.
+"""
+
+import os
+import tempfile
+import time
+
+from set_up_grasp_models.io.plaintext import import_model_from_plaintext
+
+
+def write_model_file(filename: str, n_rxns: int, n_mets: int):
+    with open(filename, 'w') as f_out:
+        f_out.write('# combinatorial test model\n\n')
+        for i in range(n_rxns):
+            f_out.write(f'R_{i}: m_{i % n_mets} + 2 m_{(i * 7) % n_mets} <-> m_{(i * 13 + 1) % n_mets}  # rxn {i}\n')
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        model_file = os.path.join(tmp_dir, 'model.txt')
+        write_model_file(model_file, 300000, 50000)
+
+        for n_processes in [1, 2, 4, os.cpu_count()]:
+            start = time.perf_counter()
+            model = import_model_from_plaintext(model_file, n_processes=n_processes)
+            print(f'{n_processes} processes: {time.perf_counter() - start:.2f}s ({len(model.reactions)} reactions)')
@@ -0,0 +1,47 @@
+"""
+Compares the dense (SVD) and sparse (lsqr) solvers used by RobustFluxFactorization, to check the number of unknown
+reactions above which solver='auto' switches to the sparse solver (SPARSE_SOLVER_MIN_RXNS).
+"""
+
+import time
+
+import numpy as np
+
+from set_up_grasp_models.check_models.thermodynamics_checks import RobustFluxFactorization, SPARSE_SOLVER_MIN_RXNS
+
+
+def build_stoic_matrix(n_rxns: int, n_meas: int, seed: int = 0) -> tuple:
+    """
+    Builds a random network with the sparsity of a metabolic network, i.e. 2 to 4 metabolites per reaction, with
+    slightly fewer balanced metabolites than unknown reactions.
+    """
+
+    rng = np.random.default_rng(seed)
+    n_mets = n_rxns - n_meas - n_rxns // 20
+
+    stoic_matrix = np.zeros((n_mets, n_rxns))
+    for rxn_i in range(n_rxns):
+        met_ind = rng.choice(n_mets, size=rng.integers(2, 5), replace=False)
+        stoic_matrix[met_ind, rxn_i] = rng.choice([-2, -1, 1, 2], size=len(met_ind))
+
+    id_meas = np.zeros(n_rxns, dtype=bool)
+    id_meas[rng.choice(n_rxns, size=n_meas, replace=False)] = True
+
+    return stoic_matrix, id_meas
+
+
+if __name__ == '__main__':
+    print(f'SPARSE_SOLVER_MIN_RXNS = {SPARSE_SOLVER_MIN_RXNS}')
+
+    for n_rxns in [250, 500, 1000, 2000, 3000]:
+        for n_meas in [10, 50]:
+            stoic_matrix, id_meas = build_stoic_matrix(n_rxns, n_meas)
+
+            times = {}
+            for solver in ['dense', 'sparse']:
+                start = time.perf_counter()
+                RobustFluxFactorization(stoic_matrix, id_meas, solver=solver)
+                times[solver] = time.perf_counter() - start
+
+            print(f'{n_rxns - n_meas:>5} unknown and {n_meas:>3} measured reactions: dense {times["dense"]:.3f} s, ' +
+                  f'sparse {times["sparse"]:.3f} s')
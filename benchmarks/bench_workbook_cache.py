@@ -0,0 +1,33 @@
+"""
+Compares reading a GRASP workbook with pd.read_excel against read_workbook with a warm cache.
+"""
+
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from set_up_grasp_models.io.workbook import read_workbook
+
+TEST_FILE = os.path.join('set_up_grasp_models', 'tests', 'test_files', 'test_check_models', 'HMP2360_r0_t0.xlsx')
+
+
+def time_call(func, n_repeats: int = 5) -> float:
+    best_time = float('inf')
+    for _ in range(n_repeats):
+        start = time.perf_counter()
+        func()
+        best_time = min(best_time, time.perf_counter() - start)
+    return best_time
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as cache_dir:
+        read_workbook(TEST_FILE, sheet_name=None, index_col=0, cache_dir=cache_dir)
+
+        excel_time = time_call(lambda: pd.read_excel(TEST_FILE, sheet_name=None, index_col=0))
+        cache_time = time_call(lambda: read_workbook(TEST_FILE, sheet_name=None, index_col=0, cache_dir=cache_dir))
+
+    print(f'pd.read_excel: {excel_time * 1000:.1f} ms, cached read_workbook: {cache_time * 1000:.1f} ms '
+          f'({excel_time / cache_time:.0f}x faster)')
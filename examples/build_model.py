@@ -1,6 +1,6 @@
 from set_up_grasp_models.set_up_models.set_up_model import set_up_model
 from set_up_grasp_models.check_models.mass_balance_checks import check_flux_balance
-import pandas as pd
+from set_up_grasp_models.io.workbook import read_workbook
 import os
 
 
@@ -17,7 +17,7 @@ def generate_base_model():
 def check_fluxes():
 
     file_in = os.path.join('models', 'model_v1_manual3.xlsx')
-    data_dict = pd.read_excel(file_in, sheet_name=None, index_col=0)
+    data_dict = read_workbook(file_in, sheet_name=None, index_col=0)
     check_flux_balance(data_dict)
 
 
@@ -1,6 +1,6 @@
 import os
 
-import pandas as pd
+from set_up_grasp_models.io.workbook import read_workbook
 from set_up_grasp_models.check_models.format_checks import check_met_rxn_order, check_kinetics_met_separators, \
     check_rxn_mechanism_order, check_kinetics_subs_prod_order
 from set_up_grasp_models.check_models.thermodynamics_checks import check_thermodynamic_feasibility
@@ -10,7 +10,7 @@ from set_up_grasp_models.set_up_models.manipulate_model import rename_columns
 
 # import the model
 file_in = os.path.join('models', 'HMP2360_r0_t0.xlsx')
-data_dict = pd.read_excel(file_in, sheet_name=None, index_col=0)
+data_dict = read_workbook(file_in, sheet_name=None, index_col=0)
 
 rename_columns(data_dict, file_out=file_in)
 
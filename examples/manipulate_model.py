@@ -1,6 +1,6 @@
 import os
 
-import pandas as pd
+from set_up_grasp_models.io.workbook import read_workbook
 
 from set_up_grasp_models.set_up_models.manipulate_model import remove_spaces, reorder_reactions, rename_columns
 
@@ -10,7 +10,7 @@ rxn_list = ['TPH', 'DDC', 'AANAT', 'ASMT', 'DDC_tryptm', 'AANAT_tryptm', 'IN_trp
             'EX_trp', 'EX_fivehtp', 'EX_nactsertn', 'EX_meltn', 'EX_nactryptm', 'EX_srtn']
 
 # path to current model
-data_dict = pd.read_excel(os.path.join('models', 'HMP2360_r0_t0_mech_order.xlsx'),
+data_dict = read_workbook(os.path.join('models', 'HMP2360_r0_t0_mech_order.xlsx'),
                           sheet_name=None, index_col=0)
 
 # path to the model with re-ordered reactions
@@ -1,3 +1,5 @@
+import numpy as np
+
 
 def check_flux_balance(data_dict: dict) -> bool:
     """
@@ -22,18 +24,17 @@ def check_flux_balance(data_dict: dict) -> bool:
 
     if len(stoic_df.index) == len(flux_df.index):
 
-        met_in_rxns = dict()
-        for col in stoic_df.columns:
-            rxn_list = stoic_df.loc[stoic_df[col].ne(0), col]
-            met_in_rxns[col] = rxn_list.to_dict()
+        stoic_matrix = stoic_df.values
 
         balanced_mets = set(mets_df.loc[mets_df['balanced?'].eq(1), 'balanced?'].index.values)
 
         mean_col = flux_df.columns[0]
+        fluxes = flux_df.loc[stoic_df.index, mean_col].values
 
-        for met in met_in_rxns.keys():
+        for met_i, met in enumerate(stoic_df.columns):
 
-            flux_balance = sum([met_in_rxns[met][key] * flux_df.loc[key, mean_col] for key in met_in_rxns[met].keys()])
+            rxn_ind = np.nonzero(stoic_matrix[:, met_i])[0]
+            flux_balance = sum(stoic_matrix[rxn_ind, met_i] * fluxes[rxn_ind])
 
             if abs(flux_balance) > 10**-8 and met in balanced_mets:
                 print(f'The flux for {met} is not balanced. The difference in flux is {flux_balance}')
@@ -74,8 +75,11 @@ def check_balanced_metabolites(data_dict: dict) -> bool:
     stoic_df = data_dict['stoic']
     mets_df = data_dict['mets']
 
+    is_produced = (stoic_df.values > 0).any(axis=0)
+    is_consumed = (stoic_df.values < 0).any(axis=0)
+
     for i, met in enumerate(stoic_df.columns):
-        if stoic_df[met].gt(0).any() and stoic_df[met].lt(0).any():
+        if is_produced[i] and is_consumed[i]:
             if mets_df['balanced?'][i] == 0:
                 print(f'{met} is marked as not balanced but it seems to be balanced.')
                 flag = True
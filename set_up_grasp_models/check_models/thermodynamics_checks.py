@@ -1,37 +1,47 @@
+import hashlib
+import warnings
+from collections import OrderedDict
+from typing import Iterator, NamedTuple
+
 import numpy as np
 import pandas as pd
+from scipy import sparse
+from scipy.sparse.linalg import lsqr
+from scipy.special import ndtr, ndtri
 
+DG_SAMPLING_DISTRIBUTIONS = ('log-uniform', 'normal')
+ROBUST_FLUX_SOLVERS = ('auto', 'dense', 'sparse')
+# below this many unknown reactions one dense SVD is faster than one lsqr run per measured reaction, even for only a
+# handful of measured reactions (see benchmarks/bench_robust_fluxes.py)
+SPARSE_SOLVER_MIN_RXNS = 2000
+# lsqr stop codes for a converged solution: x = 0, Ax = b, least squares, and the last two at machine precision
+LSQR_CONVERGED = (0, 1, 2, 4, 5)
+MAX_CACHED_FACTORIZATIONS = 16
 
-def _get_dG_list(rxn_names: list, stoic_matrix: np.ndarray, sub_conc: np.ndarray, prod_conc: np.ndarray,
-                 dG_std: np.ndarray, gas_constant: float, temperature: float) -> tuple:
-
-    dG_list = []
-    dG_Q_list = []
-    ma_ratio_list = []
-
-    for rxn_i in range(len(rxn_names)):
+_robust_flux_factorizations = OrderedDict()
 
-        rxn_subs_conc = np.sign(stoic_matrix[rxn_i, :]) * (sub_conc ** np.abs(stoic_matrix[rxn_i, :]))
-        rxn_prods_conc = np.sign(stoic_matrix[rxn_i, :]) * (prod_conc ** np.abs(stoic_matrix[rxn_i, :]))
 
-        subs_ind = np.where(rxn_subs_conc < 0)
-        subs_conc = rxn_subs_conc[subs_ind]
-        prods_ind = np.where(rxn_prods_conc > 0)
-        prods_conc = rxn_prods_conc[prods_ind]
-
-        subs_prod = np.abs(np.prod(subs_conc))
-        prods_prod = np.prod(prods_conc)
+def _get_ln_ma_ratios(stoic_matrix: sparse.csr_matrix, sub_conc: np.ndarray, prod_conc: np.ndarray) -> np.ndarray:
+    """
+    Computes the natural logarithm of the mass-action ratio of all reactions in one go, as ln(Q) = S⁻·ln(c_subs) +
+    S⁺·ln(c_prods), where S⁻ and S⁺ are the substrate and product parts of the stoichiometric matrix.
+    Working in log space avoids the underflow of products of small concentrations for large stoichiometries, and only
+    the non-zero stoichiometric coefficients are visited.
+    Metabolites with a concentration of 0 (i.e. not set) are left out of the mass-action ratio.
 
-        ma_ratio = prods_prod / subs_prod
+    Args:
+        stoic_matrix: sparse stoichiometric matrix with reactions as rows and metabolites as columns.
+        sub_conc: substrate concentrations, either a vector or a matrix with one column per case.
+        prod_conc: product concentrations, with the same shape as sub_conc.
 
-        dG_Q = gas_constant * temperature * np.log(ma_ratio)
-        dG = dG_std[rxn_i] + dG_Q
+    Returns:
+        ln(Q) for each reaction, a vector or a matrix with one column per case.
+    """
 
-        ma_ratio_list.append(ma_ratio)
-        dG_list.append(dG)
-        dG_Q_list.append(dG_Q)
+    ln_sub_conc = np.log(sub_conc, out=np.zeros(sub_conc.shape), where=sub_conc > 0)
+    ln_prod_conc = np.log(prod_conc, out=np.zeros(prod_conc.shape), where=prod_conc > 0)
 
-    return dG_list, dG_Q_list, ma_ratio_list
+    return stoic_matrix.minimum(0) @ ln_sub_conc + stoic_matrix.maximum(0) @ ln_prod_conc
 
 
 def calculate_dG(data_dict: dict, gas_constant: float, temperature: float, rxn_order: list = None) -> tuple:
@@ -50,10 +60,6 @@ def calculate_dG(data_dict: dict, gas_constant: float, temperature: float, rxn_o
         Mass action ratio dataframe, dG_Q dataframe, Gibbs energies dataframe.
     """
 
-    dG_Q_df = pd.DataFrame()
-    dG_df = pd.DataFrame()
-    ma_df = pd.DataFrame()
-
     stoic_df = data_dict['stoic']
 
     mets_conc_df = data_dict['thermoMets']
@@ -64,34 +70,25 @@ def calculate_dG(data_dict: dict, gas_constant: float, temperature: float, rxn_o
 
     rxn_names = stoic_df.index.values
 
-    stoic_matrix = stoic_df.values
+    stoic_matrix = sparse.csr_matrix(stoic_df.values)
 
     min_met_conc = mets_conc_df['min (M)'].values
     max_met_conc = mets_conc_df['max (M)'].values
+    mean_met_conc = mets_conc_df['mean (M)'].values
+
+    # the min, mean and max cases are the columns of a single product with the stoichiometric matrix, for the min dG
+    # substrates are at their max concentration and products at their min, and the other way around for the max dG
+    ln_ma_ratios = _get_ln_ma_ratios(stoic_matrix, np.column_stack([max_met_conc, mean_met_conc, min_met_conc]),
+                                     np.column_stack([min_met_conc, mean_met_conc, max_met_conc]))
+    dG_Qs = gas_constant * temperature * ln_ma_ratios
+    dGs = dG_Qs + np.column_stack([dG_std_df['∆Gr\'_min (kJ/mol)'].values, dG_std_df['∆Gr_mean'].values,
+                                   dG_std_df['∆Gr\'_max (kJ/mol)'].values])
 
-    dG_list_mean, dG_Q_list_mean, ma_ratio_list_mean = _get_dG_list(rxn_names, stoic_matrix,
-                                                                    mets_conc_df['mean (M)'].values,
-                                                                    mets_conc_df['mean (M)'].values,
-                                                                    dG_std_df['∆Gr_mean'].values,
-                                                                    gas_constant, temperature)
-    dG_list_min, dG_Q_list_min, ma_ratio_list_min = _get_dG_list(rxn_names, stoic_matrix, max_met_conc, min_met_conc,
-                                                                 dG_std_df['∆Gr\'_min (kJ/mol)'].values,
-                                                                 gas_constant, temperature)
-    dG_list_max, dG_Q_list_max, ma_ratio_list_max = _get_dG_list(rxn_names, stoic_matrix, min_met_conc, max_met_conc,
-                                                                 dG_std_df['∆Gr\'_max (kJ/mol)'].values,
-                                                                 gas_constant, temperature)
-
-    ma_df['ma_min'] = ma_ratio_list_min
-    ma_df['ma_mean'] = ma_ratio_list_mean
-    ma_df['ma_max'] = ma_ratio_list_max
-
-    dG_Q_df['∆G_Q_min'] = dG_Q_list_min
-    dG_Q_df['∆G_Q_mean'] = dG_Q_list_mean
-    dG_Q_df['∆G_Q_max'] = dG_Q_list_max
-
-    dG_df['∆G_min'] = dG_list_min
-    dG_df['∆G_mean'] = dG_list_mean
-    dG_df['∆G_max'] = dG_list_max
+    with np.errstate(over='ignore'):
+        ma_df = pd.DataFrame(np.exp(ln_ma_ratios), columns=['ma_min', 'ma_mean', 'ma_max'])
+
+    dG_Q_df = pd.DataFrame(dG_Qs, columns=['∆G_Q_min', '∆G_Q_mean', '∆G_Q_max'])
+    dG_df = pd.DataFrame(dGs, columns=['∆G_min', '∆G_mean', '∆G_max'])
 
     ma_df.index = rxn_names
     dG_Q_df.index = rxn_names
@@ -105,51 +102,401 @@ def calculate_dG(data_dict: dict, gas_constant: float, temperature: float, rxn_o
     return ma_df, dG_Q_df, dG_df
 
 
-def _compute_robust_fluxes(stoic_matrix: np.ndarray, meas_rates: np.ndarray, meas_rates_std: np.ndarray,
-                           rxn_list: list) -> tuple:
-
-    # Determine measured fluxes and decompose stoichiometric matrix
-    id_meas = np.where(meas_rates != 0)
-    id_unkn = np.where(meas_rates == 0)
-
-    stoic_meas = stoic_matrix[:, id_meas]
-    stoic_meas = np.array([row[0] for row in stoic_meas])
-
-    stoic_unkn = stoic_matrix[:, id_unkn]
-    stoic_unkn = np.array([row[0] for row in stoic_unkn])
-
-    # Initialize final fluxes
-    v_mean = np.zeros(np.size(meas_rates))
-    v_std = np.zeros(np.size(meas_rates))
-
-    # Compute estimate Rred
-    Dm = np.diag(meas_rates_std[id_meas] ** 2)
-    Rred = np.subtract(stoic_meas, np.matmul(np.matmul(stoic_unkn, np.linalg.pinv(stoic_unkn)), stoic_meas))
-    [u, singVals, vh] = np.linalg.svd(Rred)
-    singVals = np.abs(singVals)
-    zero_sing_vals = np.where(singVals > 10 ** -12)
-
-    # If the system is fully determined, compute as follows
-    if len(zero_sing_vals[0]) == 0:
-        v_mean[id_unkn] = -np.matmul(np.matmul(np.linalg.pinv(stoic_unkn), stoic_meas), meas_rates[id_meas])
-        if len(np.where(v_mean == 0)[0]) > len(id_meas[0]):
-            zero_flux_rxns = list(set(np.where(v_mean == 0)[0]).difference(set(id_meas[0])))
-            raise RuntimeError('According to compute robust fluxes, there are reactions with zero flux in the model.\n'+
-                                'Those reactions should be removed.\n' +
-                                f'The reactions are {np.array(rxn_list)[[zero_flux_rxns]]}')
-
-        v_mean[np.where(v_mean == 0)] = meas_rates[id_meas]
-        v_std[id_unkn] = np.diag(np.matmul(
-            np.matmul(np.matmul(np.matmul(np.linalg.pinv(stoic_unkn), stoic_meas), Dm), np.transpose(stoic_meas)),
-            np.transpose(np.linalg.pinv(stoic_unkn))))
-        v_std[np.where(v_std == 0)] = np.diag(Dm)
+def calculate_dG_batch(data_dict: dict, min_met_conc: np.ndarray, max_met_conc: np.ndarray, gas_constant: float,
+                       temperature: float) -> tuple:
+    """
+    Given a dictionary representing a GRASP input file, calculates the minimum and maximum reaction dGs for many sets
+    of metabolite concentration bounds at once, based on the network in stoic and the standard dGs in thermoRxns.
+    The stoichiometric matrix is only set up once, and the dGs of all scenarios come out of a single sparse matrix
+    product per bound. As in calculate_dG, metabolites with a concentration of 0 are left out.
+
+    Args:
+        data_dict: a dictionary that represents the excel file with the GRASP model.
+        min_met_conc: array with shape (number of scenarios, number of metabolites) with the minimum metabolite
+                      concentrations, with metabolites in the order of the stoic sheet columns.
+        max_met_conc: array with the maximum metabolite concentrations, with the same shape as min_met_conc.
+        gas_constant: the gas constant to calculate the Gibbs energy.
+        temperature: the temperature to calculate the Gibbs energy.
+
+    Returns:
+        Two arrays with shape (number of scenarios, number of reactions) with the minimum and maximum Gibbs energies,
+        with reactions in the order of the stoic sheet.
+    """
+
+    stoic_df = data_dict['stoic']
+    dG_std_df = data_dict['thermoRxns'].reindex(stoic_df.index)
+
+    min_met_conc = np.atleast_2d(np.asarray(min_met_conc, dtype=float))
+    max_met_conc = np.atleast_2d(np.asarray(max_met_conc, dtype=float))
+
+    if min_met_conc.shape != max_met_conc.shape or min_met_conc.shape[1] != len(stoic_df.columns):
+        raise ValueError('The concentration bounds must both have shape (number of scenarios, ' +
+                         f'{len(stoic_df.columns)}), got {min_met_conc.shape} and {max_met_conc.shape}.')
+
+    stoic_matrix = sparse.csr_matrix(stoic_df.values)
+
+    # for the min dG substrates are at their max concentration and products at their min, and the other way around
+    dG_Q_min = gas_constant * temperature * _get_ln_ma_ratios(stoic_matrix, max_met_conc.T, min_met_conc.T).T
+    dG_Q_max = gas_constant * temperature * _get_ln_ma_ratios(stoic_matrix, min_met_conc.T, max_met_conc.T).T
+
+    return dG_std_df['∆Gr\'_min (kJ/mol)'].values + dG_Q_min, dG_std_df['∆Gr\'_max (kJ/mol)'].values + dG_Q_max
+
+
+def check_thermodynamic_feasibility_batch(data_dict: dict, min_met_conc: np.ndarray, max_met_conc: np.ndarray,
+                                          fluxes: np.ndarray, gas_constant: float = 8.314 * 10**-3,
+                                          temperature: float = 298) -> np.ndarray:
+    """
+    Same check as check_thermodynamic_feasibility, but for many scenarios (e.g. samples or strains) on the same
+    network at once and without printing: a reaction is infeasible in a scenario if its flux is positive and its
+    minimum dG is positive, or if its flux is negative and its maximum dG is negative.
+
+    Args:
+        data_dict: a dictionary that represents the excel file with the GRASP model.
+        min_met_conc: array with shape (number of scenarios, number of metabolites) with the minimum metabolite
+                      concentrations, with metabolites in the order of the stoic sheet columns.
+        max_met_conc: array with the maximum metabolite concentrations, with the same shape as min_met_conc.
+        fluxes: array with shape (number of scenarios, number of reactions) with the fluxes, with reactions in the
+                order of the stoic sheet.
+        gas_constant: the gas constant to calculate the Gibbs energy.
+        temperature: the temperature to calculate the Gibbs energy.
+
+    Returns:
+        Boolean array with shape (number of scenarios, number of reactions) that is True where the flux and the Gibbs
+        energy range are compatible.
+    """
+
+    dG_min, dG_max = calculate_dG_batch(data_dict, min_met_conc, max_met_conc, gas_constant, temperature)
+
+    fluxes = np.atleast_2d(np.asarray(fluxes, dtype=float))
+    if fluxes.shape != dG_min.shape:
+        raise ValueError(f'The fluxes must have shape {dG_min.shape}, got {fluxes.shape}.')
+
+    return ~(((fluxes > 0) & (dG_min > 0)) | ((fluxes < 0) & (dG_max < 0)))
+
+
+def _get_dG_sampling_params(data_dict: dict, distribution: str) -> tuple:
+    """
+    Gets the parameters of the distributions the metabolite concentrations and standard Gibbs energies are sampled
+    from, based on the ranges in thermoMets and thermoRxns. These ranges are set up as mean ± 2 standard deviations, so
+    for normal sampling the mean is the middle of the range and the standard deviation a quarter of its width.
+    Metabolites with a concentration of 0 (i.e. not set) are left out, as in calculate_dG.
+
+    Args:
+        data_dict: a dictionary that represents the excel file with the GRASP model.
+        distribution: either 'log-uniform' or 'normal'.
+
+    Returns:
+        Sparse stoichiometric matrix of the reactions and sampled metabolites, the lower bounds (or means) and the upper
+        bounds (or standard deviations) of the log concentrations (or concentrations) of the sampled metabolites, and of
+        the standard Gibbs energies.
+    """
+
+    stoic_df = data_dict['stoic']
+    mets_conc_df = data_dict['thermoMets']
+    dG_std_df = data_dict['thermoRxns'].reindex(stoic_df.index)
+
+    min_met_conc = mets_conc_df['min (M)'].values.astype(float)
+    max_met_conc = mets_conc_df['max (M)'].values.astype(float)
+    min_dG_std = dG_std_df['∆Gr\'_min (kJ/mol)'].values.astype(float)
+    max_dG_std = dG_std_df['∆Gr\'_max (kJ/mol)'].values.astype(float)
+
+    sampled_mets = (min_met_conc > 0) & (max_met_conc > 0)
+    stoic_matrix = sparse.csr_matrix(stoic_df.values[:, sampled_mets].astype(float))
+    min_met_conc = min_met_conc[sampled_mets]
+    max_met_conc = max_met_conc[sampled_mets]
+
+    if distribution == 'log-uniform':
+        return stoic_matrix, (np.log(min_met_conc), np.log(max_met_conc)), (min_dG_std, max_dG_std)
+
+    return stoic_matrix, ((min_met_conc + max_met_conc) / 2., (max_met_conc - min_met_conc) / 4.), \
+        ((min_dG_std + max_dG_std) / 2., (max_dG_std - min_dG_std) / 4.)
+
+
+def sample_dGs(data_dict: dict, gas_constant: float, temperature: float, n_samples: int,
+               distribution: str = 'log-uniform', chunk_size: int = 1000, seed: int = None) -> Iterator[np.ndarray]:
+    """
+    Given a dictionary representing a GRASP input file, samples metabolite concentrations and standard Gibbs energies
+    within the ranges in thermoMets and thermoRxns, and calculates the respective reaction Gibbs energies.
+
+    The samples are drawn either:
+     - 'log-uniform': concentrations uniformly in log space and standard Gibbs energies uniformly, within the ranges.
+     - 'normal': both from a normal distribution with the mean and standard deviation the ranges were set up from
+       (mean ± 2 standard deviations), with concentrations truncated at zero.
+
+    The samples are generated and returned in chunks, so that memory use is bounded by chunk_size, not n_samples. The
+    Gibbs energies of a chunk are computed as ∆G = ∆G°' + RT·S·ln(c), with a single sparse matrix product.
+    Concentrations and standard Gibbs energies are drawn from two independent random streams spawned from the seed, so
+    for a given seed the samples are the same whatever the chunk_size.
+
+    Args:
+        data_dict: a dictionary that represents the excel file with the GRASP model.
+        gas_constant: the gas constant to calculate the Gibbs energy.
+        temperature: the temperature to calculate the Gibbs energy.
+        n_samples: total number of samples.
+        distribution: either 'log-uniform' or 'normal'.
+        chunk_size: number of samples in each chunk.
+        seed: seed for the random number generator.
+
+    Returns:
+        Generator of numpy arrays with shape (number of samples in the chunk, number of reactions), with reactions in
+        the order of the stoic sheet.
+    """
+
+    if distribution not in DG_SAMPLING_DISTRIBUTIONS:
+        raise ValueError(f'Invalid distribution "{distribution}". It must be one of {DG_SAMPLING_DISTRIBUTIONS}.')
+
+    met_rng, dG_rng = [np.random.default_rng(seed_seq) for seed_seq in np.random.SeedSequence(seed).spawn(2)]
+    stoic_matrix, met_params, dG_std_params = _get_dG_sampling_params(data_dict, distribution)
+    n_mets = stoic_matrix.shape[1]
+    n_rxns = stoic_matrix.shape[0]
+
+    for chunk_start in range(0, n_samples, chunk_size):
+        n_chunk = min(chunk_size, n_samples - chunk_start)
+
+        if distribution == 'log-uniform':
+            ln_met_conc = met_rng.uniform(met_params[0], met_params[1], size=(n_chunk, n_mets))
+            dG_stds = dG_rng.uniform(dG_std_params[0], dG_std_params[1], size=(n_chunk, n_rxns))
+        else:
+            # inverse transform sampling of the normal distribution truncated at zero concentration
+            with np.errstate(divide='ignore', invalid='ignore'):
+                lower_cdf = ndtr(np.where(met_params[1] > 0, -met_params[0] / met_params[1], -np.inf))
+            met_conc = met_params[0] + met_params[1] * ndtri(met_rng.uniform(lower_cdf, 1, size=(n_chunk, n_mets)))
+            ln_met_conc = np.log(met_conc)
+            dG_stds = dG_rng.normal(dG_std_params[0], dG_std_params[1], size=(n_chunk, n_rxns))
+
+        yield dG_stds + gas_constant * temperature * (stoic_matrix @ ln_met_conc.T).T
+
+
+def get_dG_probabilities(data_dict: dict, gas_constant: float, temperature: float, n_samples: int = 10000,
+                         distribution: str = 'log-uniform', chunk_size: int = 1000, seed: int = None,
+                         flux_df: pd.DataFrame = None, rxn_order: list = None) -> pd.DataFrame:
+    """
+    Given a dictionary representing a GRASP input file, estimates for each reaction the mean and standard deviation of
+    the Gibbs energy, and the probability that it is negative or positive, from Monte Carlo samples (see sample_dGs).
+    Only running sums are kept between chunks.
+
+    Args:
+        data_dict: a dictionary that represents the excel file with the GRASP model.
+        gas_constant: the gas constant to calculate the Gibbs energy.
+        temperature: the temperature to calculate the Gibbs energy.
+        n_samples: total number of samples.
+        distribution: either 'log-uniform' or 'normal'.
+        chunk_size: number of samples in each chunk.
+        seed: seed for the random number generator.
+        flux_df: dataframe with the fluxes in the column 'vref_mean (mmol/L/h)' (optional), if given the probability
+                 that the Gibbs energy sign is compatible with the flux direction is also computed.
+        rxn_order: a list with the reactions order (optional).
+
+    Returns:
+        Dataframe with the columns '∆G_mean', '∆G_std', 'P(∆G<0)', 'P(∆G>0)' and, if flux_df is given,
+        'P(feasible)', which is NaN for reactions with zero flux.
+    """
+
+    rxn_names = data_dict['stoic'].index.values
+
+    dG_sum = np.zeros(len(rxn_names))
+    dG_sq_sum = np.zeros(len(rxn_names))
+    n_negative = np.zeros(len(rxn_names))
+    n_positive = np.zeros(len(rxn_names))
+
+    for dGs in sample_dGs(data_dict, gas_constant, temperature, n_samples, distribution=distribution,
+                          chunk_size=chunk_size, seed=seed):
+        dG_sum += dGs.sum(axis=0)
+        dG_sq_sum += (dGs ** 2).sum(axis=0)
+        n_negative += (dGs < 0).sum(axis=0)
+        n_positive += (dGs > 0).sum(axis=0)
+
+    dG_mean = dG_sum / n_samples
+    dG_var = np.maximum(dG_sq_sum / n_samples - dG_mean ** 2, 0)
+
+    dG_prob_df = pd.DataFrame({'∆G_mean': dG_mean, '∆G_std': np.sqrt(dG_var), 'P(∆G<0)': n_negative / n_samples,
+                               'P(∆G>0)': n_positive / n_samples}, index=rxn_names)
+
+    if flux_df is not None:
+        fluxes = flux_df['vref_mean (mmol/L/h)'].reindex(rxn_names).values
+        dG_prob_df['P(feasible)'] = np.where(fluxes > 0, dG_prob_df['P(∆G<0)'],
+                                             np.where(fluxes < 0, dG_prob_df['P(∆G>0)'], np.nan))
+
+    if rxn_order:
+        dG_prob_df = dG_prob_df.reindex(rxn_order)
+
+    return dG_prob_df
+
+
+class RobustFluxFactorization:
+    """
+    Decomposition of the balanced stoichiometric matrix S into its measured (S_m) and unknown (S_u) reaction columns,
+    which is all that is needed to compute robust fluxes for any measurement values on the same set of measured
+    reactions:
+     - the sensitivity of the unknown fluxes to the measured ones, pinv(S_u)·S_m, so that v_u = -pinv(S_u)·S_m·v_m;
+     - whether or not the system is fully determined, i.e. the redundancy matrix Rred = S_m - S_u·pinv(S_u)·S_m has no
+       singular values above 10^-12.
+
+    The pseudo-inverse is never formed: small systems use a single SVD of S_u and large ones solve a sparse least
+    squares problem (lsqr) for each measured reaction, which works on S_u directly rather than on the normal equations
+    S_u'·S_u, whose condition number is the square of that of S_u.
+    """
+
+    def __init__(self, stoic_matrix: np.ndarray, id_meas: np.ndarray, solver: str = 'auto'):
+        """
+        Args:
+            stoic_matrix: balanced stoichiometric matrix with metabolites as rows and reactions as columns.
+            id_meas: boolean array that is True for measured reactions.
+            solver: 'dense', 'sparse' or 'auto', which uses the sparse solver for more than SPARSE_SOLVER_MIN_RXNS
+                    unknown reactions.
+        """
+
+        if solver not in ROBUST_FLUX_SOLVERS:
+            raise ValueError(f'Invalid solver "{solver}". It must be one of {ROBUST_FLUX_SOLVERS}.')
+
+        self.id_meas = np.nonzero(id_meas)[0]
+        self.id_unkn = np.nonzero(~id_meas)[0]
+
+        stoic_meas = np.asarray(stoic_matrix[:, self.id_meas], dtype=float)
+        stoic_unkn = stoic_matrix[:, self.id_unkn]
+
+        if solver == 'auto':
+            solver = 'sparse' if len(self.id_unkn) > SPARSE_SOLVER_MIN_RXNS else 'dense'
+        self.solver = solver
+
+        if len(self.id_unkn) == 0:
+            self.sensitivity = np.zeros((0, len(self.id_meas)))
+        elif solver == 'dense':
+            self.sensitivity = self._solve_dense(np.asarray(stoic_unkn, dtype=float), stoic_meas)
+        else:
+            self.sensitivity = self._solve_sparse(sparse.csc_matrix(stoic_unkn, dtype=float), stoic_meas)
+
+        stoic_unkn_sensitivity = stoic_unkn @ self.sensitivity if len(self.id_unkn) else 0
+        reduced_matrix = stoic_meas - stoic_unkn_sensitivity
+        sing_vals = np.linalg.svd(reduced_matrix, compute_uv=False) if reduced_matrix.size else np.zeros(0)
+        self.is_determined = bool(np.all(np.abs(sing_vals) <= 10 ** -12))
+
+    @staticmethod
+    def _solve_dense(stoic_unkn: np.ndarray, stoic_meas: np.ndarray) -> np.ndarray:
+        # pinv(S_u)·S_m from one SVD, with the same cutoff for small singular values as np.linalg.pinv
+        u, sing_vals, vh = np.linalg.svd(stoic_unkn, full_matrices=False)
+        keep = sing_vals > 10 ** -15 * np.max(sing_vals, initial=0)
+
+        return vh[keep].T @ ((u[:, keep].T @ stoic_meas) / sing_vals[keep][:, np.newaxis])
+
+    @staticmethod
+    def _solve_sparse(stoic_unkn: sparse.csc_matrix, stoic_meas: np.ndarray) -> np.ndarray:
+        # lsqr started at zero converges to the minimum norm solution, as pinv, also if S_u is rank deficient; the
+        # condition number limit matches the cutoff for small singular values in _solve_dense
+        n_unkn = stoic_unkn.shape[1]
+
+        lsqr_results = [lsqr(stoic_unkn, stoic_meas[:, meas_i], atol=10 ** -14, btol=10 ** -14, conlim=10 ** 15,
+                             iter_lim=10 * n_unkn) for meas_i in range(stoic_meas.shape[1])]
+        sensitivity = np.column_stack([lsqr_res[0] for lsqr_res in lsqr_results]).reshape(n_unkn, -1)
+
+        # columns where lsqr hit the iteration or condition number limits are solved with the dense solver instead
+        not_converged = [meas_i for meas_i, lsqr_res in enumerate(lsqr_results) if lsqr_res[1] not in LSQR_CONVERGED]
+        if not_converged:
+            warnings.warn(f'The sparse solver did not converge for {len(not_converged)} measured reaction(s), ' +
+                          'using the dense solver for them.', RuntimeWarning)
+            sensitivity[:, not_converged] = RobustFluxFactorization._solve_dense(stoic_unkn.toarray(),
+                                                                                  stoic_meas[:, not_converged])
+
+        return sensitivity
+
+
+class RobustFluxResult(NamedTuple):
+    """
+    Result of the robust flux computation. If the system is not fully determined, v_mean and v_std are filled with NaN.
+    """
+
+    v_mean: np.ndarray
+    v_std: np.ndarray
+    is_determined: bool
+
+
+def _get_robust_flux_factorization(stoic_matrix: np.ndarray, id_meas: np.ndarray,
+                                   solver: str = 'auto') -> RobustFluxFactorization:
+    """
+    Gets the factorization for a balanced stoichiometric matrix and set of measured reactions, from the cache if the
+    same pair was factorized before in this session. The cache keeps the MAX_CACHED_FACTORIZATIONS most recently used
+    factorizations, keyed by the shape of the matrix and a hash of its nonzero entries and of the measured reactions.
+
+    Args:
+        stoic_matrix: balanced stoichiometric matrix with metabolites as rows and reactions as columns.
+        id_meas: boolean array that is True for measured reactions.
+        solver: 'dense', 'sparse' or 'auto'.
+
+    Returns:
+        RobustFluxFactorization object.
+    """
+
+    # stoichiometric matrices are very sparse, so only the nonzero entries are hashed
+    stoic_matrix = np.asarray(stoic_matrix, dtype=float)
+    nonzero_ind = np.flatnonzero(stoic_matrix)
+    key_hash = hashlib.sha256(nonzero_ind.tobytes())
+    key_hash.update(stoic_matrix.ravel()[nonzero_ind].tobytes())
+    key_hash.update(np.packbits(id_meas).tobytes())
+    key = (stoic_matrix.shape, key_hash.hexdigest(), solver)
+
+    if key in _robust_flux_factorizations:
+        _robust_flux_factorizations.move_to_end(key)
     else:
+        if len(_robust_flux_factorizations) >= MAX_CACHED_FACTORIZATIONS:
+            _robust_flux_factorizations.popitem(last=False)
+
+        _robust_flux_factorizations[key] = RobustFluxFactorization(stoic_matrix, id_meas, solver=solver)
+
+    return _robust_flux_factorizations[key]
+
+
+def _compute_robust_fluxes(stoic_matrix: np.ndarray, meas_rates: np.ndarray, meas_rates_std: np.ndarray,
+                           rxn_list: list, solver: str = 'auto') -> RobustFluxResult:
+    """
+    Computes the robust fluxes as in GRASP: the unknown fluxes are v_u = -pinv(S_u)·S_m·v_m, with variances given by
+    the diagonal of pinv(S_u)·S_m·D_m·(pinv(S_u)·S_m)', where D_m is the diagonal matrix with the measured
+    variances.
+
+    meas_rates and meas_rates_std can also have one column per measurement set, as long as all sets measure the same
+    reactions. The factorization is then shared and all sets are solved with a single matrix product.
+
+    Args:
+        stoic_matrix: balanced stoichiometric matrix with metabolites as rows and reactions as columns.
+        meas_rates: measured fluxes, 0 for reactions that are not measured.
+        meas_rates_std: standard deviations of the measured fluxes.
+        rxn_list: list of reaction ids.
+        solver: 'dense', 'sparse' or 'auto'.
+
+    Returns:
+        RobustFluxResult with the flux means and standard deviations, with the same shape as meas_rates.
+    """
+
+    id_meas = meas_rates != 0
+    if id_meas.ndim == 2:
+        if np.any(id_meas != id_meas[:, [0]]):
+            raise ValueError('All measurement sets must have the same measured reactions.')
+        id_meas = id_meas[:, 0]
+
+    factorization = _get_robust_flux_factorization(stoic_matrix, id_meas, solver=solver)
+    id_meas = factorization.id_meas
+    id_unkn = factorization.id_unkn
+
+    if not factorization.is_determined:
         print('System is not fully determined and the fluxes cannot be determined.')
-        exit()
+        return RobustFluxResult(np.full(np.shape(meas_rates), np.nan), np.full(np.shape(meas_rates), np.nan), False)
+
+    v_mean = np.zeros(np.shape(meas_rates))
+    v_std = np.zeros(np.shape(meas_rates))
+
+    v_mean[id_unkn] = -factorization.sensitivity @ meas_rates[id_meas]
+    zero_flux_rxns = id_unkn[np.any(v_mean[id_unkn] == 0, axis=tuple(range(1, v_mean.ndim)))]
+    if len(zero_flux_rxns) > 0:
+        raise RuntimeError('According to compute robust fluxes, there are reactions with zero flux in the model.\n' +
+                           'Those reactions should be removed.\n' +
+                           f'The reactions are {np.array(rxn_list)[zero_flux_rxns]}')
+
+    v_mean[id_meas] = meas_rates[id_meas]
+    v_std[id_unkn] = factorization.sensitivity ** 2 @ meas_rates_std[id_meas] ** 2
+    v_std[id_meas] = meas_rates_std[id_meas] ** 2
 
     v_std = np.sqrt(v_std)  # Compute std
 
-    return v_mean, v_std
+    return RobustFluxResult(v_mean, v_std, True)
 
 
 def _get_balanced_s_matrix(data_dict: dict) -> tuple:
@@ -183,14 +530,17 @@ def _get_meas_rates(data_dict: dict, rxn_list: list) -> tuple:
     return meas_rates_mean, meas_rates_std
 
 
-def get_robust_fluxes(data_dict: dict, rxn_order: list = None) -> pd.DataFrame:
+def get_robust_fluxes(data_dict: dict, rxn_order: list = None, solver: str = 'auto') -> pd.DataFrame:
     """
     Given a dictionary representing a GRASP input file, it calculates the robust fluxes (almost) as in GRASP,
-    unless the system is not fully determined.
+    unless the system is not fully determined, in which case all fluxes are NaN.
+    The factorization of the stoichiometric matrix is cached, so later calls for the same network and set of measured
+    reactions only solve for the new measurements.
 
     Args:
         data_dict: path to the GRASP input file
         rxn_order: a list with the reactions order (optional)
+        solver: 'dense', 'sparse' or 'auto', which uses the sparse solver for large networks.
 
     Returns:
         fluxes_df: dataframe with flux mean and std values
@@ -198,29 +548,63 @@ def get_robust_fluxes(data_dict: dict, rxn_order: list = None) -> pd.DataFrame:
 
     fluxes_df = pd.DataFrame()
     stoic_balanced, rxn_list = _get_balanced_s_matrix(data_dict)
-    # n_reactions = len(rxn_order)
 
     meas_rates_mean, meas_rates_std = _get_meas_rates(data_dict, rxn_list)
 
-    v_mean, v_std = _compute_robust_fluxes(stoic_balanced, meas_rates_mean, meas_rates_std, rxn_list)
+    robust_fluxes = _compute_robust_fluxes(stoic_balanced, meas_rates_mean, meas_rates_std, rxn_list, solver=solver)
 
-    fluxes_df['vref_mean (mmol/L/h)'] = v_mean
-    fluxes_df['vref_std (mmol/L/h)'] = v_std
+    fluxes_df['vref_mean (mmol/L/h)'] = robust_fluxes.v_mean
+    fluxes_df['vref_std (mmol/L/h)'] = robust_fluxes.v_std
 
     fluxes_df.index = rxn_list
     if rxn_order:
         fluxes_df = fluxes_df.reindex(rxn_order)
-        fluxes_df = fluxes_df.reindex(rxn_order)
 
     return fluxes_df
 
 
+def get_robust_fluxes_multi(data_dict: dict, meas_rates_mean: np.ndarray, meas_rates_std: np.ndarray,
+                            solver: str = 'auto') -> tuple:
+    """
+    Given a dictionary representing a GRASP input file, it calculates the robust fluxes (almost) as in GRASP for many
+    measurement sets at once, e.g. replicates or time points, on the network in data_dict. All sets must measure the
+    same reactions, so that the stoichiometric matrix is only factorized once (see get_robust_fluxes).
+
+    Args:
+        data_dict: a dictionary representing a GRASP input file.
+        meas_rates_mean: array with shape (number of reactions, number of measurement sets) with the measured flux
+                         means, with reactions in the order of the stoic sheet and 0 for reactions that aren't
+                         measured.
+        meas_rates_std: array with the measured flux standard deviations, with the same shape as meas_rates_mean.
+        solver: 'dense', 'sparse' or 'auto', which uses the sparse solver for large networks.
+
+    Returns:
+        Two arrays with shape (number of reactions, number of measurement sets) with the flux means and standard
+        deviations, filled with NaN if the system is not fully determined.
+    """
+
+    stoic_balanced, rxn_list = _get_balanced_s_matrix(data_dict)
+
+    meas_rates_mean = np.asarray(meas_rates_mean, dtype=float)
+    meas_rates_std = np.asarray(meas_rates_std, dtype=float)
+
+    if meas_rates_mean.ndim != 2 or meas_rates_std.shape != meas_rates_mean.shape or \
+            meas_rates_mean.shape[0] != len(rxn_list):
+        raise ValueError('The measured flux means and standard deviations must both have shape ' +
+                         f'({len(rxn_list)}, number of measurement sets), got {meas_rates_mean.shape} and ' +
+                         f'{meas_rates_std.shape}.')
+
+    robust_fluxes = _compute_robust_fluxes(stoic_balanced, meas_rates_mean, meas_rates_std, rxn_list, solver=solver)
+
+    return robust_fluxes.v_mean, robust_fluxes.v_std
+
+
 def check_thermodynamic_feasibility(data_dict: dict) -> tuple:
     """
     Given a dictionary representing a GRASP input file, it checks if the reaction's dG are compatible with the
     respective fluxes. It works both when all fluxes are specified in measRates and when robust fluxes are calculated
-    for a fully determined system. If the fluxes are not fully specified not the system is fully determined, it
-    doesn't work.
+    for a fully determined system. If the fluxes are not fully specified nor the system is fully determined, the fluxes
+    and Gibbs energies are not compared.
 
     Args:
         data_dict: a dictionary representing a GRASP input file.
@@ -244,6 +628,10 @@ def check_thermodynamic_feasibility(data_dict: dict) -> tuple:
     if len(stoic_df.index) != len(flux_df.index):
         flux_df = get_robust_fluxes(data_dict)
 
+        if flux_df['vref_mean (mmol/L/h)'].isna().all():
+            print('The fluxes and Gibbs energies cannot be compared.')
+            return flag, flux_df, dG_df
+
     for rxn in flux_df.index:
         if flux_df.loc[rxn, 'vref_mean (mmol/L/h)'] > 0 and dG_df.loc[rxn, '∆G_min'] > 0:
             print(f'The flux and ∆G range seem to be incompatible for reaction {rxn}')
@@ -0,0 +1,161 @@
+""" This module implements a compiled store for the mapping between BiGG and KEGG metabolite ids.
+
+The mapping (e.g. data/map_bigg_to_kegg_ids.csv, generated with data/manipulate_data.py) is a csv file with one row per
+(BiGG id, KEGG id) match. Reading it with pandas and doing a .loc lookup per metabolite is slow, so the first time a
+mapping file is loaded it is compiled into a dictionary from BiGG ids to all candidate KEGG ids, which is stored as a
+binary pickle in the per-user cache folder (see io.workbook.get_default_cache_dir). Later loads of the same file read
+that pickle instead, and the loaded map is kept in memory for the rest of the session. Nothing is ever written to, or
+unpickled from, the folder that holds the mapping file.
+
+"""
+
+import os
+import pickle
+import tempfile
+from collections import Counter
+from collections.abc import Mapping
+
+import pandas as pd
+
+from .workbook import get_cache_key, get_default_cache_dir
+
+_loaded_maps = {}
+
+
+class BiggKeggMap(Mapping):
+    """
+    Read-only dictionary with BiGG metabolite ids (without the m_ prefix and the compartment, e.g. glc__D) as keys
+    and tuples with all candidate KEGG ids as values. BiGG ids without a KEGG match map to an empty tuple.
+    """
+
+    def __init__(self, bigg_to_kegg: dict):
+        """
+        Args:
+            bigg_to_kegg: dictionary with BiGG ids as keys and tuples of KEGG ids as values.
+        """
+
+        self._bigg_to_kegg = bigg_to_kegg
+        self._kegg_id_counts = None
+
+    @classmethod
+    def from_dataframe(cls, map_bigg_to_kegg_ids: pd.DataFrame):
+        """
+        Compiles a mapping dataframe into a BiggKeggMap.
+
+        Args:
+            map_bigg_to_kegg_ids: dataframe with BiGG ids on the index and the respective KEGG ids on the column
+                                  "id_kegg".
+
+        Returns:
+            BiggKeggMap object.
+        """
+
+        bigg_to_kegg = {}
+        for bigg_id, kegg_id in zip(map_bigg_to_kegg_ids.index, map_bigg_to_kegg_ids['id_kegg']):
+            kegg_ids = bigg_to_kegg.setdefault(bigg_id, [])
+            if isinstance(kegg_id, str):
+                kegg_ids.append(kegg_id)
+
+        return cls({bigg_id: tuple(kegg_ids) for bigg_id, kegg_ids in bigg_to_kegg.items()})
+
+    def __getitem__(self, bigg_id):
+        return self._bigg_to_kegg[bigg_id]
+
+    def __contains__(self, bigg_id):
+        return bigg_id in self._bigg_to_kegg
+
+    def __iter__(self):
+        return iter(self._bigg_to_kegg)
+
+    def __len__(self):
+        return len(self._bigg_to_kegg)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({len(self)} BiGG ids)'
+
+    def kegg_id_counts(self) -> Counter:
+        """
+        Counts how many BiGG ids map to each KEGG id.
+
+        Returns:
+            Counter with KEGG ids as keys and the number of BiGG ids that map to them as values.
+        """
+
+        if self._kegg_id_counts is None:
+            self._kegg_id_counts = Counter(kegg_id for kegg_ids in self._bigg_to_kegg.values() for kegg_id in kegg_ids)
+
+        return self._kegg_id_counts
+
+
+def load_bigg_to_kegg_map(file_in: str, use_cache: bool = True, cache_dir: str = None) -> BiggKeggMap:
+    """
+    Loads a mapping between BiGG and KEGG ids from a csv file with the columns id, metanetx_id, name, id_kegg and
+    name_kegg, as generated by data/manipulate_data.py.
+
+    The compiled map is cached on disk, keyed by the file content, and in memory, keyed by the file path and
+    modification time, so only the first load of a mapping file parses the csv.
+
+    Args:
+        file_in: path to the csv file with the mapping between BiGG and KEGG ids.
+        use_cache: whether or not to use the disk and memory caches.
+        cache_dir: path to the cache folder, by default the folder returned by io.workbook.get_default_cache_dir.
+
+    Returns:
+        BiggKeggMap object.
+    """
+
+    if not use_cache:
+        return BiggKeggMap.from_dataframe(pd.read_csv(file_in, index_col=0))
+
+    file_stat = os.stat(file_in)
+    memory_key = (os.path.abspath(file_in), file_stat.st_mtime_ns, file_stat.st_size)
+    if memory_key in _loaded_maps:
+        return _loaded_maps[memory_key]
+
+    cache_dir = cache_dir if cache_dir else get_default_cache_dir()
+    cache_file = os.path.join(cache_dir, get_cache_key(file_in, kind='bigg_kegg_map') + '.pkl')
+
+    try:
+        with open(cache_file, 'rb') as f_in:
+            bigg_kegg_map = BiggKeggMap(pickle.load(f_in))
+
+    except Exception:
+        # missing or unreadable entry, compile the map again
+        bigg_kegg_map = BiggKeggMap.from_dataframe(pd.read_csv(file_in, index_col=0))
+
+        try:
+            _write_compiled_map(cache_file, bigg_kegg_map)
+        except OSError:
+            pass
+
+    _loaded_maps[memory_key] = bigg_kegg_map
+
+    return bigg_kegg_map
+
+
+def _write_compiled_map(cache_file: str, bigg_kegg_map: BiggKeggMap):
+    """
+    Stores a compiled map in a pickle file, and removes the compiled versions of older versions of the same mapping
+    file. The map is written to a temporary file first, so that a cache entry is either complete or absent.
+
+    Args:
+        cache_file: path to the cache file, named after the cache key of the mapping file.
+        bigg_kegg_map: compiled map.
+
+    Returns:
+        None
+    """
+
+    cache_dir, entry_name = os.path.split(cache_file)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    with tempfile.NamedTemporaryFile(dir=cache_dir, delete=False) as f_out:
+        pickle.dump(dict(bigg_kegg_map), f_out, protocol=pickle.HIGHEST_PROTOCOL)
+
+    file_prefix, content_hash, options_hash = entry_name.rsplit('-', 2)
+    for entry in os.listdir(cache_dir):
+        if entry.startswith(file_prefix + '-') and len(entry) == len(entry_name) and entry.endswith(options_hash) \
+                and not entry.startswith(f'{file_prefix}-{content_hash}-'):
+            os.remove(os.path.join(cache_dir, entry))
+
+    os.replace(f_out.name, cache_file)
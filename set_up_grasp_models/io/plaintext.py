@@ -5,9 +5,17 @@ Author: Daniel Machado
 
 """
 
-from os.path import splitext, basename
+import bz2
+import gzip
+import lzma
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO, TextIOWrapper
+from itertools import chain, repeat
+from os.path import splitext, basename, getsize
+from typing import Iterator
 
 from ..model.model import Model
+from ..model.parser import ReactionParser
 
 INSTRUCTIONS = """
 # Text based model representation
@@ -19,37 +27,178 @@ INSTRUCTIONS = """
 
 """
 
+COMPRESSION_MAGIC = {'gz': b'\x1f\x8b', 'bz2': b'BZh', 'xz': b'\xfd7zXZ\x00'}
 
-def import_model_from_plaintext(filename: str) -> Model:
+
+def import_model_from_plaintext(filename: str, n_processes: int = 1) -> Model:
     """ Reads a model from a file.
     
     Arguments:
-        filename: file path.
+        filename: file path, can be gzip, bz2 or xz compressed.
+        n_processes: number of processes used to parse the file, if larger than 1 the file is split into line
+                     aligned chunks that are parsed in parallel (reaction order is kept). Compressed files are always
+                     parsed in a single process. Only parsing runs in parallel: sending the parsed reactions back
+                     from the worker processes and building the model are serial, and starting the processes has a
+                     fixed cost, so this only pays off for very large files (hundreds of thousands of reactions, see
+                     benchmarks/bench_plaintext_import.py) on a machine with several free cores.
 
     Returns:
         A Model object (or respective subclass).
     """
 
-    with open(filename, 'r') as stream:
-        model_id = splitext(basename(filename))[0]
-        model = Model(model_id)
-
-        for line in stream:
-            line = line.strip()
-            if not line:
-                continue
+    compression = _get_compression(filename)
+    model_id = basename(filename)
+    if compression and model_id.endswith('.' + compression):
+        model_id = model_id[:-len(compression) - 1]
 
-            # If line ends with comment ignore it as well
-            line = line.split("#", 1)[0]
-            line = line.strip()
-            if not line:
-                continue
+    model = Model(splitext(model_id)[0])
 
-            model.add_reaction_from_str(line, clear_tmp=False)
+    if n_processes > 1 and not compression:
+        chunks = _get_line_aligned_chunks(filename, n_processes)
+        with ProcessPoolExecutor(max_workers=n_processes) as executor:
+            chunk_rxns = executor.map(_parse_plaintext_chunk, repeat(filename, len(chunks)), *zip(*chunks))
+            model.add_reactions_from_tuples(chain.from_iterable(chunk_rxns))
+    else:
+        with _open_plaintext(filename) as stream:
+            model.add_reactions_from_strs([line for line_no, line in _get_rxn_lines(stream)])
 
     return model
 
 
+def iter_reactions_from_plaintext(filename: str, kind: str = None) -> Iterator[tuple]:
+    """ Lazily parses the reactions in a plain text model file, without building a model.
+
+    Blank lines and comments are skipped as in import_model_from_plaintext. Gzip, bz2 and xz compressed files are
+    decompressed on the fly, so only one line is held in memory at a time.
+
+    Arguments:
+        filename: file path, can be gzip, bz2 or xz compressed.
+        kind: passed on to ReactionParser.parse_reaction, use 'cb' to also get bounds and objective coefficients.
+
+    Returns:
+        Iterator over (line number, parsed reaction) tuples, where the parsed reaction is the
+        (reaction id, reversible, stoichiometry) tuple returned by ReactionParser and line numbers start at 1.
+    """
+
+    parser = ReactionParser(mode='tokenizer')
+
+    with _open_plaintext(filename) as stream:
+        for line_no, line in _get_rxn_lines(stream):
+            try:
+                rxn = parser.parse_reaction(line, kind=kind)
+            except SyntaxError as err:
+                raise SyntaxError(f'{err.msg} (line {line_no} of {filename})') from err
+
+            yield line_no, rxn
+
+
+def _get_compression(filename: str) -> str:
+    """ Checks the first bytes of a file to find out if it is compressed.
+
+    Arguments:
+        filename: file path.
+
+    Returns:
+        Compression format, one of 'gz', 'bz2' or 'xz', or None if the file is not compressed.
+    """
+
+    with open(filename, 'rb') as f_in:
+        header = f_in.read(6)
+
+    for compression, magic in COMPRESSION_MAGIC.items():
+        if header.startswith(magic):
+            return compression
+
+    return None
+
+
+def _open_plaintext(filename: str):
+    """ Opens a plain text model file for reading, decompressing it if needed.
+
+    Arguments:
+        filename: file path.
+
+    Returns:
+        Text stream.
+    """
+
+    compression = _get_compression(filename)
+    open_func = {'gz': gzip.open, 'bz2': bz2.open, 'xz': lzma.open}.get(compression, open)
+
+    return open_func(filename, 'rt')
+
+
+def _get_rxn_lines(stream) -> Iterator[tuple]:
+    """ Yields the reaction strings in a plain text stream, skipping blank lines and comments.
+
+    Arguments:
+        stream: text stream.
+
+    Returns:
+        Iterator over (line number, reaction string) tuples.
+    """
+
+    for line_no, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+
+        # If line ends with comment ignore it as well
+        line = line.split("#", 1)[0]
+        line = line.strip()
+        if not line:
+            continue
+
+        yield line_no, line
+
+
+def _get_line_aligned_chunks(filename: str, n_chunks: int) -> list:
+    """ Splits a file into byte ranges of roughly the same size that start and end at line boundaries.
+
+    Arguments:
+        filename: file path.
+        n_chunks: maximum number of chunks.
+
+    Returns:
+        List of (start, end) byte offsets.
+    """
+
+    file_size = getsize(filename)
+    offsets = [0]
+
+    with open(filename, 'rb') as f_in:
+        for chunk_i in range(1, n_chunks):
+            f_in.seek(max(file_size * chunk_i // n_chunks, offsets[-1]))
+            f_in.readline()
+            offsets.append(f_in.tell())
+
+    offsets.append(file_size)
+    offsets = sorted(set(offsets))
+
+    return list(zip(offsets[:-1], offsets[1:]))
+
+
+def _parse_plaintext_chunk(filename: str, start: int, end: int) -> list:
+    """ Parses the reactions in the given byte range of a plain text model file.
+
+    Arguments:
+        filename: file path.
+        start: offset of the first byte in the chunk.
+        end: offset after the last byte in the chunk.
+
+    Returns:
+        List of (reaction id, reversible, stoichiometry) tuples.
+    """
+
+    with open(filename, 'rb') as f_in:
+        f_in.seek(start)
+        stream = TextIOWrapper(BytesIO(f_in.read(end - start)))
+
+    parser = ReactionParser(mode='tokenizer')
+
+    return [parser.parse_reaction(line) for line_no, line in _get_rxn_lines(stream)]
+
+
 def write_to_plaintext(rxn_strings: list, file_out: str, print_instructions: bool = True):
     """ Writes a model to a file.
 
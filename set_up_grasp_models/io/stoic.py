@@ -1,44 +1,62 @@
-import pandas as pd
+import numpy as np
+from scipy import sparse
 
+from .workbook import read_workbook
 
-def import_stoic(file_in: str) -> tuple:
+
+def import_stoic(file_in: str, return_matrix: bool = False) -> tuple:
     """
     Gets the reaction strings from the stoichiometry matrix defined in the GRASP input models.
 
     Args:
         file_in: path to file containing the model.
+        return_matrix: whether or not to also return the stoichiometric matrix.
 
     Returns:
-        A metabolite list, a reaction list, and a reaction strings list.
+        A metabolite list, a reaction list, and a reaction strings list. If return_matrix is True, the stoichiometric
+        matrix is returned as well, as a sparse CSR matrix with metabolites as rows and reactions as columns.
    """
 
-    data_df = pd.read_excel(file_in, sheet_name='stoic', index_col=0, header=0)
-    data_df = data_df.fillna('')
-    rxn_strings = []
+    data_df = read_workbook(file_in, sheet_name='stoic', index_col=0, header=0)
+    data_df = data_df.fillna(0)
 
     mets = data_df.columns.values
     rxns = data_df.index.values
 
-    for row in data_df.index:
+    # rows are reactions, the non-zero entries of each row are stored in column order
+    stoic_matrix = sparse.csr_matrix(data_df.values)
+    abs_coeffs = np.abs(stoic_matrix.data)
+    is_substrate = stoic_matrix.data < 0
+    met_terms = [f'{_format_coeff(coef)} {mets[met_i]}' if coef != 1 else f'{mets[met_i]}'
+                 for coef, met_i in zip(abs_coeffs, stoic_matrix.indices)]
 
-        subs_entries = data_df.loc[row][data_df.loc[row].lt(0)]
-        sub_stoic_coeffs = subs_entries.values
-        subs = subs_entries.index.values
+    rxn_strings = []
+    for rxn_i, row in enumerate(rxns):
+        start, end = stoic_matrix.indptr[rxn_i:rxn_i + 2]
+        row_terms = met_terms[start:end]
+        row_is_substrate = is_substrate[start:end]
 
-        prod_entries = data_df.loc[row][data_df.loc[row].gt(0)]
-        prod_stoic_coeffs = prod_entries.values
-        prods = prod_entries.index.values
+        subs_part = ' + '.join(term for term, is_sub in zip(row_terms, row_is_substrate) if is_sub)
+        prods_part = ' + '.join(term for term, is_sub in zip(row_terms, row_is_substrate) if not is_sub)
 
-        subs_with_coeffs = [f'{str(abs(coef))} {met}' if abs(coef) != 1 else met for coef, met in zip(sub_stoic_coeffs, subs)]
-        subs_part = ' + '.join(subs_with_coeffs)
+        rxn_strings.append(f'{row}: {subs_part} <-> {prods_part}')
 
-        prods_with_coeffs = [f'{str(abs(coef))} {met}' if abs(coef) != 1 else met for coef, met in zip(prod_stoic_coeffs, prods)]
-        prods_part = ' + '.join(prods_with_coeffs)
+    if return_matrix:
+        return mets, rxns, rxn_strings, stoic_matrix.transpose().tocsr().astype(float)
 
-        rxn_string = ' <-> '.join([subs_part, prods_part])
-        rxn_string = f'{row}: {rxn_string}'
+    return mets, rxns, rxn_strings
 
-        rxn_strings.append(rxn_string)
 
-    return mets, rxns, rxn_strings
+def _format_coeff(coeff: float) -> str:
+    """
+    Formats a stoichiometric coefficient for a reaction string, where integer coefficients are written without
+    decimals (e.g. 2 rather than 2.0) even if the sheet was read as float, e.g. because of blank cells.
+
+    Args:
+        coeff: stoichiometric coefficient.
+
+    Returns:
+        The coefficient as a string.
+    """
 
+    return str(int(coeff)) if float(coeff).is_integer() else str(float(coeff))
@@ -0,0 +1,286 @@
+""" This module implements a cached reader for GRASP excel workbooks.
+
+Parsing a workbook with pandas is slow, so the first time a workbook is read each sheet is stored in a binary pickle
+cache in a per-user cache folder (see get_default_cache_dir). Later reads of a workbook with the same content (and the
+same read options) are loaded from that cache instead of being parsed again. Nothing is ever written to, or unpickled
+from, the folder that holds the workbook.
+
+LazyWorkbook can stand in for the data_dict returned by pd.read_excel(file_in, sheet_name=None): it lists the sheet
+names from the workbook index and only parses a sheet the first time it is accessed.
+
+"""
+
+import hashlib
+import os
+import pickle
+import shutil
+import tempfile
+from collections.abc import MutableMapping
+
+import pandas as pd
+
+CACHE_DIR_NAME = 'set_up_grasp_models'
+
+
+def get_default_cache_dir() -> str:
+    """
+    Gets the default cache folder, which is set_up_grasp_models inside $XDG_CACHE_HOME, or inside ~/.cache if that
+    variable is not set.
+
+    Returns:
+        Path to the default cache folder.
+    """
+
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+
+    return os.path.join(cache_home, CACHE_DIR_NAME)
+
+
+def read_workbook(file_in: str, sheet_name=None, use_cache: bool = True, cache_dir: str = None, content_hash: str = None,
+                  **kwargs):
+    """
+    Reads an excel workbook like pd.read_excel, but caches the parsed sheets on disk.
+
+    The cache is keyed by the workbook content hash and by the read options, so editing the workbook or reading it with
+    different options never returns stale data. When a workbook changes, its old cache entries are removed.
+
+    Args:
+        file_in: path to the excel workbook.
+        sheet_name: same as in pd.read_excel, use None to get all sheets.
+        use_cache: whether or not to use the cache.
+        cache_dir: path to the cache folder, by default the folder returned by get_default_cache_dir.
+        content_hash: hash of the workbook content as returned by get_file_hash, to avoid hashing the file again when
+                      several sheets of the same workbook are read.
+        **kwargs: any other arguments to pd.read_excel, e.g. index_col or header.
+
+    Returns:
+        Same as pd.read_excel, i.e. a dictionary with sheet names as keys and dataframes as values if sheet_name is
+        None or a list, or a single dataframe otherwise.
+    """
+
+    if not use_cache:
+        return pd.read_excel(file_in, sheet_name=sheet_name, **kwargs)
+
+    cache_dir = cache_dir if cache_dir else get_default_cache_dir()
+    entry_name = get_cache_key(file_in, content_hash=content_hash, sheet_name=sheet_name, **kwargs)
+    entry_dir = os.path.join(cache_dir, entry_name)
+
+    try:
+        return _load_cache_entry(entry_dir)
+    except Exception:
+        # missing or unreadable entry, parse the workbook again
+        pass
+
+    data = pd.read_excel(file_in, sheet_name=sheet_name, **kwargs)
+
+    try:
+        _write_cache_entry(cache_dir, entry_name, data)
+    except OSError:
+        pass
+
+    return data
+
+
+class LazyWorkbook(MutableMapping):
+    """
+    Dictionary-like view of an excel workbook, with sheet names as keys and dataframes as values, that parses each
+    sheet on first access (through the read_workbook cache).
+
+    Sheets can be set and deleted like in a dictionary, e.g. by functions that modify the data_dict, and such changes
+    are kept in memory only. Like the sheet names, the workbook content hash used for the cache is taken when the
+    object is created, so the workbook is only hashed once.
+    """
+
+    def __init__(self, file_in: str, usecols: dict = None, dtype: dict = None, use_cache: bool = True,
+                 cache_dir: str = None, **kwargs):
+        """
+        Args:
+            file_in: path to the excel workbook.
+            usecols: dictionary with sheet names as keys and the columns to parse as values (see pd.read_excel), the
+                     index column must be included if index_col is used.
+            dtype: dictionary with sheet names as keys and dtype hints as values (see pd.read_excel).
+            use_cache: whether or not to use the read_workbook cache.
+            cache_dir: path to the cache folder, by default the folder returned by get_default_cache_dir.
+            **kwargs: any other arguments to pd.read_excel used for all sheets, e.g. index_col or header.
+        """
+
+        self.file_in = file_in
+        self.usecols = usecols if usecols else {}
+        self.dtype = dtype if dtype else {}
+        self.use_cache = use_cache
+        self.cache_dir = cache_dir
+        self.read_kwargs = kwargs
+
+        self.content_hash = get_file_hash(file_in) if use_cache else None
+
+        with pd.ExcelFile(file_in) as excel_file:
+            self._sheets = dict.fromkeys(excel_file.sheet_names)
+
+        self._loaded = set()
+
+    def __getitem__(self, sheet):
+        if sheet not in self._loaded:
+            if sheet not in self._sheets:
+                raise KeyError(sheet)
+
+            self._sheets[sheet] = self.parse_sheet(sheet)
+            self._loaded.add(sheet)
+
+        return self._sheets[sheet]
+
+    def __setitem__(self, sheet, sheet_df):
+        self._sheets[sheet] = sheet_df
+        self._loaded.add(sheet)
+
+    def __delitem__(self, sheet):
+        del self._sheets[sheet]
+        self._loaded.discard(sheet)
+
+    def __contains__(self, sheet):
+        return sheet in self._sheets
+
+    def __iter__(self):
+        return iter(self._sheets)
+
+    def __len__(self):
+        return len(self._sheets)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.file_in!r}, loaded sheets: {sorted(self._loaded)})'
+
+    def is_loaded(self, sheet) -> bool:
+        """
+        Checks if a sheet was already parsed.
+
+        Args:
+            sheet: sheet name.
+
+        Returns:
+            Whether or not the sheet was parsed (or set).
+        """
+
+        return sheet in self._loaded
+
+    def parse_sheet(self, sheet) -> pd.DataFrame:
+        """
+        Parses a sheet from the workbook, with the column subset and dtype hints given for that sheet.
+
+        Args:
+            sheet: sheet name.
+
+        Returns:
+            Dataframe with the sheet data.
+        """
+
+        kwargs = dict(self.read_kwargs)
+        if sheet in self.usecols:
+            kwargs['usecols'] = self.usecols[sheet]
+        if sheet in self.dtype:
+            kwargs['dtype'] = self.dtype[sheet]
+
+        return read_workbook(self.file_in, sheet_name=sheet, use_cache=self.use_cache, cache_dir=self.cache_dir,
+                             content_hash=self.content_hash, **kwargs)
+
+
+def get_file_hash(file_in: str) -> str:
+    """
+    Hashes the content of a file.
+
+    Args:
+        file_in: path to the file.
+
+    Returns:
+        The first 32 characters of the SHA-256 hex digest of the file content.
+    """
+
+    file_hash = hashlib.sha256()
+    with open(file_in, 'rb') as f_in:
+        for block in iter(lambda: f_in.read(1 << 20), b''):
+            file_hash.update(block)
+
+    return file_hash.hexdigest()[:32]
+
+
+def get_cache_key(file_in: str, content_hash: str = None, **kwargs) -> str:
+    """
+    Gets the cache key for a workbook, made of the workbook file name, the hash of its absolute path, the hash of its
+    content and the hash of the read options (together with the pandas version). The path hash keeps workbooks with
+    the same name in different folders from replacing each other's entries in the shared cache folder.
+
+    Args:
+        file_in: path to the excel workbook.
+        content_hash: hash of the workbook content as returned by get_file_hash, computed if not given.
+        **kwargs: arguments passed to pd.read_excel.
+
+    Returns:
+        Cache key in the format <file name>-<path hash>-<content hash>-<options hash>.
+    """
+
+    path_hash = hashlib.sha256(os.path.abspath(file_in).encode('utf-8'))
+    content_hash = content_hash if content_hash else get_file_hash(file_in)
+
+    options = repr(sorted(kwargs.items())) + pd.__version__
+    options_hash = hashlib.sha256(options.encode('utf-8'))
+
+    return (f'{os.path.basename(file_in)}-{path_hash.hexdigest()[:16]}-{content_hash}-'
+            f'{options_hash.hexdigest()[:16]}')
+
+
+def _load_cache_entry(entry_dir: str):
+    """
+    Loads a cached workbook.
+
+    Args:
+        entry_dir: path to the cache entry folder.
+
+    Returns:
+        The cached dataframe or dictionary of dataframes.
+    """
+
+    with open(os.path.join(entry_dir, 'index.pkl'), 'rb') as f_in:
+        sheet_names, is_dict = pickle.load(f_in)
+
+    data = {sheet: pd.read_pickle(os.path.join(entry_dir, f'{sheet_i}.pkl')) for sheet_i, sheet in
+            enumerate(sheet_names)}
+
+    return data if is_dict else data[sheet_names[0]]
+
+
+def _write_cache_entry(cache_dir: str, entry_name: str, data):
+    """
+    Stores each sheet of a parsed workbook in its own pickle file, and removes the entries for older versions of the
+    same workbook. The entry is written to a temporary folder first, so that a cache entry is either complete or absent.
+
+    Args:
+        cache_dir: path to the cache folder.
+        entry_name: cache key of the workbook, as returned by get_cache_key.
+        data: dataframe or dictionary of dataframes returned by pd.read_excel.
+
+    Returns:
+        None
+    """
+
+    is_dict = isinstance(data, dict)
+    sheets = data if is_dict else {None: data}
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=cache_dir)
+
+    try:
+        for sheet_i, sheet_df in enumerate(sheets.values()):
+            sheet_df.to_pickle(os.path.join(tmp_dir, f'{sheet_i}.pkl'), protocol=pickle.HIGHEST_PROTOCOL)
+
+        with open(os.path.join(tmp_dir, 'index.pkl'), 'wb') as f_out:
+            pickle.dump((list(sheets.keys()), is_dict), f_out, protocol=pickle.HIGHEST_PROTOCOL)
+
+        # entries of other workbooks can share the file name prefix (e.g. model.xlsx and model.xlsx-v2.xlsx) but not
+        # the key length
+        file_prefix, content_hash, options_hash = entry_name.rsplit('-', 2)
+        for entry in os.listdir(cache_dir):
+            if entry.startswith(file_prefix + '-') and len(entry) == len(entry_name) \
+                    and not entry.startswith(f'{file_prefix}-{content_hash}-'):
+                shutil.rmtree(os.path.join(cache_dir, entry), ignore_errors=True)
+
+        os.replace(tmp_dir, os.path.join(cache_dir, entry_name))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
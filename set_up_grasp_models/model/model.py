@@ -6,17 +6,99 @@ Author: Daniel Machado
 """
 
 import warnings
+from array import array
 from builtins import object
 from builtins import str
 from collections import OrderedDict
+from collections.abc import MutableMapping
 from copy import copy, deepcopy
+from itertools import islice
+from sys import intern
+from weakref import WeakValueDictionary
+
+import numpy as np
+from scipy import sparse
 
 from .parser import ReactionParser
 
 
-class Metabolite(object):
+def _intern(elem_id):
+    return intern(elem_id) if type(elem_id) is str else elem_id
+
+
+def _split_stoichiometry(stoichiometry):
+    stoichiometry = list(stoichiometry.items() if hasattr(stoichiometry, 'items') else stoichiometry) \
+        if stoichiometry else []
+    return tuple(_intern(m_id) for m_id, coeff in stoichiometry), array('d', (coeff for m_id, coeff in stoichiometry))
+
+
+class _SharedElements(object):
+    """ Model element containers that still share elements with the model they were copied from.
+    The version changes every time a model is copied, so that elements know they may be shared.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.containers = WeakValueDictionary()
+
+
+_shared_elements = _SharedElements()
+
+
+class ModelElement(object):
+    """ Base class for metabolites, reactions and compartments.
+    Attributes are stored in __slots__ and metadata is only created when first accessed.
+    Elements can be shared between a model and its copies (see Model.copy), so any change in place must call
+    _before_change() first. Setting an attribute does it automatically. New elements can't be shared yet, so
+    constructors set their attributes with object.__setattr__ and skip the check.
+    """
+
+    __slots__ = ('id', 'name', '_metadata', '_version')
+
+    def __setattr__(self, name, value):
+        if self._version != _shared_elements.version:
+            self._before_change()
+        object.__setattr__(self, name, value)
+
+    def _before_change(self):
+        """ Give the model copies that still share this element their own copy of it, before it is changed.
+        Only the first change after a model copy has to look for them.
+        """
+        if self._version != _shared_elements.version:
+            for container in list(_shared_elements.containers.values()):
+                container._detach(self)
+            object.__setattr__(self, '_version', _shared_elements.version)
+
+    @property
+    def metadata(self):
+        self._before_change()
+        if self._metadata is None:
+            self._metadata = OrderedDict()
+        return self._metadata
+
+    @metadata.setter
+    def metadata(self, value):
+        self._metadata = value
+
+    def __str__(self):
+        return self.name if self.name else self.id
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for cls in type(self).__mro__ for name in getattr(cls, '__slots__', ())
+                if name != '_version'}
+
+    def __setstate__(self, state):
+        set_slot = object.__setattr__
+        set_slot(self, '_version', _shared_elements.version)
+        for name, value in state.items():
+            set_slot(self, name, value)
+
+
+class Metabolite(ModelElement):
     """ Base class for modeling metabolites. """
 
+    __slots__ = ('compartment', 'boundary', 'constant')
+
     def __init__(self, elem_id, name=None, compartment=None, boundary=False, constant=False):
         """
         Arguments:
@@ -25,35 +107,93 @@ class Metabolite(object):
             compartment (str): compartment containing the metabolite
             boundary (bool): boundary condition
         """
-        self.id = elem_id
-        self.name = name if name is not None else elem_id
-        self.compartment = compartment
-        self.boundary = boundary
-        self.constant = constant
-        self.metadata = OrderedDict()
+        set_slot = object.__setattr__
+        set_slot(self, '_version', _shared_elements.version)
+        set_slot(self, 'id', _intern(elem_id))
+        set_slot(self, 'name', name if name is not None else self.id)
+        set_slot(self, 'compartment', _intern(compartment))
+        set_slot(self, 'boundary', boundary)
+        set_slot(self, 'constant', constant)
+        set_slot(self, '_metadata', None)
 
-    def __str__(self):
-        return self.name if self.name else self.id
-
-    def __getstate__(self):
-        state = self.__dict__.copy()
-        return state
-
-    def __setstate__(self, state):
-        self.__dict__.update(state)
-
-    # TODO: 5_program_deepcopy.prof
     def copy(self):
+        """ Create a copy of the metabolite.
+
+        Returns:
+            Metabolite: metabolite copy
+        """
         met = Metabolite(elem_id=self.id, name=self.name, compartment=self.compartment, boundary=self.boundary, constant=self.constant)
-        if len(self.metadata):
-            met.metadata = OrderedDict(self.metadata)
+        if self._metadata:
+            met.metadata = deepcopy(self._metadata)
 
         return met
 
 
-class Reaction(object):
+class Stoichiometry(MutableMapping):
+    """ Ordered dictionary-like view of a reaction stoichiometry.
+    The reaction stores it as two parallel arrays: metabolite ids and coefficients.
+    """
+
+    __slots__ = ('_reaction',)
+
+    def __init__(self, reaction):
+        self._reaction = reaction
+
+    def _position(self, m_id):
+        try:
+            return self._reaction._met_ids.index(m_id)
+        except ValueError:
+            raise KeyError(m_id)
+
+    def __getitem__(self, m_id):
+        return self._reaction._coeffs[self._position(m_id)]
+
+    def __setitem__(self, m_id, coeff):
+        reaction = self._reaction
+        reaction._before_change()
+        if m_id in reaction._met_ids:
+            reaction._coeffs[reaction._met_ids.index(m_id)] = coeff
+        else:
+            reaction._met_ids += (_intern(m_id),)
+            reaction._coeffs.append(coeff)
+
+    def __delitem__(self, m_id):
+        reaction = self._reaction
+        i = self._position(m_id)
+        reaction._before_change()
+        reaction._met_ids = reaction._met_ids[:i] + reaction._met_ids[i + 1:]
+        del reaction._coeffs[i]
+
+    def __contains__(self, m_id):
+        return m_id in self._reaction._met_ids
+
+    def __iter__(self):
+        return iter(self._reaction._met_ids)
+
+    def __len__(self):
+        return len(self._reaction._met_ids)
+
+    def __repr__(self):
+        return repr(OrderedDict(self.items()))
+
+    def keys(self):
+        return list(self._reaction._met_ids)
+
+    def values(self):
+        return list(self._reaction._coeffs)
+
+    def items(self):
+        return list(zip(self._reaction._met_ids, self._reaction._coeffs))
+
+    def copy(self):
+        return OrderedDict(self.items())
+
+
+class Reaction(ModelElement):
     """ Base class for modeling reactions. """
 
+    __slots__ = ('reversible', 'is_exchange', 'is_sink', '_met_ids', '_coeffs', '_regulators')
+
     def __init__(self, elem_id, name=None, reversible=True, stoichiometry=None, regulators=None, is_exchange=None,
                  is_sink=None):
         """
@@ -64,19 +204,37 @@ class Reaction(object):
             stoichiometry (dict): stoichiometry
             regulators (dict): reaction regulators
         """
-        self.id = elem_id
-        self.name = name if name is not None else elem_id
-        self.reversible = reversible
-        self.is_exchange = is_exchange
-        self.is_sink = is_sink
-        self.stoichiometry = OrderedDict()
-        self.regulators = OrderedDict()
-        self.metadata = OrderedDict()
-
-        if stoichiometry:
-            self.stoichiometry.update(stoichiometry)
-        if regulators:
-            self.regulators.update(regulators)
+        set_slot = object.__setattr__
+        set_slot(self, '_version', _shared_elements.version)
+        set_slot(self, 'id', _intern(elem_id))
+        set_slot(self, 'name', name if name is not None else self.id)
+        set_slot(self, 'reversible', reversible)
+        set_slot(self, 'is_exchange', is_exchange)
+        set_slot(self, 'is_sink', is_sink)
+        met_ids, coeffs = _split_stoichiometry(stoichiometry)
+        set_slot(self, '_met_ids', met_ids)
+        set_slot(self, '_coeffs', coeffs)
+        set_slot(self, '_regulators', OrderedDict(regulators) if regulators else None)
+        set_slot(self, '_metadata', None)
+
+    @property
+    def stoichiometry(self):
+        return Stoichiometry(self)
+
+    @stoichiometry.setter
+    def stoichiometry(self, value):
+        self._met_ids, self._coeffs = _split_stoichiometry(value)
+
+    @property
+    def regulators(self):
+        self._before_change()
+        if self._regulators is None:
+            self._regulators = OrderedDict()
+        return self._regulators
+
+    @regulators.setter
+    def regulators(self, value):
+        self._regulators = value
 
     def __str__(self):
         return self.to_string()
@@ -88,7 +246,7 @@ class Reaction(object):
             list: reaction substrates
         """
 
-        return [m_id for m_id, coeff in self.stoichiometry.items() if coeff < 0]
+        return [m_id for m_id, coeff in zip(self._met_ids, self._coeffs) if coeff < 0]
 
     def get_products(self):
         """ Get list of reaction products
@@ -97,7 +255,7 @@ class Reaction(object):
             list: reaction products
         """
         
-        return [m_id for m_id, coeff in self.stoichiometry.items() if coeff > 0]
+        return [m_id for m_id, coeff in zip(self._met_ids, self._coeffs) if coeff > 0]
 
     def get_activators(self):
         """ Get list of reaction activators
@@ -106,7 +264,7 @@ class Reaction(object):
             list: reaction activators
         """
         
-        return [m_id for m_id, kind in self.regulators.items() if kind == '+']
+        return [m_id for m_id, kind in self._regulators.items() if kind == '+'] if self._regulators else []
 
     def get_inhibitors(self):
         """ Get list of reaction inhibitors
@@ -115,7 +273,7 @@ class Reaction(object):
             list: reaction inhibitors
         """
         
-        return [m_id for m_id, kind in self.regulators.items() if kind == '-']
+        return [m_id for m_id, kind in self._regulators.items() if kind == '-'] if self._regulators else []
 
     def to_equation_string(self, metabolite_names=None):
         """ Returns reaction equation string
@@ -134,21 +292,16 @@ class Reaction(object):
             def met_repr(m_id):
                 return m_id
 
+        stoichiometry = list(zip(self._met_ids, self._coeffs))
+
         res = ""
         res += ' + '.join([met_repr(m_id) if coeff == -1.0 else str(-coeff) + ' ' + met_repr(m_id)
-                           for m_id, coeff in self.stoichiometry.items() if coeff < 0])
+                           for m_id, coeff in stoichiometry if coeff < 0])
         res += ' <-> ' if self.reversible else ' --> '
         res += ' + '.join([met_repr(m_id) if coeff == 1.0 else str(coeff) + ' ' + met_repr(m_id)
-                           for m_id, coeff in self.stoichiometry.items() if coeff > 0])
+                           for m_id, coeff in stoichiometry if coeff > 0])
         return res
 
-    def __getstate__(self):
-        state = self.__dict__.copy()
-        return state
-
-    def __setstate__(self, state):
-        self.__dict__.update(state)
-
     def to_string(self, metabolite_names=None):
         """ Returns reaction as a string
 
@@ -161,20 +314,27 @@ class Reaction(object):
         res = self.id + ': ' + self.to_equation_string(metabolite_names=metabolite_names)
         return res
 
-    # TODO: 5_program_deepcopy.prof
     def copy(self):
+        """ Create a copy of the reaction (stoichiometry and regulators are copied, not shared).
+
+        Returns:
+            Reaction: reaction copy
+        """
         r = Reaction(elem_id=self.id, name=self.name, reversible=self.reversible, is_exchange=self.is_exchange,
-                     is_sink=self.is_sink, stoichiometry=self.stoichiometry,
-                     regulators=self.regulators)
-        if len(self.metadata):
-            r.metadata = OrderedDict(self.metadata)
+                     is_sink=self.is_sink, regulators=self._regulators)
+        r._met_ids = self._met_ids
+        r._coeffs = array('d', self._coeffs)
+        if self._metadata:
+            r.metadata = deepcopy(self._metadata)
 
         return r
 
 
-class Compartment(object):
+class Compartment(ModelElement):
     """ Base class for modeling compartments. """
 
+    __slots__ = ('size',)
+
     def __init__(self, elem_id, name=None, size=1.0):
         """
         Arguments:
@@ -182,32 +342,34 @@ class Compartment(object):
             name (str): compartment name (optional)
             size (float): compartment size (optional)
         """
-        self.id = elem_id
-        self.name = name if name is not None else elem_id
-        self.size = size
-        self.metadata = OrderedDict()
-
-    def __str__(self):
-        return self.name if self.name else self.id
-
-    def __getstate__(self):
-        state = self.__dict__.copy()
-        return state
-
-    def __setstate__(self, state):
-        self.__dict__.update(state)
+        set_slot = object.__setattr__
+        set_slot(self, '_version', _shared_elements.version)
+        set_slot(self, 'id', _intern(elem_id))
+        set_slot(self, 'name', name if name is not None else self.id)
+        set_slot(self, 'size', size)
+        set_slot(self, '_metadata', None)
 
-    # TODO: 5_program_deepcopy.prof
     def copy(self):
+        """ Create a copy of the compartment.
+
+        Returns:
+            Compartment: compartment copy
+        """
         cp = Compartment(elem_id=self.id, name=self.name, size=self.size)
-        if len(self.metadata):
-            cp.metadata = OrderedDict(self.metadata)
+        if self._metadata:
+            cp.metadata = deepcopy(self._metadata)
 
         return cp
 
 class AttrOrderedDict(OrderedDict):
+    """ Ordered dictionary whose items can also be accessed as attributes.
+    A container created with share() holds the same elements as the original one, and copies each shared element the
+    first time it is accessed, or when the element is changed through another container (see
+    ModelElement._before_change). Elements only read by the model itself are not copied (see _peek).
+    """
 
     def __init__(self, *args, **nargs):
+        self._shared = {}
         super(AttrOrderedDict, self).__init__(*args)
 
     def __getattr__(self, name):
@@ -224,6 +386,91 @@ class AttrOrderedDict(OrderedDict):
     def __dir__(self):
         return dir(OrderedDict) + list(self.keys())
 
+    def __getitem__(self, key):
+        value = OrderedDict.__getitem__(self, key)
+        if self._shared and self._shared.get(key) is value:
+            value = self._unshare(key, value)
+        return value
+
+    def __delitem__(self, key):
+        OrderedDict.__delitem__(self, key)
+        if self._shared:
+            self._shared.pop(key, None)
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key, *default):
+        if key not in self:
+            return OrderedDict.pop(self, key, *default)
+        value = self[key]
+        del self[key]
+        return value
+
+    def popitem(self, last=True):
+        if not self:
+            raise KeyError('dictionary is empty')
+        key = next(reversed(self)) if last else next(iter(self))
+        return key, self.pop(key)
+
+    def values(self):
+        self._unshare_all()
+        return OrderedDict.values(self)
+
+    def items(self):
+        self._unshare_all()
+        return OrderedDict.items(self)
+
+    def share(self):
+        """ Create a container with the same items, which shares the elements with this one until they are accessed
+        or changed.
+
+        Returns:
+            AttrOrderedDict: container copy
+        """
+        items = OrderedDict.items(self)
+        container = AttrOrderedDict(items)
+        container._shared = dict(items)
+        _shared_elements.version += 1
+        if container._shared:
+            _shared_elements.containers[id(container)] = container
+        return container
+
+    def _peek(self, key):
+        """ Read-only access to an item, without copying it if it is shared. """
+        return OrderedDict.__getitem__(self, key)
+
+    def _peek_values(self):
+        """ Read-only access to the values, without copying the shared ones. """
+        return OrderedDict.values(self)
+
+    def _peek_items(self):
+        """ Read-only access to the items, without copying the shared ones. """
+        return OrderedDict.items(self)
+
+    def _unshare(self, key, value):
+        del self._shared[key]
+        if OrderedDict.get(self, key) is value:
+            value = value.copy()
+            OrderedDict.__setitem__(self, key, value)
+        if not self._shared:
+            _shared_elements.containers.pop(id(self), None)
+        return value
+
+    def _unshare_all(self):
+        if self._shared:
+            for key, value in list(self._shared.items()):
+                self._unshare(key, value)
+
+    def _detach(self, element):
+        if self._shared.get(element.id) is element:
+            self._unshare(element.id, element)
+
     def __copy__(self):
         my_copy = AttrOrderedDict()
         for key, val in self.items():
@@ -232,12 +479,13 @@ class AttrOrderedDict(OrderedDict):
 
     def __deepcopy__(self, memo):
         my_copy = AttrOrderedDict()
-        for key, val in self.items():
+        for key, val in self._peek_items():
             my_copy[key] = deepcopy(val)
         return my_copy
 
     def __getstate__(self):
         state = self.__dict__.copy()
+        state['_shared'] = {}
         return state
 
     def __setstate__(self, state):
@@ -262,11 +510,63 @@ class Model(object):
         self._m_r_lookup = None
         self._reg_lookup = None
         self._s_matrix = None
+        self._s_columns = None
+        self._s_column_index = None
+        self._s_dirty = set()
+        self._s_removed = set()
+        self._m_index = None
+        self._r_index = None
         self._parser = None
 
     def _clear_temp(self):
         self._m_r_lookup = None
         self._reg_lookup = None
+        self._clear_s_matrix()
+        self._m_index = None
+        self._r_index = None
+
+    def _clear_s_matrix(self):
+        self._s_matrix = None
+        self._s_columns = None
+        self._s_column_index = None
+        self._s_dirty = set()
+        self._s_removed = set()
+
+    def _add_metabolite_to_temp(self, m_id):
+        if self._m_r_lookup is not None:
+            self._m_r_lookup.setdefault(m_id, OrderedDict())
+        if self._reg_lookup is not None:
+            self._reg_lookup.setdefault(m_id, OrderedDict())
+        if self._m_index is not None and m_id not in self._m_index:
+            self._m_index[m_id] = len(self._m_index)
+        # new metabolites only add rows, but reactions that already refer to them need their columns rebuilt
+        if self._m_r_lookup is not None:
+            self._s_dirty.update(self._m_r_lookup[m_id])
+        else:
+            self._s_columns = None
+        self._s_matrix = None
+
+    def _add_reaction_to_temp(self, reaction):
+        if self._m_r_lookup is not None:
+            for m_id, coeff in reaction.stoichiometry.items():
+                self._m_r_lookup.setdefault(m_id, OrderedDict())[reaction.id] = coeff
+        if self._reg_lookup is not None and reaction._regulators:
+            for m_id, kind in reaction._regulators.items():
+                self._reg_lookup.setdefault(m_id, OrderedDict())[reaction.id] = kind
+        if self._r_index is not None and reaction.id not in self._r_index:
+            self._r_index[reaction.id] = len(self._r_index)
+        self._s_dirty.add(reaction.id)
+        self._s_matrix = None
+
+    def _remove_reaction_from_temp(self, reaction):
+        if self._m_r_lookup is not None:
+            for m_id in reaction.stoichiometry:
+                if m_id in self._m_r_lookup:
+                    self._m_r_lookup[m_id].pop(reaction.id, None)
+        if self._reg_lookup is not None and reaction._regulators:
+            for m_id in reaction._regulators:
+                if m_id in self._reg_lookup:
+                    self._reg_lookup[m_id].pop(reaction.id, None)
         self._s_matrix = None
 
     def __getstate__(self):
@@ -279,13 +579,23 @@ class Model(object):
 
     def copy(self):
         """ Create an identical copy of the model.
+        Metabolites, reactions and compartments are shared with the original model (copy-on-write): an element is
+        only copied the first time it is accessed through the copy, or when it is changed in the original model.
+        Changes to either model never show in the other one, as with a deepcopy.
 
         Returns:
             Model: model copy
 
         """
-        self._updated = False
-        return deepcopy(self)
+        model_copy = copy(self)
+        model_copy.metabolites = self.metabolites.share()
+        model_copy.reactions = self.reactions.share()
+        model_copy.compartments = self.compartments.share()
+        model_copy.metadata = deepcopy(self.metadata)
+        model_copy._clear_temp()
+        model_copy._parser = None
+
+        return model_copy
 
     def get_exchange_reactions(self, include_sink=False):
         """
@@ -297,7 +607,7 @@ class Model(object):
         Returns: list
         """
 
-        return [rxn.id for rxn in self.reactions.values() if rxn.is_exchange or include_sink and rxn.is_sink]
+        return [rxn.id for rxn in self.reactions._peek_values() if rxn.is_exchange or include_sink and rxn.is_sink]
 
     def get_sink_reactions(self):
         """
@@ -305,7 +615,7 @@ class Model(object):
 
         Returns: list
         """
-        return [rxn.id for rxn in self.reactions.values() if rxn.is_sink]
+        return [rxn.id for rxn in self.reactions._peek_values() if rxn.is_sink]
 
     def add_metabolite(self, metabolite, clear_tmp=True):
         """ Add a single metabolite to the model.
@@ -314,11 +624,12 @@ class Model(object):
 
         Arguments:
             metabolite (Metabolite): metabolite to add
+            clear_tmp (bool): update the cached topology lookups (default: True)
         """
         if metabolite.compartment in self.compartments or not metabolite.compartment:
             self.metabolites[metabolite.id] = metabolite
             if clear_tmp:
-                self._clear_temp()
+                self._add_metabolite_to_temp(metabolite.id)
         else:
             raise KeyError("Failed to add metabolite '{}' (invalid compartment)".format(metabolite.id))
 
@@ -328,10 +639,13 @@ class Model(object):
 
         Arguments:
             reaction (Reaction): reaction to add
+            clear_tmp (bool): update the cached topology lookups (default: True)
         """
-        self.reactions[reaction.id] = reaction
         if clear_tmp:
-            self._clear_temp()
+            if reaction.id in self.reactions:
+                self._remove_reaction_from_temp(self.reactions._peek(reaction.id))
+            self._add_reaction_to_temp(reaction)
+        self.reactions[reaction.id] = reaction
 
     def add_compartment(self, compartment):
         """ Add a single compartment to the model.
@@ -359,11 +673,17 @@ class Model(object):
             else:
                 warnings.warn("No such metabolite '{}'".format(m_id),  RuntimeWarning)
 
-            if safe_delete:
+            if safe_delete and m_id in m_r_lookup:
                 for r_id in m_r_lookup[m_id]:
                     del self.reactions[r_id].stoichiometry[m_id]
 
-        self._clear_temp()
+            if self._m_r_lookup is not None:
+                self._m_r_lookup.pop(m_id, None)
+            if self._reg_lookup is not None:
+                self._reg_lookup.pop(m_id, None)
+
+        self._m_index = None
+        self._clear_s_matrix()
 
     def remove_metabolite(self, m_id):
         """ Remove a single metabolite from the model.
@@ -381,10 +701,13 @@ class Model(object):
         """
         for r_id in id_list:
             if r_id in self.reactions:
+                self._remove_reaction_from_temp(self.reactions._peek(r_id))
+                self._s_removed.add(r_id)
                 del self.reactions[r_id]
             else:
                 warnings.warn("No such reaction '{}'".format(r_id), RuntimeWarning)
-        self._clear_temp()
+
+        self._r_index = None
 
     def remove_reaction(self, r_id):
         """ Remove a single reaction from the model.
@@ -425,7 +748,7 @@ class Model(object):
             self.remove_reactions(target_rxns)
 
         if delete_metabolites:
-            target_mets = [m_id for m_id, met in self.metabolites.items() if met.compartment in c_ids]
+            target_mets = [m_id for m_id, met in self.metabolites._peek_items() if met.compartment in c_ids]
             self.remove_metabolites(target_mets)
 
     def get_metabolite_producers(self, m_id, reversible=False):
@@ -442,7 +765,7 @@ class Model(object):
 
         producers = []
         for r_id, coeff in table[m_id].items():
-            if coeff > 0 or reversible and self.reactions[r_id].reversible:
+            if coeff > 0 or reversible and self.reactions._peek(r_id).reversible:
                 producers.append(r_id)
 
         return producers
@@ -461,7 +784,7 @@ class Model(object):
 
         consumers = []
         for r_id, coeff in table[m_id].items():
-            if coeff < 0 or reversible and self.reactions[r_id].reversible:
+            if coeff < 0 or reversible and self.reactions._peek(r_id).reversible:
                 consumers.append(r_id)
 
         return consumers
@@ -488,51 +811,170 @@ class Model(object):
         return [r_id for r_id, kind in table[m_id].items() if kind == '-']
 
     def get_reaction_compartments(self, r_id):
-        reaction = self.reactions[r_id]
+        reaction = self.reactions._peek(r_id)
         compounds = reaction.get_substrates() + reaction.get_products()
-        compartments = [self.metabolites[m_id].compartment for m_id in compounds]
+        compartments = [self.metabolites._peek(m_id).compartment for m_id in compounds]
         return set(compartments)
 
     def metabolite_reaction_lookup(self, force_recalculate=False):
-        """ Return the network topology as a nested map from metabolite to reaction to coefficient
+        """ Return the network topology as a nested map from metabolite to reaction to coefficient.
+        Once built, the table is kept up to date as reactions and metabolites are added or removed.
+
+        Arguments:
+            force_recalculate (bool): rebuild the table from scratch (default: False)
 
         Returns:
             dict: lookup table
         """
 
-        if not self._m_r_lookup or force_recalculate:
+        if self._m_r_lookup is None or force_recalculate:
             self._m_r_lookup = OrderedDict([(m_id, OrderedDict()) for m_id in self.metabolites])
 
-            for r_id, reaction in self.reactions.items():
+            for r_id, reaction in self.reactions._peek_items():
                 for m_id, coeff in reaction.stoichiometry.items():
                     self._m_r_lookup[m_id][r_id] = coeff
 
         return self._m_r_lookup
 
     def regulatory_lookup(self):
-        if not self._reg_lookup:
+        if self._reg_lookup is None:
             self._reg_lookup = OrderedDict([(m_id, OrderedDict()) for m_id in self.metabolites])
 
-            for r_id, reaction in self.reactions.items():
-                for m_id, kind in reaction.regulators.items():
-                    self._reg_lookup[m_id][r_id] = kind
+            for r_id, reaction in self.reactions._peek_items():
+                if reaction._regulators:
+                    for m_id, kind in reaction._regulators.items():
+                        self._reg_lookup[m_id][r_id] = kind
 
         return self._reg_lookup
 
-    def stoichiometric_matrix(self):
-        """ Return a stoichiometric matrix (as a list of lists)
+    def metabolite_index(self):
+        """ Return the row index of each metabolite in the stoichiometric matrix
 
         Returns:
-            list: stoichiometric matrix
+            dict: map from metabolite id to row index
+        """
+
+        if self._m_index is None:
+            self._m_index = OrderedDict([(m_id, i) for i, m_id in enumerate(self.metabolites)])
+
+        return self._m_index
+
+    def reaction_index(self):
+        """ Return the column index of each reaction in the stoichiometric matrix
+
+        Returns:
+            dict: map from reaction id to column index
         """
 
-        if not self._s_matrix:
-            self._s_matrix = [[reaction.stoichiometry[m_id] if m_id in reaction.stoichiometry else 0
-                               for reaction in self.reactions.values()]
-                              for m_id in self.metabolites]
+        if self._r_index is None:
+            self._r_index = OrderedDict([(r_id, j) for j, r_id in enumerate(self.reactions)])
+
+        return self._r_index
+
+    def sparse_stoichiometric_matrix(self):
+        """ Return the stoichiometric matrix as a sparse matrix in CSR format.
+        Rows and columns follow metabolite_index() and reaction_index() respectively.
+
+        Notes:
+            After reactions are added, replaced or removed, only the columns of the added or replaced reactions are
+            built again, the other columns are taken from the previous matrix. The cost of a read after an edit
+            depends on the number of edited reactions in python, plus a copy of the matrix arrays in numpy
+            (proportional to the number of nonzeros). Removing metabolites rebuilds the whole matrix.
+
+        Returns:
+            scipy.sparse.csr_matrix: stoichiometric matrix (metabolites x reactions)
+        """
+
+        if self._s_matrix is None:
+            m_index = self.metabolite_index()
+            n_mets = len(self.metabolites)
+
+            if self._s_columns is None:
+                s_columns = self._get_s_columns(self.reactions._peek_values(), m_index, n_mets)
+                s_column_index = dict(zip(self.reactions, range(len(self.reactions))))
+            else:
+                old_columns = self._s_columns
+                old_column_index = self._s_column_index
+                n_old = old_columns.shape[1]
+
+                # removed reactions drop their column, the others keep their order
+                keep = np.ones(n_old, dtype=bool)
+                keep[[old_column_index[r_id] for r_id in self._s_removed if r_id in old_column_index]] = False
+                selected = np.flatnonzero(keep)
+
+                # reactions replaced in place get a new column at the same position
+                replaced = [r_id for r_id in self._s_dirty
+                            if r_id in old_column_index and keep[old_column_index[r_id]] and r_id in self.reactions]
+                replaced_pos = np.searchsorted(selected, [old_column_index[r_id] for r_id in replaced])
+
+                # new reactions are always at the end of self.reactions
+                n_added = len(self.reactions) - len(selected)
+                added = list(islice(reversed(self.reactions), n_added))[::-1]
+
+                new_columns = self._get_s_columns([self.reactions._peek(r_id) for r_id in replaced + added], m_index,
+                                                   n_mets)
+                selected[replaced_pos.astype(int)] = n_old + np.arange(len(replaced))
+                selected = np.concatenate([selected, n_old + len(replaced) + np.arange(n_added)]).astype(int)
+
+                old_columns = sparse.csc_matrix((old_columns.data, old_columns.indices, old_columns.indptr),
+                                                shape=(n_mets, n_old))
+                s_columns = sparse.hstack([old_columns, new_columns], format='csc')[:, selected]
+
+                if self._s_removed:
+                    s_column_index = dict(zip(self.reactions, range(len(self.reactions))))
+                else:
+                    s_column_index = old_column_index
+                    s_column_index.update(zip(added, range(n_old, n_old + n_added)))
+
+            self._s_columns = s_columns
+            self._s_column_index = s_column_index
+            self._s_dirty = set()
+            self._s_removed = set()
+            self._s_matrix = s_columns.tocsr()
 
         return self._s_matrix
 
+    @staticmethod
+    def _get_s_columns(reactions, m_index, n_mets):
+        """ Build the stoichiometric matrix columns of a list of reactions.
+
+        Arguments:
+            reactions (list): reactions
+            m_index (dict): map from metabolite id to row index
+            n_mets (int): number of rows
+
+        Returns:
+            scipy.sparse.csc_matrix: stoichiometric matrix columns (metabolites x reactions)
+        """
+
+        rows, cols, coeffs = [], [], []
+
+        for j, reaction in enumerate(reactions):
+            for m_id, coeff in zip(reaction._met_ids, reaction._coeffs):
+                if m_id in m_index:
+                    rows.append(m_index[m_id])
+                    cols.append(j)
+                    coeffs.append(coeff)
+
+        s_columns = sparse.csc_matrix((coeffs, (rows, cols)), shape=(n_mets, len(reactions)), dtype=float)
+        s_columns.eliminate_zeros()
+
+        return s_columns
+
+    def stoichiometric_matrix(self, as_array=False):
+        """ Return a dense stoichiometric matrix (as a list of lists)
+
+        Arguments:
+            as_array (bool): return a numpy array instead of a list of lists (default: False)
+
+        Returns:
+            list: stoichiometric matrix
+        """
+
+        s_matrix = self.sparse_stoichiometric_matrix().toarray()
+
+        return s_matrix if as_array else s_matrix.tolist()
+
     def print_reaction(self, r_id, use_metabolite_names=False):
         """ Print a reaction to a text based representation.
 
@@ -545,10 +987,10 @@ class Model(object):
         """
 
         if use_metabolite_names:
-            metabolite_names = {m_id: met.name for m_id, met in self.metabolites.items()}
-            return self.reactions[r_id].to_string(metabolite_names)
+            metabolite_names = {m_id: met.name for m_id, met in self.metabolites._peek_items()}
+            return self.reactions._peek(r_id).to_string(metabolite_names)
         else:
-            return self.reactions[r_id].to_string()
+            return self.reactions._peek(r_id).to_string()
 
     def to_string(self, use_metabolite_names=False):
         """ Print the model to a text based representation.
@@ -580,7 +1022,7 @@ class Model(object):
         """
 
         if not self._parser:
-            self._parser = ReactionParser()
+            self._parser = ReactionParser(mode='tokenizer')
 
         r_id, reversible, stoichiometry = self._parser.parse_reaction(reaction_str)
 
@@ -593,6 +1035,53 @@ class Model(object):
 
         return r_id
 
+    def add_reactions_from_strs(self, reaction_strs, default_compartment=None):
+        """ Parse a list of reactions from strings and add them all to the model in one pass.
+
+        Arguments:
+            reaction_strs (list): string representations of the reactions
+            default_compartment (str): default compartment id for new metabolites (optional)
+
+        Returns:
+            list: ids of the added reactions
+
+        Notes:
+            Same as calling add_reaction_from_str for each string, but new metabolites are created in a single batch
+            and the topology lookups are rebuilt only once, when they are next needed.
+        """
+
+        if not self._parser:
+            self._parser = ReactionParser(mode='tokenizer')
+
+        parse_reaction = self._parser.parse_reaction
+
+        return self.add_reactions_from_tuples([parse_reaction(reaction_str) for reaction_str in reaction_strs],
+                                              default_compartment=default_compartment)
+
+    def add_reactions_from_tuples(self, reactions, default_compartment=None):
+        """ Add a list of already parsed reactions to the model in one pass.
+
+        Arguments:
+            reactions (list): (reaction id, reversible, stoichiometry) tuples, as returned by ReactionParser
+            default_compartment (str): default compartment id for new metabolites (optional)
+
+        Returns:
+            list: ids of the added reactions
+        """
+
+        if default_compartment and default_compartment not in self.compartments:
+            raise KeyError("Failed to add metabolites (invalid compartment '{}')".format(default_compartment))
+
+        new_reactions = [Reaction(r_id, r_id, reversible, stoichiometry) for r_id, reversible, stoichiometry in reactions]
+
+        met_ids = OrderedDict.fromkeys(m_id for reaction in new_reactions for m_id in reaction._met_ids)
+        self.metabolites.update((m_id, Metabolite(m_id, m_id, compartment=default_compartment))
+                                for m_id in met_ids if m_id not in self.metabolites)
+        self.reactions.update((reaction.id, reaction) for reaction in new_reactions)
+        self._clear_temp()
+
+        return [reaction.id for reaction in new_reactions]
+
     def get_boundary_metabolites(self):
         """ Get list of boundary metabolites in this model
 
@@ -600,7 +1089,7 @@ class Model(object):
             list: boundary metabolites
 
         """
-        return [m_id for m_id, met in self.metabolites.items() if met.boundary]
+        return [m_id for m_id, met in self.metabolites._peek_items() if met.boundary]
 
     def __getstate__(self):
         state = self.__dict__.copy()
@@ -623,4 +1112,4 @@ class Model(object):
 
         assert c_id in list(self.compartments.keys()), 'No such compartment: ' + c_id
 
-        return [m_id for m_id, met in self.metabolites.items() if met.compartment == c_id]
+        return [m_id for m_id, met in self.metabolites._peek_items() if met.compartment == c_id]
@@ -6,7 +6,8 @@ pattern format currently accepted by GRASP.
 import os
 
 import numpy as np
-import pandas as pd
+
+from set_up_grasp_models.io.workbook import read_workbook
 
 
 def _get_enz_states(er_mech: str) -> list:
@@ -212,7 +213,7 @@ def generate_mechanisms(file_in_model: str, mech_in_dir: str, pattern_out_dir: s
     hard_coded_mechs = {'massAction', 'diffusion', 'fixedExchange', 'freeExchange'} if not hard_coded_mechs \
         else set(hard_coded_mechs)
 
-    kinetics_df = pd.read_excel(file_in_model, sheet_name='kinetics1')
+    kinetics_df = read_workbook(file_in_model, sheet_name='kinetics1')
 
     for ind, mech in enumerate(kinetics_df['kinetic mechanism']):
 
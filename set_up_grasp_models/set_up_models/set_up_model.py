@@ -2,9 +2,11 @@ import numpy as np
 import pandas as pd
 
 from set_up_grasp_models.io.plaintext import import_model_from_plaintext
+from set_up_grasp_models.io.workbook import LazyWorkbook
 from set_up_grasp_models.set_up_models.set_up_mets import _get_mets_conc, _set_up_thermo_mets, _set_up_mets_data
 from set_up_grasp_models.set_up_models.set_up_thermo_rxns import _set_up_model_thermo_rxns
 from set_up_grasp_models.set_up_models.set_up_meas_rates import _get_meas_fluxes, _set_up_meas_rates
+from set_up_grasp_models.set_up_models.thermo_backends import DGBackend
 
 
 def get_stoic(file_in: str) -> tuple:
@@ -23,8 +25,8 @@ def get_stoic(file_in: str) -> tuple:
     mets_order = list(model.metabolites.keys())
     rxns_order = list(model.reactions.keys())
 
-    stoic_df = pd.DataFrame(model.stoichiometric_matrix(), columns=rxns_order, index=mets_order)
-    stoic_df = stoic_df.transpose()
+    s_matrix = model.sparse_stoichiometric_matrix()
+    stoic_df = pd.DataFrame(s_matrix.transpose().toarray(), index=rxns_order, columns=mets_order)
     stoic_df.index.name = 'rxn ID'
 
     return stoic_df, rxn_list, mets_order, rxns_order
@@ -50,9 +52,10 @@ def update_stoic(stoic_df: pd.DataFrame, ex_rxns: list, ex_mets: list, non_ex_me
     ex_rxns_to_remove = all_ex_rxns.difference(ex_rxns)
 
     stoic_df = stoic_df.drop(ex_rxns_to_remove)
-    ex_mets_to_remove = stoic_df.loc[:, (stoic_df == 0).all(axis=0)].columns.values
+    active_mets = (stoic_df.values != 0).any(axis=0)
+    ex_mets_to_remove = stoic_df.columns.values[~active_mets]
 
-    stoic_df = stoic_df.loc[:, (stoic_df != 0).any(axis=0)]
+    stoic_df = stoic_df.loc[:, active_mets]
 
     if non_ex_mets_order:
         non_ex_mets_order.extend(ex_mets)
@@ -157,10 +160,12 @@ def _add_thermo_ineq_constraints_sheet(writer, base_df: pd.DataFrame, mets_order
 
 
 def _add_thermo_rxns(writer, base_df: pd.DataFrame, rxns_order: list, rxn_list: list, use_equilibrator: bool,
-                     file_bigg_kegg_ids: str, pH: float, ionic_strength: float):
+                     file_bigg_kegg_ids: str, pH: float, ionic_strength: float, dG_cache_file: str = None,
+                     kegg_id_resolution: str = 'interactive', dG_backend: DGBackend = None):
 
     thermo_rxns_df = _set_up_model_thermo_rxns(base_df, rxns_order, rxn_list, use_equilibrator, file_bigg_kegg_ids,
-                                               pH, ionic_strength)
+                                               pH, ionic_strength, dG_cache_file=dG_cache_file,
+                                               kegg_id_resolution=kegg_id_resolution, dG_backend=dG_backend)
     thermo_rxns_df.to_excel(writer, sheet_name='thermoRxns')
 
     return writer
@@ -225,7 +230,8 @@ def _add_kinetics_sheet(writer, base_df: pd.DataFrame, rxns_order: list):
 def set_up_model(model_name: str, file_in_stoic: str, base_excel_file: str, file_out: str,
                  use_equilibrator: bool = False, pH: float = 7.0, ionic_strength: float = 0.1,
                  file_bigg_kegg_ids: str = None, file_in_mets_conc: str = None, mets_orient: str = 'columns',
-                 file_in_meas_fluxes: str = None, fluxes_orient: str = 'columns', file_in_prot_ranges: str = None):
+                 file_in_meas_fluxes: str = None, fluxes_orient: str = 'columns', file_in_prot_ranges: str = None,
+                 dG_cache_file: str = None, kegg_id_resolution: str = 'interactive', dG_backend: DGBackend = None):
     """
     Sets up the excel input model file template. A base excel file must be given. This file must contain at least
     the general sheet, for that one can use the file 'GRASP_general.xlsx' in base_files. In this case an excel
@@ -257,6 +263,12 @@ def set_up_model(model_name: str, file_in_stoic: str, base_excel_file: str, file
         file_in_meas_fluxes: path to excel file containing measured fluxes (not in use atm).
         fluxes_orient: string specifying the orientation of measured fluxes, either 'rows' or 'columns'.
         file_in_prot_ranges: path to excel file containing protein concentrations (not in use atm).
+        dG_cache_file: path to a SQLite file used to cache the standard Gibbs energies from eQuilibrator (optional).
+        kegg_id_resolution: how to choose the KEGG id of metabolites with multiple or no KEGG matches, either
+                            'interactive', 'first', 'most-referenced', 'skip', or the path to a resolution table.
+                            Use anything but 'interactive' for unattended runs.
+        dG_backend: provider of the standard Gibbs energies, by default eQuilibrator. Use e.g.
+                    thermo_backends.TableBackend to set up the model offline with precomputed values.
 
     Returns:
         None
@@ -264,7 +276,7 @@ def set_up_model(model_name: str, file_in_stoic: str, base_excel_file: str, file
 
     writer = pd.ExcelWriter(file_out, engine='xlsxwriter')
 
-    base_df = pd.read_excel(base_excel_file, index_col=0, header=0, sheet_name=None)
+    base_df = LazyWorkbook(base_excel_file, index_col=0, header=0)
 
     writer = _add_general_sheet(writer, base_df, base_excel_file, model_name)
 
@@ -282,7 +294,8 @@ def set_up_model(model_name: str, file_in_stoic: str, base_excel_file: str, file
     writer = _add_thermo_ineq_constraints_sheet(writer, base_df, mets_order)
 
     writer = _add_thermo_rxns(writer, base_df, rxns_order, rxn_list, use_equilibrator, file_bigg_kegg_ids, pH,
-                              ionic_strength)
+                              ionic_strength, dG_cache_file=dG_cache_file, kegg_id_resolution=kegg_id_resolution,
+                              dG_backend=dG_backend)
 
     writer = _add_meas_rates_sheet(writer, base_df, file_in_meas_fluxes, rxns_order, fluxes_orient)
 
@@ -5,13 +5,44 @@ format "R_FBA: m_g3p_c + m_dhap_c <-> m_fdp_c". BiGG IDs must be used for metabo
 
 import re
 import os
-from math import isnan
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from math import ceil
 import numpy as np
 import pandas as pd
-from equilibrator_api import ComponentContribution, Reaction, Q_, ccache, parse_reaction_formula
-from equilibrator_cache.exceptions import MissingDissociationConstantsException
 
+from set_up_grasp_models.io.bigg_kegg_map import BiggKeggMap, load_bigg_to_kegg_map
 from set_up_grasp_models.model.parser import ReactionParser
+from set_up_grasp_models.set_up_models.thermo_backends import DGBackend, EquilibratorBackend
+from set_up_grasp_models.set_up_models.thermo_cache import DGCache, get_canonical_kegg_rxn
+
+
+KEGG_ID_RESOLUTION_POLICIES = ('interactive', 'first', 'most-referenced', 'skip')
+
+# backends used by a worker process, keyed by backend class and version, so that they are set up only once per worker
+_worker_dG_backends = {}
+
+
+def load_kegg_id_resolution_table(file_in: str) -> dict:
+    """
+    Reads a resolution table, i.e. a csv file with the columns bigg_id and kegg_id, that says which KEGG id to use
+    for BiGG ids that have multiple or no KEGG matches. An empty kegg_id means that all reactions involving that
+    metabolite should be ignored. The table is meant to be kept with the model files, so that batch runs always make
+    the same choices without asking.
+
+    Args:
+        file_in: path to the resolution table.
+
+    Returns:
+        Dictionary with bigg ids as keys and the KEGG id to use (or '') as values.
+    """
+
+    resolution_df = pd.read_csv(file_in, dtype=str, keep_default_na=False)
+
+    if not {'bigg_id', 'kegg_id'}.issubset(resolution_df.columns):
+        raise KeyError(f'The resolution table {file_in} must have the columns "bigg_id" and "kegg_id".')
+
+    return dict(zip(resolution_df['bigg_id'].str.strip(), resolution_df['kegg_id'].str.strip()))
 
 
 def _parse_rxns(rxn_list: list) -> set:
@@ -26,21 +57,33 @@ def _parse_rxns(rxn_list: list) -> set:
     return met_bigg_ids
 
 
-def _convert_met_ids_to_kegg(met_bigg_ids: set, map_bigg_to_kegg_ids: pd.DataFrame):
+def _convert_met_ids_to_kegg(met_bigg_ids: set, map_bigg_to_kegg_ids, resolution: str = 'interactive'):
+
+    if isinstance(map_bigg_to_kegg_ids, pd.DataFrame):
+        map_bigg_to_kegg_ids = BiggKeggMap.from_dataframe(map_bigg_to_kegg_ids)
+
+    resolution_table = {}
+    if resolution not in KEGG_ID_RESOLUTION_POLICIES:
+        if not os.path.isfile(resolution):
+            raise ValueError(f'Invalid KEGG id resolution "{resolution}". It must be one of ' +
+                             f'{KEGG_ID_RESOLUTION_POLICIES} or the path to a resolution table file.')
+        resolution_table = load_kegg_id_resolution_table(resolution)
 
     mets_without_kegg_id = []
     mets_kegg_dic = {}
+    unresolved_mets = {}
 
     for met in met_bigg_ids:
         try:
             bigg_id = re.findall('m_(\S+)_\w+$', met)[0]
 
             try:
-                kegg_ids = map_bigg_to_kegg_ids.loc[bigg_id]
-                mets_kegg_dic[bigg_id] = [kegg_ids['id_kegg']] if type(kegg_ids) is pd.Series else list(
-                    kegg_ids['id_kegg'])
+                mets_kegg_dic[bigg_id] = list(map_bigg_to_kegg_ids[bigg_id])
+
+                if bigg_id in resolution_table:
+                    mets_kegg_dic[bigg_id] = [resolution_table[bigg_id]] if resolution_table[bigg_id] else []
 
-                if len(mets_kegg_dic[bigg_id]) > 1:
+                elif len(mets_kegg_dic[bigg_id]) > 1 and resolution == 'interactive':
                     id_to_keep = ''
 
                     while not id_to_keep:
@@ -48,11 +91,27 @@ def _convert_met_ids_to_kegg(met_bigg_ids: set, map_bigg_to_kegg_ids: pd.DataFra
                                            f' Please type below the one you want to keep from: {mets_kegg_dic[bigg_id]}:\n')
                     mets_kegg_dic[bigg_id] = [id_to_keep]
 
-                if type(mets_kegg_dic[bigg_id][0]) is not str and isnan(mets_kegg_dic[bigg_id][0]):
+                elif len(mets_kegg_dic[bigg_id]) > 1 and resolution == 'first':
+                    mets_kegg_dic[bigg_id] = mets_kegg_dic[bigg_id][:1]
+
+                elif len(mets_kegg_dic[bigg_id]) > 1 and resolution == 'most-referenced':
+                    kegg_id_counts = map_bigg_to_kegg_ids.kegg_id_counts()
+                    mets_kegg_dic[bigg_id] = [max(mets_kegg_dic[bigg_id], key=lambda kegg_id: kegg_id_counts[kegg_id])]
+
+                elif len(mets_kegg_dic[bigg_id]) > 1:
+                    unresolved_mets[bigg_id] = mets_kegg_dic[bigg_id]
+                    mets_kegg_dic[bigg_id] = []
+
+                if not mets_kegg_dic[bigg_id]:
                     id_to_keep = ''
                     mets_kegg_dic[bigg_id] = ''
-                    id_to_keep = input(f'No KEGG id was found for {bigg_id}. If you know it, please insert it below,' +
-                                       f'otherwise all reaction involving {bigg_id} will be ignored.\n')
+
+                    if resolution == 'interactive':
+                        id_to_keep = input(f'No KEGG id was found for {bigg_id}. If you know it, please insert it ' +
+                                           f'below, otherwise all reaction involving {bigg_id} will be ignored.\n')
+                    elif bigg_id not in resolution_table:
+                        unresolved_mets.setdefault(bigg_id, [])
+
                     if id_to_keep:
                         mets_kegg_dic[bigg_id] = [id_to_keep]
                     else:
@@ -66,38 +125,96 @@ def _convert_met_ids_to_kegg(met_bigg_ids: set, map_bigg_to_kegg_ids: pd.DataFra
             raise SyntaxError(f'Didn\'t find any matches for {met} in the stoichiometry matrix. ' +
                               f'Make sure metabolite ids have the form "m_biggId_compartment".')
 
+    if unresolved_mets:
+        print(f'The KEGG id of the following metabolites could not be resolved with "{resolution}", all reactions ' +
+              'involving them will be ignored (add them to a resolution table to fix this):')
+        for bigg_id, kegg_ids in sorted(unresolved_mets.items()):
+            print(f'  {bigg_id}: ' + (', '.join(kegg_ids) if kegg_ids else 'no KEGG id found'))
+
     return mets_kegg_dic, mets_without_kegg_id
 
 
+class KeggReaction(object):
+    """
+    Reaction in terms of KEGG ids, as returned by convert_rxns_to_kegg.
+
+    Substrates and products are kept in the order and with the coefficients of the original reaction, so that the
+    formula is the same as writing the original reaction with KEGG ids, e.g. C00118 + C00111 = C00354.
+    """
+
+    __slots__ = ('id', 'substrates', 'products')
+
+    def __init__(self, rxn_id: str, substrates: list, products: list):
+        """
+        Args:
+            rxn_id: reaction id.
+            substrates: list of (KEGG id, coefficient) tuples, with positive coefficients.
+            products: list of (KEGG id, coefficient) tuples, with positive coefficients.
+        """
+
+        self.id = rxn_id
+        self.substrates = substrates
+        self.products = products
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.id!r}, {self.formula!r})'
+
+    @property
+    def formula(self) -> str:
+        """ Reaction formula with KEGG ids, e.g. C00118 + C00111 = C00354. """
+
+        return ' = '.join(' + '.join(kegg_id if coeff == 1 else f'{coeff:g} {kegg_id}' for kegg_id, coeff in side)
+                          for side in (self.substrates, self.products))
+
+    @property
+    def stoichiometry(self) -> dict:
+        """ Net stoichiometry with KEGG ids as keys, compounds that cancel out are left out. """
+
+        stoichiometry = {}
+        for sense, side in ((-1, self.substrates), (1, self.products)):
+            for kegg_id, coeff in side:
+                stoichiometry[kegg_id] = stoichiometry.get(kegg_id, 0) + sense * coeff
+
+        return {kegg_id: coeff for kegg_id, coeff in stoichiometry.items() if coeff != 0}
+
+
 def _convert_rxn_str_to_kegg_ids(rxn_list: list, mets_kegg_dic: dict, mets_without_kegg_id: list) -> dict:
 
+    parser = ReactionParser(mode='tokenizer')
+    mets_without_kegg_id = set(mets_without_kegg_id)
+    met_kegg_ids = {}
+
     rxn_dict = {}
     for rxn_str in rxn_list:
-        if not rxn_str.startswith('R_EX_'):
-            try:
-                rxn_id = re.findall('(R_\S+):', rxn_str)[0]
-            except IndexError:
-                raise SyntaxError('Didn\'t match reaction id. Make sure the reaction id has the format "R_rxnId" ' +
-                                  'and is followed by ":".')
+        r_id, reversible, stoichiometry = parser.parse_reaction(rxn_str)
 
-            rxn_str = re.sub('R_\S+:\s*', '', rxn_str)
+        if not r_id.startswith('R_'):
+            raise SyntaxError('Didn\'t match reaction id. Make sure the reaction id has the format "R_rxnId" ' +
+                              'and is followed by ":".')
 
-            if mets_without_kegg_id:
-                for met in mets_without_kegg_id:
-                    if rxn_str.find(met) == -1:
-                        rxn_str = re.sub('m_(\S+)_\w+', lambda m: mets_kegg_dic[m.group(1)][0], rxn_str)
-                        rxn_str = rxn_str.replace('<->', '=')
-                        rxn_dict[rxn_id] = rxn_str
+        if r_id.startswith('R_EX_'):
+            continue
 
-            else:
-                rxn_str = re.sub('m_(\S+)_\w+', lambda m: mets_kegg_dic[m.group(1)][0], rxn_str)
-                rxn_str = rxn_str.replace('<->', '=')
-                rxn_dict[rxn_id] = rxn_str
+        substrates = []
+        products = []
+        for met, coeff in stoichiometry.items():
+            if met not in met_kegg_ids:
+                bigg_id = re.findall('m_(\S+)_\w+$', met)[0]
+                met_kegg_ids[met] = None if bigg_id in mets_without_kegg_id else mets_kegg_dic[bigg_id][0]
+
+            if met_kegg_ids[met] is None:
+                break
+
+            (substrates if coeff < 0 else products).append((met_kegg_ids[met], abs(coeff)))
+
+        else:
+            # only reactions where all metabolites have a KEGG id
+            rxn_dict[r_id] = KeggReaction(r_id, substrates, products)
 
     return rxn_dict
 
 
-def convert_rxns_to_kegg(rxn_list: list, map_bigg_to_kegg_ids: pd.DataFrame) -> dict:
+def convert_rxns_to_kegg(rxn_list: list, map_bigg_to_kegg_ids, kegg_id_resolution: str = 'interactive') -> dict:
     """
     Given a plain text file with a list of reactions in the form: R_FBA: m_g3p_c + m_dhap_c <-> m_fdp_c, where
     metabolite ids are bigg ids, it converts the metabolite IDs to KEEG ids: R_FBA: C00118 + C00111 = C00354.
@@ -106,16 +223,22 @@ def convert_rxns_to_kegg(rxn_list: list, map_bigg_to_kegg_ids: pd.DataFrame) ->
 
     Args:
         file_rxns: path to file with plain text reactions.
-        map_bigg_to_kegg_ids: dataframe with bigg IDs and corresponding KEGG ids.
+        map_bigg_to_kegg_ids: dataframe with bigg IDs and corresponding KEGG ids, or the respective BiggKeggMap
+                              (see load_bigg_to_kegg_map).
+        kegg_id_resolution: how to choose the KEGG id of metabolites with multiple or no matches: 'interactive' (ask),
+                            'first', 'most-referenced' (the KEGG id most BiGG ids map to), 'skip' (ignore reactions
+                            with such metabolites), or the path to a resolution table (see
+                            load_kegg_id_resolution_table).
 
     Returns:
-        A dictionary where the keys are the reaction IDs (e.g. R_FBA) and the values the reaction in terms of
-        KEGG IDs (e.g. C00118 + C00111 = C00354).
+        A dictionary where the keys are the reaction IDs (e.g. R_FBA) and the values the reactions in terms of
+        KEGG IDs, as KeggReaction objects (whose formula is e.g. C00118 + C00111 = C00354).
     """
 
     met_bigg_ids = _parse_rxns(rxn_list)
 
-    mets_kegg_dic, mets_without_kegg_id = _convert_met_ids_to_kegg(met_bigg_ids, map_bigg_to_kegg_ids)
+    mets_kegg_dic, mets_without_kegg_id = _convert_met_ids_to_kegg(met_bigg_ids, map_bigg_to_kegg_ids,
+                                                                   resolution=kegg_id_resolution)
 
     rxn_dict = _convert_rxn_str_to_kegg_ids(rxn_list, mets_kegg_dic, mets_without_kegg_id)
 
@@ -123,11 +246,22 @@ def convert_rxns_to_kegg(rxn_list: list, map_bigg_to_kegg_ids: pd.DataFrame) ->
 
 
 def get_dGs(rxn_list: list, file_bigg_kegg_ids: str, pH: float = 7.0, ionic_strength: float = 0.1,
-            digits: int = 2) -> dict:
+            digits: int = 2, dG_cache_file: str = None, batched: bool = False, workers: int = 1,
+            return_status: bool = False, kegg_id_resolution: str = 'interactive', dG_backend: DGBackend = None):
     """
     Given a plain text file with reactions in the form R_FBA: m_g3p_c + m_dhap_c <-> m_fdp_c and a file with a
     mapping between bigg and kegg ids, returns the standard gibbs energy and respective uncertainty for each reaction.
     It skips exchange reactions, which should start with 'R_EX_'.
+    Standard Gibbs energies are computed with eQuilibrator, unless another dG_backend is given, e.g. a TableBackend
+    with precomputed values.
+    If dG_cache_file is given, standard Gibbs energies are first looked up in that SQLite cache and only the missing
+    ones are computed (and then stored in the cache).
+    If batched is True, all missing standard Gibbs energies are computed with a single eQuilibrator call, which is
+    much faster for large models.
+    If workers is larger than 1, the reactions are split across a pool of processes, each with its own eQuilibrator
+    instance. Results are always returned in the order of rxn_list.
+    If return_status is True, instead of printing which reactions are not balanced or have no standard Gibbs energy,
+    a dataframe with the status of each reaction is returned as well.
 
     Args:
         file_rxns: path to file with plain text reactions.
@@ -135,40 +269,214 @@ def get_dGs(rxn_list: list, file_bigg_kegg_ids: str, pH: float = 7.0, ionic_stre
         pH: pH value to use to calculate standard Gibbs energies.
         ionic_strength: ionic strength value to use to calculate standard Gibbs energies.
         digits: number of digits to round standard gibbs energies and respective uncertainty.
+        dG_cache_file: path to the SQLite file used to cache standard Gibbs energies (optional).
+        batched: whether or not to compute all standard Gibbs energies in one eQuilibrator call.
+        workers: number of processes used to compute standard Gibbs energies, ignored if batched is True.
+        return_status: whether or not to return the status of each reaction instead of printing failures.
+        kegg_id_resolution: how to choose the KEGG id of metabolites with multiple or no matches: 'interactive' (ask),
+                            'first', 'most-referenced' (the KEGG id most BiGG ids map to), 'skip' (ignore reactions
+                            with such metabolites), or the path to a resolution table (see
+                            load_kegg_id_resolution_table).
+        dG_backend: standard Gibbs energy provider (see thermo_backends), by default eQuilibrator.
 
     Returns:
-       Dictionary with bigg reaction ids as keys and (standard Gibbs energy, uncertainty) as values.
+       Dictionary with bigg reaction ids as keys and (standard Gibbs energy, uncertainty) as values. If return_status
+       is True, also a dataframe indexed by reaction id with the columns 'balanced' and 'status', where status is
+       'ok' or the reason why there is no standard Gibbs energy.
     """
 
-    map_bigg_to_kegg_ids = pd.read_csv(file_bigg_kegg_ids, index_col=0)
+    map_bigg_to_kegg_ids = load_bigg_to_kegg_map(file_bigg_kegg_ids)
 
-    rxn_dict = convert_rxns_to_kegg(rxn_list, map_bigg_to_kegg_ids)
+    rxn_dict = convert_rxns_to_kegg(rxn_list, map_bigg_to_kegg_ids, kegg_id_resolution=kegg_id_resolution)
 
-    rxn_dG_dict = {}
-    eq_api = ComponentContribution(p_h=Q_(pH), ionic_strength=Q_(ionic_strength, 'M'))
+    dG_backend = dG_backend if dG_backend else EquilibratorBackend()
+    dG_results = {}
+    dG_cache = DGCache(dG_cache_file) if dG_cache_file else None
+
+    if dG_cache:
+        for rxn_id, rxn in rxn_dict.items():
+            cached_dG = dG_cache.get(get_canonical_kegg_rxn(rxn.formula), pH, ionic_strength, dG_backend.version)
+            if cached_dG:
+                dG_results[rxn_id] = cached_dG
+
+    rxns_to_compute = [rxn_id for rxn_id in rxn_dict.keys() if rxn_id not in dG_results]
+    kegg_rxns = [rxn_dict[rxn_id] for rxn_id in rxns_to_compute]
+
+    # the backend is only set up if there is something to compute
+    if rxns_to_compute and workers > 1 and not batched:
+        dG_results.update(zip(rxns_to_compute, _compute_dGs_in_parallel(dG_backend, kegg_rxns, pH, ionic_strength,
+                                                                        workers)))
+
+    elif rxns_to_compute and batched:
+        dG0s, dG0_cov, balanced_list, statuses = dG_backend.get_dGs_with_covariance(kegg_rxns, pH, ionic_strength)
+        dG0_stds = np.sqrt(np.diag(dG0_cov))
+        for rxn_i, rxn_id in enumerate(rxns_to_compute):
+            dG_results[rxn_id] = (dG0s[rxn_i], dG0_stds[rxn_i], balanced_list[rxn_i], statuses[rxn_i])
+
+    elif rxns_to_compute:
+        dG_results.update(zip(rxns_to_compute, dG_backend.get_dGs(kegg_rxns, pH, ionic_strength)))
+
+    if dG_cache:
+        for rxn_id in rxns_to_compute:
+            dG_cache.put(get_canonical_kegg_rxn(rxn_dict[rxn_id].formula), pH, ionic_strength, dG_backend.version,
+                         *dG_results[rxn_id])
 
+    if dG_cache:
+        dG_cache.close()
+
+    rxn_dG_dict = {}
     for rxn_id in rxn_dict.keys():
+        dG0, dG0_std, balanced, status = dG_results[rxn_id]
 
-        rxn = parse_reaction_formula(rxn_dict[rxn_id])
-        if not rxn.is_balanced():
+        if not balanced and not return_status:
             print(f'{rxn_id} is not balanced.')
 
-        try:
-            res = eq_api.standard_dg_prime(rxn)
-            dG0 = res.value.magnitude
-            dG0_std = res.error.magnitude
+        if status == 'ok':
             rxn_dG_dict[rxn_id] = (round(dG0, digits), round(dG0_std, digits))
-
-        except MissingDissociationConstantsException:
-            print(f'There is no standard Gibbs energy for {rxn_id}.')
+        else:
+            if not return_status:
+                print(f'There is no standard Gibbs energy for {rxn_id}.')
             rxn_dG_dict[rxn_id] = (0, 0)
 
+    if return_status:
+        status_df = pd.DataFrame([dG_results[rxn_id][2:] for rxn_id in rxn_dict.keys()],
+                                 index=pd.Index(list(rxn_dict.keys()), name='reaction ID'),
+                                 columns=['balanced', 'status'])
+        return rxn_dG_dict, status_df
+
     return rxn_dG_dict
 
 
+def get_dGs_with_covariance(rxn_list: list, file_bigg_kegg_ids: str, pH: float = 7.0,
+                            ionic_strength: float = 0.1, kegg_id_resolution: str = 'interactive',
+                            dG_backend: DGBackend = None) -> tuple:
+    """
+    Given a list of reactions in the form R_FBA: m_g3p_c + m_dhap_c <-> m_fdp_c and a file with a mapping between
+    bigg and kegg ids, computes the standard Gibbs energies of all reactions with a single eQuilibrator call and
+    returns them together with their covariance matrix, so that correlated uncertainties can be used downstream.
+    Backends that don't have covariance information return a diagonal covariance matrix.
+    It skips exchange reactions, which should start with 'R_EX_'.
+    As in get_dGs, reactions without a standard Gibbs energy get 0 as value, as well as 0 in the respective row and
+    column of the covariance matrix.
+
+    Args:
+        rxn_list: list with reaction strings.
+        file_bigg_kegg_ids: path to file with mapping between bigg and kegg ids.
+        pH: pH value to use to calculate standard Gibbs energies.
+        ionic_strength: ionic strength value to use to calculate standard Gibbs energies.
+        kegg_id_resolution: how to choose the KEGG id of metabolites with multiple or no matches: 'interactive' (ask),
+                            'first', 'most-referenced' (the KEGG id most BiGG ids map to), 'skip' (ignore reactions
+                            with such metabolites), or the path to a resolution table (see
+                            load_kegg_id_resolution_table).
+        dG_backend: standard Gibbs energy provider (see thermo_backends), by default eQuilibrator.
+
+    Returns:
+        List with the reaction ids, numpy array with the standard Gibbs energies in kJ/mol (in the same order), and
+        numpy array with their covariance matrix in (kJ/mol)^2.
+    """
+
+    map_bigg_to_kegg_ids = load_bigg_to_kegg_map(file_bigg_kegg_ids)
+
+    rxn_dict = convert_rxns_to_kegg(rxn_list, map_bigg_to_kegg_ids, kegg_id_resolution=kegg_id_resolution)
+    rxn_ids = list(rxn_dict.keys())
+
+    dG_backend = dG_backend if dG_backend else EquilibratorBackend()
+    dG0s, dG0_cov, balanced_list, statuses = dG_backend.get_dGs_with_covariance([rxn_dict[rxn_id] for rxn_id in
+                                                                                  rxn_ids], pH, ionic_strength)
+
+    for rxn_id, balanced, status in zip(rxn_ids, balanced_list, statuses):
+        if not balanced:
+            print(f'{rxn_id} is not balanced.')
+        if status != 'ok':
+            print(f'There is no standard Gibbs energy for {rxn_id}.')
+
+    return rxn_ids, dG0s, dG0_cov
+
+
+def get_dGs_sweep(rxn_list: list, file_bigg_kegg_ids: str, conditions: list,
+                  kegg_id_resolution: str = 'interactive', dG_backend: DGBackend = None) -> tuple:
+    """
+    Given a list of reactions in the form R_FBA: m_g3p_c + m_dhap_c <-> m_fdp_c and a file with a mapping between
+    bigg and kegg ids, computes the standard Gibbs energies of all reactions for each (pH, ionic strength) condition.
+    Reactions are parsed, mapped to KEGG ids and, with eQuilibrator, decomposed with component contribution only once,
+    only the Legendre transform (and the contribution of compounds with stored formation energies) is computed for
+    each condition.
+    It skips exchange reactions, which should start with 'R_EX_'.
+    As in get_dGs, reactions without a standard Gibbs energy get 0 as value and uncertainty.
+
+    Args:
+        rxn_list: list with reaction strings.
+        file_bigg_kegg_ids: path to file with mapping between bigg and kegg ids.
+        conditions: list of (pH, ionic strength) tuples.
+        kegg_id_resolution: how to choose the KEGG id of metabolites with multiple or no matches, see get_dGs.
+        dG_backend: standard Gibbs energy provider (see thermo_backends), by default eQuilibrator.
+
+    Returns:
+        List with the reaction ids, and two numpy arrays with shape (number of conditions, number of reactions) with
+        the standard Gibbs energies and respective uncertainties in kJ/mol.
+    """
+
+    map_bigg_to_kegg_ids = load_bigg_to_kegg_map(file_bigg_kegg_ids)
+
+    rxn_dict = convert_rxns_to_kegg(rxn_list, map_bigg_to_kegg_ids, kegg_id_resolution=kegg_id_resolution)
+    rxn_ids = list(rxn_dict.keys())
+
+    dG_backend = dG_backend if dG_backend else EquilibratorBackend()
+    dG0s, dG0_stds, balanced_list, statuses = dG_backend.get_dGs_sweep([rxn_dict[rxn_id] for rxn_id in rxn_ids],
+                                                                       conditions)
+
+    for rxn_id, balanced, status in zip(rxn_ids, balanced_list, statuses):
+        if not balanced:
+            print(f'{rxn_id} is not balanced.')
+        if status != 'ok':
+            print(f'There is no standard Gibbs energy for {rxn_id}.')
+
+    return rxn_ids, dG0s, dG0_stds
+
+
+def _compute_dGs_in_parallel(dG_backend: DGBackend, kegg_rxns: list, pH: float, ionic_strength: float,
+                             workers: int) -> list:
+    """
+    Computes the standard Gibbs energies of a list of reactions in a pool of processes. The reactions are split in
+    contiguous chunks (a few per process, to balance the load) and the results are merged in the input order.
+    The backend and conditions are sent with each chunk, and each worker keeps the first copy of a backend it gets.
+
+    Args:
+        dG_backend: standard Gibbs energy provider, each process gets its own copy.
+        kegg_rxns: list of reactions in terms of KEGG ids.
+        pH: pH value to use to calculate standard Gibbs energies.
+        ionic_strength: ionic strength value to use to calculate standard Gibbs energies.
+        workers: number of processes.
+
+    Returns:
+        List with a tuple (standard Gibbs energy, uncertainty, balanced, status) for each reaction.
+    """
+
+    chunk_size = ceil(len(kegg_rxns) / (4 * workers))
+    chunks = [kegg_rxns[start:start + chunk_size] for start in range(0, len(kegg_rxns), chunk_size)]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunk_results = executor.map(_compute_dGs_in_worker, repeat(dG_backend), repeat(pH), repeat(ionic_strength),
+                                     chunks)
+        return [rxn_result for chunk_result in chunk_results for rxn_result in chunk_result]
+
+
+def _compute_dGs_in_worker(dG_backend: DGBackend, pH: float, ionic_strength: float, kegg_rxns: list) -> list:
+    """
+    Computes the standard Gibbs energies of a chunk of reactions in a worker process. The worker's first copy of the
+    backend is reused (and kept warm) for all later chunks with the same backend.
+    """
+
+    backend_key = (type(dG_backend).__name__, dG_backend.version)
+    dG_backend = _worker_dG_backends.setdefault(backend_key, dG_backend)
+
+    return dG_backend.get_dGs(kegg_rxns, pH, ionic_strength)
+
+
 def _set_up_model_thermo_rxns(base_df: pd.DataFrame, rxns_order: list, rxn_list: list, use_equilibrator:bool,
-                              file_bigg_kegg_ids: str = None, pH: float = 7.0, ionic_strength: float = 0.1) \
-        -> pd.DataFrame:
+                              file_bigg_kegg_ids: str = None, pH: float = 7.0, ionic_strength: float = 0.1,
+                              dG_cache_file: str = None, kegg_id_resolution: str = 'interactive',
+                              dG_backend: DGBackend = None) -> pd.DataFrame:
     """
     Fills in the thermoRxns sheet on the excel GRASP input file.
     If use_equilibrator is set to True, it first gets all standard Gibbs energies from eQuilibrator, then it copies any
@@ -182,6 +490,113 @@ def _set_up_model_thermo_rxns(base_df: pd.DataFrame, rxns_order: list, rxn_list:
         pH : pH value to use to get the standard Gibbs energies from eQuilibrator.
         ionic_strength: ionic strength value to use to get the standard Gibbs energies from eQuilibrator.
         file_bigg_kegg_ids: path to the file containing the metabolites mapping from BiGG to KEGG ids,
+        dG_cache_file: path to the SQLite file used to cache the standard Gibbs energies from eQuilibrator (optional).
+        kegg_id_resolution: how to choose the KEGG id of metabolites with multiple or no matches, see get_dGs.
+        dG_backend: standard Gibbs energy provider (see thermo_backends), by default eQuilibrator.
+
+    Returns:
+        thermoRxns dataframe for the output excel file.
+    """
+
+    rxn_dG_dict = {}
+
+    if use_equilibrator:
+        file_bigg_kegg_ids = _get_file_bigg_kegg_ids(file_bigg_kegg_ids)
+        rxn_dG_dict = get_dGs(rxn_list, file_bigg_kegg_ids, pH=pH, ionic_strength=ionic_strength, digits=2,
+                              dG_cache_file=dG_cache_file, kegg_id_resolution=kegg_id_resolution,
+                              dG_backend=dG_backend)
+
+    return _get_thermo_rxns_df(base_df, rxns_order, rxn_dG_dict)
+
+
+def set_up_thermo_rxns_sweep(base_df: pd.DataFrame, rxns_order: list, rxn_list: list, conditions: list,
+                             file_out: str = None, one_workbook: bool = True, file_bigg_kegg_ids: str = None,
+                             kegg_id_resolution: str = 'interactive', dG_backend: DGBackend = None) -> dict:
+    """
+    Fills in the thermoRxns sheet for each (pH, ionic strength) condition, with standard Gibbs energies from
+    get_dGs_sweep, i.e. reactions are parsed, mapped to KEGG ids and decomposed only once for all conditions.
+    As in _set_up_model_thermo_rxns, values defined in base_df are copied over the eQuilibrator ones.
+
+    If file_out is given, the sheets are also written to excel: either all in one workbook, with one sheet per
+    condition named e.g. thermoRxns_pH7.0_I0.1, or, if one_workbook is False, in one workbook per condition, named
+    e.g. <file_out name>_pH7.0_I0.1.xlsx, with a single thermoRxns sheet.
+
+    Args:
+        base_df: dictionary with base excel input file.
+        rxns_order: list with reaction IDs.
+        rxn_list: list with reaction strings.
+        conditions: list of (pH, ionic strength) tuples.
+        file_out: path to the output excel file (optional).
+        one_workbook: whether to write all conditions to one workbook or one workbook per condition.
+        file_bigg_kegg_ids: path to the file containing the metabolites mapping from BiGG to KEGG ids.
+        kegg_id_resolution: how to choose the KEGG id of metabolites with multiple or no matches, see get_dGs.
+        dG_backend: standard Gibbs energy provider (see thermo_backends), by default eQuilibrator.
+
+    Returns:
+        Dictionary with (pH, ionic strength) tuples as keys and the respective thermoRxns dataframes as values.
+    """
+
+    file_bigg_kegg_ids = _get_file_bigg_kegg_ids(file_bigg_kegg_ids)
+    rxn_ids, dG0s, dG0_stds = get_dGs_sweep(rxn_list, file_bigg_kegg_ids, conditions,
+                                            kegg_id_resolution=kegg_id_resolution, dG_backend=dG_backend)
+
+    thermo_rxns_dfs = {}
+    for cond_i, (pH, ionic_strength) in enumerate(conditions):
+        rxn_dG_dict = {rxn_id: (round(dG0s[cond_i, rxn_i], 2), round(dG0_stds[cond_i, rxn_i], 2))
+                       for rxn_i, rxn_id in enumerate(rxn_ids)}
+        thermo_rxns_dfs[(pH, ionic_strength)] = _get_thermo_rxns_df(base_df, rxns_order, rxn_dG_dict)
+
+    if file_out and one_workbook:
+        writer = pd.ExcelWriter(file_out, engine='xlsxwriter')
+        for (pH, ionic_strength), thermo_rxns_df in thermo_rxns_dfs.items():
+            thermo_rxns_df.to_excel(writer, sheet_name=f'thermoRxns_pH{pH}_I{ionic_strength}')
+        writer.save()
+
+    elif file_out:
+        file_root, file_ext = os.path.splitext(file_out)
+        for (pH, ionic_strength), thermo_rxns_df in thermo_rxns_dfs.items():
+            writer = pd.ExcelWriter(f'{file_root}_pH{pH}_I{ionic_strength}{file_ext}', engine='xlsxwriter')
+            thermo_rxns_df.to_excel(writer, sheet_name='thermoRxns')
+            writer.save()
+
+    return thermo_rxns_dfs
+
+
+def _get_file_bigg_kegg_ids(file_bigg_kegg_ids: str = None) -> str:
+    """
+    Checks that the file with the mapping between BiGG and KEGG ids exists, if no file is given the one in the data
+    folder is used.
+
+    Args:
+        file_bigg_kegg_ids: path to the file containing the metabolites mapping from BiGG to KEGG ids.
+
+    Returns:
+        Path to the file containing the metabolites mapping from BiGG to KEGG ids.
+    """
+
+    if file_bigg_kegg_ids and not os.path.isfile(file_bigg_kegg_ids):
+        raise FileNotFoundError(f'Didn\'t find {file_bigg_kegg_ids}. Please provide a valid ' +
+                                'path to the file with metabolite mappings from BiGG to KEGG ids.')
+
+    elif not file_bigg_kegg_ids:
+        this_dir, this_filename = os.path.split(__file__)
+        file_bigg_kegg_ids = os.path.join(this_dir, '..', '..', 'data', 'map_bigg_to_kegg_ids.csv')
+        if not os.path.isfile(file_bigg_kegg_ids):
+            raise FileNotFoundError(f'Didn\'t find map_bigg_to_kegg_ids.csv in the data folder. Please provide ' +
+                                    'the path to the file with metabolite mappings from BiGG to KEGG ids.')
+
+    return file_bigg_kegg_ids
+
+
+def _get_thermo_rxns_df(base_df: pd.DataFrame, rxns_order: list, rxn_dG_dict: dict) -> pd.DataFrame:
+    """
+    Builds the thermoRxns dataframe, where the standard Gibbs energy ranges are the average -/+ two standard
+    deviations. Reactions not in rxn_dG_dict are set to zero, and values defined in base_df override the others.
+
+    Args:
+        base_df: dictionary with base excel input file.
+        rxns_order: list with reaction IDs.
+        rxn_dG_dict: dictionary with reaction ids as keys and (standard Gibbs energy, uncertainty) as values.
 
     Returns:
         thermoRxns dataframe for the output excel file.
@@ -191,21 +606,7 @@ def _set_up_model_thermo_rxns(base_df: pd.DataFrame, rxns_order: list, rxn_list:
     thermo_rxns_df = pd.DataFrame(index=rxns_order, columns=columns, data=np.zeros([len(rxns_order), len(columns)]))
     thermo_rxns_df.index.name = 'reaction ID'
 
-
-
-    if use_equilibrator:
-        if file_bigg_kegg_ids and not os.path.isfile(file_bigg_kegg_ids):
-            raise FileNotFoundError(f'Didn\'t find {file_bigg_kegg_ids}. Please provide a valid ' +
-                                    'path to the file with metabolite mappings from BiGG to KEGG ids.')
-
-        elif not file_bigg_kegg_ids:
-            this_dir, this_filename = os.path.split(__file__)
-            file_bigg_kegg_ids = os.path.join(this_dir, '..', '..', 'data', 'map_bigg_to_kegg_ids.csv')
-            if not os.path.isfile(file_bigg_kegg_ids):
-                raise FileNotFoundError(f'Didn\'t find map_bigg_to_kegg_ids.csv in the data folder. Please provide ' +
-                                        'the path to the file with metabolite mappings from BiGG to KEGG ids.')
-
-        rxn_dG_dict = get_dGs(rxn_list, file_bigg_kegg_ids, pH=pH, ionic_strength=ionic_strength, digits=2)
+    if rxn_dG_dict:
         rxn_dG_df = pd.DataFrame().from_dict(rxn_dG_dict, orient='index')
         rxn_dG_df.columns = ['average', 'stdev']
 
@@ -0,0 +1,377 @@
+"""
+The aim of this module is to provide standard Gibbs energies for reactions given in terms of KEGG ids (see
+set_up_thermo_rxns.KeggReaction), from different sources:
+ - EquilibratorBackend computes them with eQuilibrator (component contribution), the default.
+ - TableBackend looks them up in a precomputed table (csv or parquet), which doesn't need eQuilibrator at all.
+
+New sources can be added by subclassing DGBackend.
+
+Importing eQuilibrator takes a few seconds (it loads its compound cache and pint), so equilibrator_api and
+equilibrator_cache are only imported by the methods that actually call them.
+"""
+
+import hashlib
+import os
+from abc import ABC, abstractmethod
+
+import numpy as np
+import pandas as pd
+
+try:
+    from importlib.metadata import version as get_package_version
+except ImportError:  # Python < 3.8
+    from importlib_metadata import version as get_package_version
+
+from set_up_grasp_models.set_up_models.thermo_cache import get_canonical_kegg_rxn, get_canonical_kegg_stoichiometry
+
+
+class DGBackend(ABC):
+    """
+    Interface for standard Gibbs energy providers.
+
+    All methods take a list of reactions in terms of KEGG ids (KeggReaction objects) and return, for each reaction,
+    the standard Gibbs energy and its uncertainty in kJ/mol, whether or not the reaction is balanced, and a status
+    that is 'ok' or the reason why there is no standard Gibbs energy.
+    """
+
+    @property
+    @abstractmethod
+    def version(self) -> str:
+        """ Identifier of the backend and its data, used to key cached standard Gibbs energies. """
+
+    @abstractmethod
+    def get_dGs(self, kegg_rxns: list, pH: float, ionic_strength: float) -> list:
+        """
+        Gets the standard Gibbs energies of a list of reactions.
+
+        Args:
+            kegg_rxns: list of reactions in terms of KEGG ids.
+            pH: pH value.
+            ionic_strength: ionic strength value.
+
+        Returns:
+            List with a tuple (standard Gibbs energy, uncertainty, balanced, status) for each reaction.
+        """
+
+    def get_dGs_with_covariance(self, kegg_rxns: list, pH: float, ionic_strength: float) -> tuple:
+        """
+        Gets the standard Gibbs energies of a list of reactions and their covariance matrix. By default the
+        uncertainties are taken as independent, i.e. the covariance matrix is diagonal.
+
+        Args:
+            kegg_rxns: list of reactions in terms of KEGG ids.
+            pH: pH value.
+            ionic_strength: ionic strength value.
+
+        Returns:
+            Tuple with a numpy array with the standard Gibbs energies, a numpy array with their covariance matrix, a
+            list with whether or not each reaction is balanced, and a list with the status of each reaction.
+        """
+
+        rxn_results = self.get_dGs(kegg_rxns, pH, ionic_strength)
+        statuses = [rxn_result[3] for rxn_result in rxn_results]
+
+        dG0s = np.array([rxn_result[0] if status == 'ok' else 0. for rxn_result, status in zip(rxn_results, statuses)])
+        dG0_stds = np.array([rxn_result[1] if status == 'ok' else 0. for rxn_result, status in
+                             zip(rxn_results, statuses)])
+
+        return dG0s, np.diag(dG0_stds ** 2), [rxn_result[2] for rxn_result in rxn_results], statuses
+
+    def get_dGs_sweep(self, kegg_rxns: list, conditions: list) -> tuple:
+        """
+        Gets the standard Gibbs energies of a list of reactions for each (pH, ionic strength) condition.
+
+        Args:
+            kegg_rxns: list of reactions in terms of KEGG ids.
+            conditions: list of (pH, ionic strength) tuples.
+
+        Returns:
+            Two numpy arrays with shape (number of conditions, number of reactions) with the standard Gibbs energies
+            and respective uncertainties, a list with whether or not each reaction is balanced, and a list with the
+            status of each reaction (the first status other than 'ok' over all conditions).
+        """
+
+        dG0s = np.zeros((len(conditions), len(kegg_rxns)))
+        dG0_stds = np.zeros((len(conditions), len(kegg_rxns)))
+        balanced_list = [True] * len(kegg_rxns)
+        statuses = ['ok'] * len(kegg_rxns)
+
+        for cond_i, (pH, ionic_strength) in enumerate(conditions):
+            for rxn_i, (dG0, dG0_std, balanced, status) in enumerate(self.get_dGs(kegg_rxns, pH, ionic_strength)):
+                balanced_list[rxn_i] = balanced
+                if status == 'ok':
+                    dG0s[cond_i, rxn_i] = dG0
+                    dG0_stds[cond_i, rxn_i] = dG0_std
+                elif statuses[rxn_i] == 'ok':
+                    statuses[rxn_i] = status
+
+        missing_dG = np.array([status != 'ok' for status in statuses], dtype=bool)
+        dG0s[:, missing_dG] = 0
+        dG0_stds[:, missing_dG] = 0
+
+        return dG0s, dG0_stds, balanced_list, statuses
+
+
+class EquilibratorBackend(DGBackend):
+    """
+    Computes standard Gibbs energies with eQuilibrator. eQuilibrator is imported and the ComponentContribution object
+    is created only when it is first needed, and it is reused for later calls (only the pH and ionic strength are
+    updated). Pickled copies, e.g. sent to worker processes, set up their own ComponentContribution.
+    """
+
+    def __init__(self):
+        self._eq_api = None
+
+    def __getstate__(self):
+        return {'_eq_api': None}
+
+    @property
+    def version(self) -> str:
+        # read from the package metadata, so that runs served from the cache don't import eQuilibrator
+        return get_package_version('equilibrator-api')
+
+    def get_dGs(self, kegg_rxns: list, pH: float, ionic_strength: float) -> list:
+        eq_api = self._get_eq_api(pH, ionic_strength)
+
+        return [self._compute_dG(eq_api, kegg_rxn) for kegg_rxn in kegg_rxns]
+
+    def get_dGs_with_covariance(self, kegg_rxns: list, pH: float, ionic_strength: float) -> tuple:
+        """
+        Computes the standard Gibbs energies of a list of reactions, and their covariance, with a single eQuilibrator
+        call.
+        eQuilibrator fails for the whole batch if one reaction has missing dissociation constants, in which case
+        those reactions are found and left out of the batch. Their standard Gibbs energy and covariance entries are
+        set to 0.
+        """
+
+        from equilibrator_cache.exceptions import MissingDissociationConstantsException
+
+        eq_api = self._get_eq_api(pH, ionic_strength)
+
+        rxns = [to_equilibrator_reaction(kegg_rxn) for kegg_rxn in kegg_rxns]
+        balanced_list = [rxn.is_balanced() for rxn in rxns]
+        statuses = ['ok'] * len(rxns)
+
+        dG0s = np.zeros(len(rxns))
+        dG0_cov = np.zeros((len(rxns), len(rxns)))
+
+        try:
+            dG0_values, dG0_cov_values = eq_api.standard_dg_prime_multi(rxns)
+        except MissingDissociationConstantsException:
+            for rxn_i, rxn in enumerate(rxns):
+                try:
+                    eq_api.standard_dg_prime(rxn)
+                except MissingDissociationConstantsException:
+                    statuses[rxn_i] = 'missing dissociation constants'
+
+            if 'ok' not in statuses:
+                return dG0s, dG0_cov, balanced_list, statuses
+
+            dG0_values, dG0_cov_values = eq_api.standard_dg_prime_multi([rxn for rxn, status in zip(rxns, statuses)
+                                                                         if status == 'ok'])
+
+        ok_ind = np.array([rxn_i for rxn_i, status in enumerate(statuses) if status == 'ok'], dtype=int)
+        dG0s[ok_ind] = [dG0.m_as('kJ/mol') for dG0 in dG0_values]
+        dG0_cov[np.ix_(ok_ind, ok_ind)] = dG0_cov_values.m_as('(kJ/mol)**2')
+
+        return dG0s, dG0_cov, balanced_list, statuses
+
+    def get_dGs_sweep(self, kegg_rxns: list, conditions: list) -> tuple:
+        """
+        The component contribution estimates, and their uncertainty, don't depend on the conditions, so they are
+        computed once for the whole batch (as in ComponentContribution.standard_dg_prime_multi), and then only the
+        Legendre transform and the contribution of compounds with stored formation energies are added for each
+        condition.
+        This relies on eQuilibrator internals (ComponentContribution.predictor, Reaction.separate_stored_dg_prime and
+        Reaction.transform, as in equilibrator-api 0.2.6); if they are missing, one standard_dg_prime call is made
+        per reaction and condition instead.
+        """
+
+        from equilibrator_api import Q_, R, default_T
+        from equilibrator_cache.exceptions import MissingDissociationConstantsException
+
+        if not conditions or not kegg_rxns:
+            return super().get_dGs_sweep(kegg_rxns, conditions)
+
+        eq_api = self._get_eq_api(*conditions[0])
+        rxns = [to_equilibrator_reaction(kegg_rxn) for kegg_rxn in kegg_rxns]
+
+        predictor = getattr(eq_api, 'predictor', None)
+        if not hasattr(predictor, 'standard_dg_multi') or \
+                not all(hasattr(rxns[0], attr) for attr in ('separate_stored_dg_prime', 'transform')):
+            return super().get_dGs_sweep(kegg_rxns, conditions)
+
+        balanced_list = [rxn.is_balanced() for rxn in rxns]
+        statuses = ['ok'] * len(rxns)
+
+        dG0s = np.zeros((len(conditions), len(rxns)))
+        dG0_stds = np.zeros((len(conditions), len(rxns)))
+
+        # which compounds have stored formation energies doesn't depend on the conditions
+        residual_rxns = [rxn.separate_stored_dg_prime(p_h=Q_(7.0), ionic_strength=Q_(0.1, 'M'),
+                                                      temperature=default_T)[0] for rxn in rxns]
+        standard_dGs, dG_cov = predictor.standard_dg_multi(residual_rxns)
+        standard_dGs = standard_dGs.m_as('kJ/mol')
+        dG_stds = np.sqrt(np.diag(dG_cov.m_as('(kJ/mol)**2')))
+
+        for cond_i, (pH, ionic_strength) in enumerate(conditions):
+            p_h = Q_(pH)
+            ionic_strength = Q_(ionic_strength, 'M')
+
+            for rxn_i, (rxn, residual_rxn) in enumerate(zip(rxns, residual_rxns)):
+                if statuses[rxn_i] != 'ok':
+                    continue
+
+                try:
+                    transform_dG = R * default_T * residual_rxn.transform(p_h, ionic_strength, default_T)
+                except MissingDissociationConstantsException:
+                    statuses[rxn_i] = 'missing dissociation constants'
+                    continue
+
+                stored_dG = rxn.separate_stored_dg_prime(p_h=p_h, ionic_strength=ionic_strength,
+                                                         temperature=default_T)[1]
+                stored_dG = stored_dG.m_as('kJ/mol') if hasattr(stored_dG, 'm_as') else stored_dG
+
+                dG0s[cond_i, rxn_i] = standard_dGs[rxn_i] + transform_dG.m_as('kJ/mol') + stored_dG
+                dG0_stds[cond_i, rxn_i] = dG_stds[rxn_i]
+
+        missing_dG = np.array([status != 'ok' for status in statuses], dtype=bool)
+        dG0s[:, missing_dG] = 0
+        dG0_stds[:, missing_dG] = 0
+
+        return dG0s, dG0_stds, balanced_list, statuses
+
+    def _get_eq_api(self, pH: float, ionic_strength: float):
+        from equilibrator_api import ComponentContribution, Q_
+
+        if self._eq_api is None:
+            self._eq_api = ComponentContribution(p_h=Q_(pH), ionic_strength=Q_(ionic_strength, 'M'))
+        else:
+            self._eq_api.p_h = Q_(pH)
+            self._eq_api.ionic_strength = Q_(ionic_strength, 'M')
+
+        return self._eq_api
+
+    @staticmethod
+    def _compute_dG(eq_api, kegg_rxn) -> tuple:
+        from equilibrator_cache.exceptions import MissingDissociationConstantsException
+
+        rxn = to_equilibrator_reaction(kegg_rxn)
+        balanced = rxn.is_balanced()
+
+        try:
+            res = eq_api.standard_dg_prime(rxn)
+            return res.value.magnitude, res.error.magnitude, balanced, 'ok'
+
+        except MissingDissociationConstantsException:
+            return None, None, balanced, 'missing dissociation constants'
+
+
+class TableBackend(DGBackend):
+    """
+    Looks up standard Gibbs energies in a precomputed csv or parquet table, with the columns:
+     - reaction: either the reaction id (e.g. R_PGI) or the reaction formula with KEGG ids (e.g. C00092 = C00085).
+     - dG0: standard Gibbs energy in kJ/mol.
+     - dG0_std: standard Gibbs energy uncertainty in kJ/mol.
+     - pH and ionic_strength (optional): conditions of each value, if not given the values are used for all
+       conditions.
+
+    Reactions are first looked up by id and then by formula, where formulas match regardless of the order of the
+    compounds and of the direction in which the reaction is written (the standard Gibbs energy is then negated).
+    Reactions that are not in the table get the status 'not in table'. Since the table doesn't say whether reactions
+    are balanced, all reactions are taken as balanced.
+    """
+
+    def __init__(self, file_in: str):
+        """
+        Args:
+            file_in: path to the table, a .parquet file or a csv file.
+        """
+
+        self.file_in = file_in
+
+        if os.path.splitext(file_in)[1] == '.parquet':
+            table_df = pd.read_parquet(file_in)
+        else:
+            table_df = pd.read_csv(file_in)
+
+        missing_columns = {'reaction', 'dG0', 'dG0_std'}.difference(table_df.columns)
+        if missing_columns:
+            raise KeyError(f'The standard Gibbs energy table {file_in} is missing the columns ' +
+                           f'{sorted(missing_columns)}.')
+
+        self._by_condition = 'pH' in table_df.columns and 'ionic_strength' in table_df.columns
+
+        # formulas are stored in canonical form, reaction ids as they are
+        table_df['reaction'] = [get_canonical_kegg_rxn(rxn) if '=' in rxn else rxn.strip()
+                                for rxn in table_df['reaction'].astype(str)]
+
+        index_columns = ['reaction', 'pH', 'ionic_strength'] if self._by_condition else ['reaction']
+        table_df = table_df.drop_duplicates(subset=index_columns, keep='last')
+        self._table = table_df.set_index(index_columns)[['dG0', 'dG0_std']].astype(float)
+
+        file_hash = hashlib.sha256()
+        with open(file_in, 'rb') as f_in:
+            for block in iter(lambda: f_in.read(1 << 20), b''):
+                file_hash.update(block)
+        self._version = f'table-{file_hash.hexdigest()[:16]}'
+
+    @property
+    def version(self) -> str:
+        return self._version
+
+    def get_dGs(self, kegg_rxns: list, pH: float, ionic_strength: float) -> list:
+        dG0s, dG0_stds, found = self._lookup(kegg_rxns, pH, ionic_strength)
+
+        return [(dG0, dG0_std, True, 'ok') if rxn_found else (None, None, True, 'not in table')
+                for dG0, dG0_std, rxn_found in zip(dG0s, dG0_stds, found)]
+
+    def _lookup(self, kegg_rxns: list, pH: float, ionic_strength: float) -> tuple:
+        """
+        Looks up all reactions at once: first by id, then by canonical formula, then by the canonical formula of the
+        reversed reaction.
+
+        Returns:
+            Numpy arrays with the standard Gibbs energies, their uncertainties, and which reactions were found.
+        """
+
+        rxn_keys = [[kegg_rxn.id for kegg_rxn in kegg_rxns],
+                    [get_canonical_kegg_stoichiometry(kegg_rxn.stoichiometry) for kegg_rxn in kegg_rxns],
+                    [get_canonical_kegg_stoichiometry({kegg_id: -coeff for kegg_id, coeff in
+                                                       kegg_rxn.stoichiometry.items()}) for kegg_rxn in kegg_rxns]]
+
+        dG0s = np.full(len(kegg_rxns), np.nan)
+        dG0_stds = np.full(len(kegg_rxns), np.nan)
+
+        for keys, sense in zip(rxn_keys, (1, 1, -1)):
+            if self._by_condition:
+                keys = pd.MultiIndex.from_arrays([keys, [float(pH)] * len(keys), [float(ionic_strength)] * len(keys)])
+
+            values = self._table.reindex(keys).to_numpy()
+            not_found = np.isnan(dG0s)
+            dG0s[not_found] = sense * values[not_found, 0]
+            dG0_stds[not_found] = values[not_found, 1]
+
+        return dG0s, dG0_stds, ~np.isnan(dG0s)
+
+
+def to_equilibrator_reaction(kegg_rxn):
+    """
+    Builds the eQuilibrator reaction directly from the stoichiometry of a reaction in terms of KEGG ids, i.e. without
+    parsing its formula.
+
+    Args:
+        kegg_rxn: reaction in terms of KEGG ids.
+
+    Returns:
+        eQuilibrator Reaction object.
+    """
+
+    from equilibrator_api import Reaction, ccache
+
+    sparse = {}
+    for kegg_id, coeff in kegg_rxn.stoichiometry.items():
+        compound = ccache.get_compound(kegg_id)
+        sparse[compound] = sparse.get(compound, 0) + coeff
+
+    return Reaction(sparse, rid=kegg_rxn.id)
@@ -0,0 +1,184 @@
+"""
+The aim of this module is to store standard Gibbs energies computed with eQuilibrator in a local SQLite database, so
+that the same reactions at the same conditions don't have to be computed again in later runs.
+"""
+
+import sqlite3
+
+
+def get_canonical_kegg_rxn(rxn_str: str) -> str:
+    """
+    Given a reaction in terms of KEGG ids, e.g. "C00118 + C00111 = C00354", returns a canonical representation of its
+    net stoichiometry, where compounds are sorted by id and compounds that appear on both sides are merged, e.g.
+    "-1 C00111 + -1 C00118 + 1 C00354". Two formulas with the same canonical string have the same standard Gibbs
+    energy.
+
+    Args:
+        rxn_str: reaction string with KEGG ids, with substrates and products separated by "=".
+
+    Returns:
+        Canonical reaction string.
+    """
+
+    stoichiometry = {}
+    substrates, products = rxn_str.split('=')
+
+    for sense, side in ((-1, substrates), (1, products)):
+        for compound in side.split(' + '):
+            tokens = compound.split()
+            if not tokens:
+                continue
+
+            coeff, kegg_id = (float(tokens[0]), tokens[1]) if len(tokens) == 2 else (1., tokens[0])
+            stoichiometry[kegg_id] = stoichiometry.get(kegg_id, 0) + sense * coeff
+
+    return get_canonical_kegg_stoichiometry(stoichiometry)
+
+
+def get_canonical_kegg_stoichiometry(stoichiometry: dict) -> str:
+    """
+    Same as get_canonical_kegg_rxn, but for a reaction given as a dictionary with KEGG ids as keys and stoichiometric
+    coefficients as values, e.g. {'C00118': -1, 'C00111': -1, 'C00354': 1}.
+
+    Args:
+        stoichiometry: dictionary with the net stoichiometry of the reaction.
+
+    Returns:
+        Canonical reaction string.
+    """
+
+    return ' + '.join(f'{coeff:g} {kegg_id}' for kegg_id, coeff in sorted(stoichiometry.items()) if coeff != 0)
+
+
+class DGCache:
+    """
+    SQLite backed cache for standard Gibbs energies.
+
+    Entries are keyed by (canonical KEGG reaction string, pH, ionic strength, eQuilibrator version) and store the
+    standard Gibbs energy, its uncertainty, whether or not the reaction is balanced, and a status that is 'ok' or the
+    reason why the Gibbs energy couldn't be computed. When the cache has more than max_entries, the least recently used
+    entries are removed.
+    """
+
+    def __init__(self, db_file: str, max_entries: int = 100000):
+        """
+        Args:
+            db_file: path to the SQLite database file, it is created if it doesn't exist.
+            max_entries: maximum number of entries to keep in the cache.
+        """
+
+        self.db_file = db_file
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._connection = sqlite3.connect(db_file)
+        self._connection.execute('''CREATE TABLE IF NOT EXISTS standard_dGs (
+                                        rxn TEXT NOT NULL,
+                                        pH REAL NOT NULL,
+                                        ionic_strength REAL NOT NULL,
+                                        version TEXT NOT NULL,
+                                        dG0 REAL,
+                                        dG0_std REAL,
+                                        balanced INTEGER,
+                                        status TEXT,
+                                        last_used INTEGER,
+                                        PRIMARY KEY (rxn, pH, ionic_strength, version))''')
+        self._connection.execute('CREATE INDEX IF NOT EXISTS standard_dGs_last_used ON standard_dGs (last_used)')
+        self._connection.commit()
+
+        # entries are ranked by a counter instead of a timestamp, so that the order of use is never ambiguous
+        self._n_entries, self._counter = self._connection.execute(
+            'SELECT COUNT(*), COALESCE(MAX(last_used), 0) FROM standard_dGs').fetchone()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return self._n_entries
+
+    def commit(self):
+        """
+        Writes pending changes to the database file.
+        """
+
+        self._connection.commit()
+
+    def close(self):
+        """
+        Commits pending changes and closes the database connection.
+        """
+
+        self._connection.commit()
+        self._connection.close()
+
+    def get(self, rxn: str, pH: float, ionic_strength: float, version: str):
+        """
+        Gets a cached standard Gibbs energy.
+
+        Args:
+            rxn: canonical KEGG reaction string, see get_canonical_kegg_rxn.
+            pH: pH value.
+            ionic_strength: ionic strength value.
+            version: eQuilibrator version.
+
+        Returns:
+            Tuple (dG0, dG0_std, balanced, status) or None if the reaction is not in the cache.
+        """
+
+        key = (rxn, float(pH), float(ionic_strength), version)
+        row = self._connection.execute('''SELECT dG0, dG0_std, balanced, status FROM standard_dGs
+                                          WHERE rxn = ? AND pH = ? AND ionic_strength = ? AND version = ?''',
+                                       key).fetchone()
+
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._counter += 1
+        self._connection.execute('''UPDATE standard_dGs SET last_used = ?
+                                    WHERE rxn = ? AND pH = ? AND ionic_strength = ? AND version = ?''',
+                                 (self._counter,) + key)
+
+        return row[0], row[1], bool(row[2]), row[3]
+
+    def put(self, rxn: str, pH: float, ionic_strength: float, version: str, dG0: float, dG0_std: float,
+            balanced: bool = True, status: str = 'ok'):
+        """
+        Adds a standard Gibbs energy to the cache, evicting the least recently used entries if the cache is full.
+        Changes are written to the database file on commit or close.
+
+        Args:
+            rxn: canonical KEGG reaction string, see get_canonical_kegg_rxn.
+            pH: pH value.
+            ionic_strength: ionic strength value.
+            version: eQuilibrator version.
+            dG0: standard Gibbs energy.
+            dG0_std: standard Gibbs energy uncertainty.
+            balanced: whether or not the reaction is balanced.
+            status: 'ok' or the reason why the standard Gibbs energy couldn't be computed.
+
+        Returns:
+            None
+        """
+
+        key = (rxn, float(pH), float(ionic_strength), version)
+        self._counter += 1
+
+        cursor = self._connection.execute('''DELETE FROM standard_dGs
+                                             WHERE rxn = ? AND pH = ? AND ionic_strength = ? AND version = ?''', key)
+        self._n_entries -= cursor.rowcount
+
+        self._connection.execute('INSERT INTO standard_dGs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                 key + (dG0, dG0_std, int(balanced), status, self._counter))
+        self._n_entries += 1
+
+        if self._n_entries > self.max_entries:
+            self._connection.execute('''DELETE FROM standard_dGs WHERE rowid IN
+                                        (SELECT rowid FROM standard_dGs ORDER BY last_used LIMIT ?)''',
+                                     (self._n_entries - self.max_entries,))
+            self._n_entries = self.max_entries
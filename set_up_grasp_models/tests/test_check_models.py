@@ -2,12 +2,15 @@ import io
 import os
 import unittest.mock
 
+import numpy as np
 import pandas as pd
 
 from set_up_grasp_models.check_models.format_checks import check_kinetics_met_separators, check_met_rxn_order, \
     check_rxn_mechanism_order, check_kinetics_subs_prod_order
 from set_up_grasp_models.check_models.mass_balance_checks import check_balanced_metabolites, check_flux_balance
-from set_up_grasp_models.check_models.thermodynamics_checks import check_thermodynamic_feasibility, calculate_dG
+from set_up_grasp_models.check_models.thermodynamics_checks import check_thermodynamic_feasibility, calculate_dG, \
+    sample_dGs, get_dG_probabilities, check_thermodynamic_feasibility_batch, get_robust_fluxes, \
+    get_robust_fluxes_multi, RobustFluxFactorization, _get_robust_flux_factorization, _robust_flux_factorizations
 
 
 class TestFormatChecks(unittest.TestCase):
@@ -336,7 +339,224 @@ class TestThermodynamicsChecks(unittest.TestCase):
         data_dict = pd.read_excel(os.path.join(self.test_folder, 'model_v2_manual.xlsx'), sheet_name=None, index_col=0)
         ma_df, dG_Q_df, dG_df = calculate_dG(data_dict, gas_constant, temperature)
 
-        self.assertTrue(ma_df.equals(true_res_ma))
-        self.assertTrue(dG_Q_df.equals(true_res_dG_Q))
-        self.assertTrue(dG_df.equals(true_res_dG))
+        pd.testing.assert_frame_equal(true_res_ma, ma_df, check_exact=False, rtol=1e-10)
+        pd.testing.assert_frame_equal(true_res_dG_Q, dG_Q_df, check_exact=False, rtol=1e-10)
+        pd.testing.assert_frame_equal(true_res_dG, dG_df, check_exact=False, rtol=1e-10)
+
+    def test_calculate_dG_large_stoichiometry(self):
+        temperature = 298  # in K
+        gas_constant = 8.314 * 10 ** -3  # in kJ K^-1 mol^-1
+
+        # the mass-action ratio of R_poly underflows if computed as a product of concentrations
+        data_dict = {'stoic': pd.DataFrame([[-1, 1, 0], [0, -400, 1]], index=['R_1', 'R_poly'],
+                                           columns=['m_a', 'm_b', 'm_c']),
+                     'thermoMets': pd.DataFrame({'min (M)': [1e-3, 1e-6, 1e-6], 'max (M)': [1e-2, 1e-5, 1e-3]},
+                                                index=['m_a', 'm_b', 'm_c']),
+                     'thermoRxns': pd.DataFrame({'∆Gr\'_min (kJ/mol)': [-5., -10.], '∆Gr\'_max (kJ/mol)': [5., 10.]},
+                                                index=['R_1', 'R_poly'])}
+
+        ma_df, dG_Q_df, dG_df = calculate_dG(data_dict, gas_constant, temperature, rxn_order=['R_poly', 'R_1'])
+
+        RT = gas_constant * temperature
+        self.assertListEqual(['R_poly', 'R_1'], dG_df.index.tolist())
+        self.assertAlmostEqual(-5 + RT * np.log(1e-6 / 1e-2), dG_df.loc['R_1', '∆G_min'])
+        self.assertAlmostEqual(5 + RT * np.log(1e-5 / 1e-3), dG_df.loc['R_1', '∆G_max'])
+        self.assertAlmostEqual(RT * (np.log(1e-6) - 400 * np.log(1e-5)), dG_Q_df.loc['R_poly', '∆G_Q_min'])
+        self.assertAlmostEqual(RT * (np.log(1e-3) - 400 * np.log(1e-6)), dG_Q_df.loc['R_poly', '∆G_Q_max'])
+        self.assertAlmostEqual(-10 + RT * (np.log(1e-6) - 400 * np.log(1e-5)), dG_df.loc['R_poly', '∆G_min'])
+        self.assertTrue(np.isfinite(dG_df.values).all())
+
+    def test_get_robust_fluxes(self):
+        data_dict = pd.read_excel(os.path.join(self.test_folder, 'HMP2360_r0_t0.xlsx'), sheet_name=None, index_col=0)
+
+        # reference computed with the explicit pseudo-inverse
+        stoic_matrix = np.transpose(data_dict['stoic'].values)[data_dict['mets']['balanced?'].values == 1, :]
+        rxn_list = data_dict['stoic'].index.values
+        meas_rates = data_dict['measRates'].reindex(rxn_list).fillna(0)
+        id_meas = meas_rates['vref_mean (mmol/L/h)'].values != 0
+        sensitivity = np.linalg.pinv(stoic_matrix[:, ~id_meas]) @ stoic_matrix[:, id_meas]
+
+        true_v_mean = meas_rates['vref_mean (mmol/L/h)'].values.astype(float)
+        true_v_mean[~id_meas] = -sensitivity @ true_v_mean[id_meas]
+        true_v_std = meas_rates['vref_std (mmol/L/h)'].values.astype(float)
+        true_v_std[~id_meas] = np.sqrt(np.diag(sensitivity @ np.diag(true_v_std[id_meas] ** 2) @ sensitivity.T))
+
+        for solver in ['dense', 'sparse']:
+            with self.subTest(solver=solver):
+                fluxes_df = get_robust_fluxes(data_dict, solver=solver)
+
+                self.assertListEqual(list(rxn_list), fluxes_df.index.tolist())
+                self.assertTrue(np.allclose(true_v_mean, fluxes_df['vref_mean (mmol/L/h)'].values))
+                self.assertTrue(np.allclose(true_v_std, fluxes_df['vref_std (mmol/L/h)'].values))
+
+        factorization = _get_robust_flux_factorization(stoic_matrix, id_meas)
+        self.assertIs(factorization, _get_robust_flux_factorization(stoic_matrix.copy(), id_meas.copy()))
+        self.assertIsNot(factorization, _get_robust_flux_factorization(stoic_matrix, ~id_meas))
+
+        # the least recently used factorization is evicted first
+        _robust_flux_factorizations.clear()
+        with unittest.mock.patch('set_up_grasp_models.check_models.thermodynamics_checks.MAX_CACHED_FACTORIZATIONS',
+                                 2):
+            factorization = _get_robust_flux_factorization(stoic_matrix, id_meas)
+            other_factorization = _get_robust_flux_factorization(stoic_matrix, ~id_meas)
+            _get_robust_flux_factorization(stoic_matrix, id_meas)
+            _get_robust_flux_factorization(stoic_matrix, id_meas, solver='sparse')
+
+            self.assertIs(factorization, _get_robust_flux_factorization(stoic_matrix, id_meas))
+            self.assertIsNot(other_factorization, _get_robust_flux_factorization(stoic_matrix, ~id_meas))
+
+        with self.assertRaises(ValueError):
+            get_robust_fluxes(data_dict, solver='qr')
+
+    def test_robust_flux_factorization_ill_conditioned(self):
+        # the normal equations of this system have a condition number of about 10^15
+        stoic_unkn = np.array([[-1., -1.], [1., 1. + 10 ** -7]])
+        stoic_meas = np.array([[1.], [0.]])
+        stoic_matrix = np.hstack([stoic_meas, stoic_unkn])
+        id_meas = np.array([True, False, False])
+
+        true_sensitivity = np.linalg.solve(stoic_unkn, stoic_meas)
+        for solver in ['dense', 'sparse']:
+            with self.subTest(solver=solver):
+                factorization = RobustFluxFactorization(stoic_matrix, id_meas, solver=solver)
+                np.testing.assert_allclose(true_sensitivity, factorization.sensitivity, rtol=10 ** -6)
+
+    def test_robust_flux_factorization_sparse_not_converged(self):
+        data_dict = pd.read_excel(os.path.join(self.test_folder, 'HMP2360_r0_t0.xlsx'), sheet_name=None, index_col=0)
+        stoic_matrix = np.transpose(data_dict['stoic'].values)[data_dict['mets']['balanced?'].values == 1, :]
+        id_meas = data_dict['measRates'].reindex(data_dict['stoic'].index)['vref_mean (mmol/L/h)'].fillna(0).values != 0
+
+        true_factorization = RobustFluxFactorization(stoic_matrix, id_meas, solver='dense')
+
+        # lsqr stops at the iteration limit with a wrong solution
+        n_unkn = np.sum(~id_meas)
+        lsqr_res = (np.ones(n_unkn), 7, 10 * n_unkn, 1., 1., 1., 1., 1., 1., np.zeros(n_unkn))
+        with unittest.mock.patch('set_up_grasp_models.check_models.thermodynamics_checks.lsqr',
+                                 return_value=lsqr_res):
+            with self.assertWarns(RuntimeWarning):
+                factorization = RobustFluxFactorization(stoic_matrix, id_meas, solver='sparse')
+
+        np.testing.assert_allclose(true_factorization.sensitivity, factorization.sensitivity, atol=10 ** -10)
+        self.assertEqual(true_factorization.is_determined, factorization.is_determined)
+
+    def test_get_robust_fluxes_multi(self):
+        data_dict = pd.read_excel(os.path.join(self.test_folder, 'HMP2360_r0_t0.xlsx'), sheet_name=None, index_col=0)
+        rxn_list = data_dict['stoic'].index.values
+        meas_rates_df = data_dict['measRates'].reindex(rxn_list).fillna(0)
+
+        scales = np.array([1., 0.5, 2., -1.])
+        meas_rates_mean = np.outer(meas_rates_df['vref_mean (mmol/L/h)'].values, scales)
+        meas_rates_std = np.outer(meas_rates_df['vref_std (mmol/L/h)'].values, np.abs(scales))
+
+        v_mean, v_std = get_robust_fluxes_multi(data_dict, meas_rates_mean, meas_rates_std)
+        fluxes_df = get_robust_fluxes(data_dict)
+
+        self.assertTupleEqual((len(rxn_list), len(scales)), v_mean.shape)
+        self.assertTrue(np.allclose(np.outer(fluxes_df['vref_mean (mmol/L/h)'].values, scales), v_mean))
+        self.assertTrue(np.allclose(np.outer(fluxes_df['vref_std (mmol/L/h)'].values, np.abs(scales)), v_std))
+
+        # a different set of measured reactions in one of the measurement sets
+        meas_rates_mean[np.nonzero(meas_rates_mean[:, 0])[0][0], 1] = 0
+        with self.assertRaises(ValueError):
+            get_robust_fluxes_multi(data_dict, meas_rates_mean, meas_rates_std)
+
+        with self.assertRaises(ValueError):
+            get_robust_fluxes_multi(data_dict, meas_rates_mean, meas_rates_std[:, :2])
+
+    @unittest.mock.patch('sys.stdout', new_callable=io.StringIO)
+    def test_get_robust_fluxes_not_determined(self, mock_stdout):
+        data_dict = pd.read_excel(os.path.join(self.test_folder, 'model_v1_base_incomplete_fluxes.xlsx'),
+                                  sheet_name=None, index_col=0)
+
+        fluxes_df = get_robust_fluxes(data_dict)
+
+        self.assertTrue(fluxes_df.isna().all().all())
+        self.assertEqual('System is not fully determined and the fluxes cannot be determined.\n',
+                         mock_stdout.getvalue())
+
+    def test_check_thermodynamic_feasibility_batch(self):
+        data_dict = pd.read_excel(os.path.join(self.test_folder, 'model_v1_base.xlsx'), sheet_name=None, index_col=0)
+        with unittest.mock.patch('sys.stdout', new_callable=io.StringIO):
+            flag, flux_df, dG_df = check_thermodynamic_feasibility(data_dict)
+
+        rxn_list = data_dict['stoic'].index.values
+        min_met_conc = data_dict['thermoMets']['min (M)'].values
+        max_met_conc = data_dict['thermoMets']['max (M)'].values
+        fluxes = flux_df['vref_mean (mmol/L/h)'].reindex(rxn_list).values
+
+        # the second scenario reverses all fluxes, the third one has ten times higher concentrations
+        feasible = check_thermodynamic_feasibility_batch(data_dict, np.vstack([min_met_conc, min_met_conc,
+                                                                               10 * min_met_conc]),
+                                                         np.vstack([max_met_conc, max_met_conc, 10 * max_met_conc]),
+                                                         np.vstack([fluxes, -fluxes, fluxes]))
+
+        self.assertTupleEqual((3, len(rxn_list)), feasible.shape)
+        self.assertListEqual(['R_RPE', 'R_TALA', 'R_FBA', 'R_TPI', 'R_GAPD', 'R_ENO', 'R_EX_pyr', 'R_EX_pep'],
+                             list(rxn_list[~feasible[0]]))
+        self.assertTrue(feasible[1, ~feasible[0]].all())
+
+        with unittest.mock.patch('sys.stdout', new_callable=io.StringIO):
+            data_dict['thermoMets'][['min (M)', 'max (M)']] *= 10
+            flag, flux_df, dG_df = check_thermodynamic_feasibility(data_dict)
+        self.assertListEqual(list(dG_df.index[(fluxes > 0) & (dG_df['∆G_min'] > 0) | (fluxes < 0) &
+                                              (dG_df['∆G_max'] < 0)]), list(rxn_list[~feasible[2]]))
+
+        with self.assertRaises(ValueError):
+            check_thermodynamic_feasibility_batch(data_dict, min_met_conc[1:], max_met_conc[1:], fluxes)
+
+    def test_sample_dGs(self):
+        temperature = 298  # in K
+        gas_constant = 8.314 * 10 ** -3  # in kJ K^-1 mol^-1
+
+        data_dict = pd.read_excel(os.path.join(self.test_folder, 'model_v2_manual.xlsx'), sheet_name=None, index_col=0)
+        ma_df, dG_Q_df, dG_df = calculate_dG(data_dict, gas_constant, temperature)
+
+        chunks = list(sample_dGs(data_dict, gas_constant, temperature, 2500, chunk_size=1000, seed=0))
+        self.assertListEqual([(1000, 49), (1000, 49), (500, 49)], [chunk.shape for chunk in chunks])
+
+        # log-uniform samples can't leave the range given by calculate_dG
+        dGs = np.vstack(chunks)
+        self.assertTrue((dGs >= dG_df['∆G_min'].values - 10 ** -9).all())
+        self.assertTrue((dGs <= dG_df['∆G_max'].values + 10 ** -9).all())
+
+        # the samples only depend on the seed, not on the chunk size
+        for distribution in ['log-uniform', 'normal']:
+            with self.subTest(distribution=distribution):
+                dGs = np.vstack(list(sample_dGs(data_dict, gas_constant, temperature, 2500, distribution=distribution,
+                                                chunk_size=1000, seed=0)))
+                same_dGs = np.vstack(list(sample_dGs(data_dict, gas_constant, temperature, 2500,
+                                                     distribution=distribution, chunk_size=700, seed=0)))
+                other_dGs = np.vstack(list(sample_dGs(data_dict, gas_constant, temperature, 2500,
+                                                      distribution=distribution, chunk_size=1000, seed=1)))
+
+                np.testing.assert_allclose(dGs, same_dGs, rtol=1e-12, atol=1e-12)
+                self.assertFalse(np.allclose(dGs, other_dGs))
+
+        with self.assertRaises(ValueError):
+            next(sample_dGs(data_dict, gas_constant, temperature, 10, distribution='uniform'))
+
+    def test_get_dG_probabilities(self):
+        temperature = 298  # in K
+        gas_constant = 8.314 * 10 ** -3  # in kJ K^-1 mol^-1
+
+        data_dict = {'stoic': pd.DataFrame([[-1, 1, 0], [0, -1, 0], [0, 0, 1]], index=['R_1', 'R_2', 'R_3'],
+                                           columns=['m_a', 'm_b', 'm_c']),
+                     'thermoMets': pd.DataFrame({'min (M)': [1., 1., 0], 'max (M)': [1., 1., 0]},
+                                                index=['m_a', 'm_b', 'm_c']),
+                     'thermoRxns': pd.DataFrame({'∆Gr\'_min (kJ/mol)': [-10., 8., -2.],
+                                                 '∆Gr\'_max (kJ/mol)': [-8., 10., 2.]}, index=['R_1', 'R_2', 'R_3'])}
+        flux_df = pd.DataFrame({'vref_mean (mmol/L/h)': [1., 1., 0.]}, index=['R_1', 'R_2', 'R_3'])
+
+        for distribution in ['log-uniform', 'normal']:
+            with self.subTest(distribution=distribution):
+                dG_prob_df = get_dG_probabilities(data_dict, gas_constant, temperature, n_samples=20000,
+                                                  distribution=distribution, chunk_size=3000, seed=1,
+                                                  flux_df=flux_df, rxn_order=['R_3', 'R_2', 'R_1'])
+
+                self.assertListEqual(['R_3', 'R_2', 'R_1'], dG_prob_df.index.tolist())
+                self.assertTrue(np.allclose([0, 9, -9], dG_prob_df['∆G_mean'].values, atol=0.1))
+                self.assertListEqual([1, 0], dG_prob_df.loc[['R_1', 'R_2'], 'P(∆G<0)'].tolist())
+                self.assertAlmostEqual(0.5, dG_prob_df.loc['R_3', 'P(∆G<0)'], delta=0.02)
+                self.assertListEqual([0, 1], dG_prob_df.loc[['R_2', 'R_1'], 'P(feasible)'].tolist())
+                self.assertTrue(np.isnan(dG_prob_df.loc['R_3', 'P(feasible)']))
 
@@ -1,5 +1,7 @@
 import os
+import tempfile
 import unittest
+from unittest.mock import patch
 
 import pandas as pd
 
@@ -12,6 +14,15 @@ class TestConvertMechanism(unittest.TestCase):
         this_dir, this_filename = os.path.split(__file__)
         self.test_folder = os.path.join(this_dir, 'test_files', 'test_set_up_models', 'convert_mechanism')
 
+        # keep the read caches out of the user's cache folder
+        self.cache_home = tempfile.TemporaryDirectory()
+        self.cache_home_patch = patch.dict('os.environ', {'XDG_CACHE_HOME': self.cache_home.name})
+        self.cache_home_patch.start()
+
+    def tearDown(self):
+        self.cache_home_patch.stop()
+        self.cache_home.cleanup()
+
     def test_convert_er_mech_to_grasp_pattern_G6PD(self):
         true_res_file = os.path.join(self.test_folder, 'true_res_G6PDH_mech_grasp.txt')
 
@@ -0,0 +1,57 @@
+import subprocess
+import sys
+import unittest
+
+# cumulative import time budget in seconds for each entry point, on top of numpy, pandas and scipy which are imported
+# beforehand (they take a few hundred ms on their own and are needed anyway)
+IMPORT_TIME_BUDGET = 0.25
+
+PRELOADED_MODULES = ['numpy', 'pandas', 'scipy']
+
+HEAVY_MODULES = ['equilibrator_api', 'equilibrator_cache', 'component_contribution', 'pint', 'sqlalchemy']
+
+
+def get_import_times(module_name: str) -> dict:
+    """
+    Imports a module in a fresh interpreter with python -X importtime, after importing the PRELOADED_MODULES, so that
+    their import time is not counted in the module's cumulative import time.
+
+    Args:
+        module_name: name of the module to import.
+
+    Returns:
+        Dictionary with the names of all imported modules as keys and their cumulative import time in seconds as values.
+    """
+
+    res = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                          f'import {", ".join(PRELOADED_MODULES)}; import {module_name}'],
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+
+    import_times = {}
+    for line in res.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+
+        self_time, cumulative_time, imported_module = line[len('import time:'):].split('|')
+        import_times[imported_module.strip()] = int(cumulative_time) * 1e-6
+
+    return import_times
+
+
+class TestImportTime(unittest.TestCase):
+
+    def test_import_time(self):
+        for module_name in ['set_up_grasp_models.set_up_models.set_up_model',
+                            'set_up_grasp_models.set_up_models.manipulate_model',
+                            'set_up_grasp_models.check_models.format_checks',
+                            'set_up_grasp_models.check_models.mass_balance_checks',
+                            'set_up_grasp_models.check_models.thermodynamics_checks',
+                            'set_up_grasp_models.set_up_models.set_up_thermo_rxns',
+                            'set_up_grasp_models.set_up_models.thermo_backends']:
+            with self.subTest(module_name=module_name):
+                import_times = get_import_times(module_name)
+
+                heavy_modules = sorted(imported_module for imported_module in import_times
+                                       if imported_module.split('.')[0] in HEAVY_MODULES)
+                self.assertListEqual([], heavy_modules)
+                self.assertLess(import_times[module_name], IMPORT_TIME_BUDGET)
@@ -1,8 +1,20 @@
+import bz2
+import gzip
+import io
+import lzma
 import os
-import unittest
+import shutil
+import tempfile
+import unittest.mock
 
-from set_up_grasp_models.io.plaintext import import_model_from_plaintext, write_to_plaintext
+import pandas as pd
+
+from set_up_grasp_models.check_models.mass_balance_checks import check_flux_balance
+from set_up_grasp_models.io.bigg_kegg_map import load_bigg_to_kegg_map, _loaded_maps
+from set_up_grasp_models.io.plaintext import import_model_from_plaintext, iter_reactions_from_plaintext, \
+    write_to_plaintext, _get_line_aligned_chunks
 from set_up_grasp_models.io.stoic import import_stoic
+from set_up_grasp_models.io.workbook import CACHE_DIR_NAME, LazyWorkbook, get_default_cache_dir, read_workbook
 
 TRUE_RXN_LIST = ['ABC: glc_D_p + atp + h2o <-> glc_D + adp + h + p',
                  'GLK: glc_D + atp <-> adp + h + g6p',
@@ -44,6 +56,15 @@ class TestIO(unittest.TestCase):
         self.file_in_excel = os.path.join(self.test_folder, 'model_with_PPP.xlsx')
         self.file_in_plaintext = os.path.join(self.test_folder, 'model_with_PPP_plaintext.txt')
 
+        # keep the read caches out of the user's cache folder
+        self.cache_home = tempfile.TemporaryDirectory()
+        self.cache_home_patch = unittest.mock.patch.dict('os.environ', {'XDG_CACHE_HOME': self.cache_home.name})
+        self.cache_home_patch.start()
+
+    def tearDown(self):
+        self.cache_home_patch.stop()
+        self.cache_home.cleanup()
+
     def test_import_stoic(self):
         mets, rxns, rxn_strings = import_stoic(self.file_in_excel)
         self.assertListEqual(TRUE_RXN_LIST, rxn_strings)
@@ -58,3 +79,185 @@ class TestIO(unittest.TestCase):
 
         model = import_model_from_plaintext(self.file_in_plaintext)
         self.assertListEqual(TRUE_RXN_LIST, model.to_string().split('\n'))
+
+    def test_import_model_from_plaintext_parallel(self):
+        true_model = import_model_from_plaintext(self.file_in_plaintext)
+
+        for n_processes in [2, 3, 50]:
+            model = import_model_from_plaintext(self.file_in_plaintext, n_processes=n_processes)
+            self.assertListEqual(TRUE_RXN_LIST, model.to_string().split('\n'))
+            self.assertListEqual(list(true_model.metabolites.keys()), list(model.metabolites.keys()))
+
+    def test_get_line_aligned_chunks(self):
+        chunks = _get_line_aligned_chunks(self.file_in_plaintext, 4)
+
+        with open(self.file_in_plaintext, 'rb') as f_in:
+            content = f_in.read()
+
+        self.assertEqual(0, chunks[0][0])
+        self.assertEqual(len(content), chunks[-1][1])
+        for (start, end), (next_start, next_end) in zip(chunks[:-1], chunks[1:]):
+            self.assertEqual(end, next_start)
+            self.assertEqual(b'\n', content[end - 1:end])
+
+    def test_iter_reactions_from_plaintext(self):
+        rxns = list(iter_reactions_from_plaintext(self.file_in_plaintext))
+        true_model = import_model_from_plaintext(self.file_in_plaintext)
+
+        self.assertListEqual([rxn.id for rxn in true_model.reactions.values()], [rxn[0] for line_no, rxn in rxns])
+        self.assertListEqual([dict(rxn.stoichiometry) for rxn in true_model.reactions.values()],
+                             [dict(rxn[2]) for line_no, rxn in rxns])
+
+        with open(self.file_in_plaintext, 'r') as f_in:
+            lines = f_in.readlines()
+
+        for line_no, rxn in rxns:
+            self.assertTrue(lines[line_no - 1].strip().startswith(rxn[0] + ':'))
+
+    def test_iter_reactions_from_plaintext_compressed(self):
+        true_rxns = list(iter_reactions_from_plaintext(self.file_in_plaintext, kind='cb'))
+
+        with open(self.file_in_plaintext, 'rb') as f_in:
+            content = f_in.read()
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for compression, open_func in [('gz', gzip.open), ('bz2', bz2.open), ('xz', lzma.open)]:
+                file_out = os.path.join(tmp_dir, f'model_with_PPP_plaintext.txt.{compression}')
+                with open_func(file_out, 'wb') as f_out:
+                    f_out.write(content)
+
+                self.assertListEqual(true_rxns, list(iter_reactions_from_plaintext(file_out, kind='cb')))
+
+                model = import_model_from_plaintext(file_out, n_processes=2)
+                self.assertEqual('model_with_PPP_plaintext', model.id)
+                self.assertListEqual(TRUE_RXN_LIST, model.to_string().split('\n'))
+
+    def test_iter_reactions_from_plaintext_syntax_error(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_out = os.path.join(tmp_dir, 'plaintext_syntax_error.txt')
+            write_to_plaintext(TRUE_RXN_LIST[:2] + ['R1: a -> b'], file_out, print_instructions=True)
+
+            with self.assertRaisesRegex(SyntaxError, 'line 11') as context:
+                list(iter_reactions_from_plaintext(file_out))
+
+            self.assertIsInstance(context.exception.__cause__, SyntaxError)
+
+    def test_import_stoic_mixed_coeffs(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_in = os.path.join(tmp_dir, 'model.xlsx')
+            stoic_df = pd.DataFrame({'m_a': [-2, -1, None], 'm_b': [1, -1.5, 1], 'm_c': [2, 3, -1]},
+                                    index=['R1', 'R2', 'R3'])
+            stoic_df.to_excel(file_in, sheet_name='stoic')
+
+            mets, rxns, rxn_strings = import_stoic(file_in)
+
+        self.assertListEqual(['R1: 2 m_a <-> m_b + 2 m_c', 'R2: m_a + 1.5 m_b <-> 3 m_c', 'R3: m_c <-> m_b'],
+                             rxn_strings)
+
+    def test_import_stoic_return_matrix(self):
+        mets, rxns, rxn_strings, stoic_matrix = import_stoic(self.file_in_excel, return_matrix=True)
+        model = import_model_from_plaintext(self.file_in_plaintext)
+
+        self.assertListEqual(TRUE_RXN_LIST, rxn_strings)
+        self.assertEqual((len(mets), len(rxns)), stoic_matrix.shape)
+        self.assertEqual(1.5, stoic_matrix[list(mets).index('g3p_ex'), list(rxns).index('G3P_EX')])
+
+        m_index = [list(mets).index(m_id) for m_id in model.metabolites]
+        self.assertEqual(0, abs(stoic_matrix[m_index, :] - model.sparse_stoichiometric_matrix()).max())
+
+    def test_read_workbook_cache(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dir = os.path.join(tmp_dir, 'data')
+            os.mkdir(data_dir)
+            file_in = os.path.join(data_dir, 'model.xlsx')
+            cache_dir = os.path.join(tmp_dir, 'cache', CACHE_DIR_NAME)
+            shutil.copyfile(self.file_in_excel, file_in)
+
+            true_res = pd.read_excel(file_in, sheet_name=None, index_col=0)
+            with unittest.mock.patch.dict('os.environ', {'XDG_CACHE_HOME': os.path.join(tmp_dir, 'cache')}):
+                self.assertEqual(cache_dir, get_default_cache_dir())
+                res = read_workbook(file_in, sheet_name=None, index_col=0)
+                cached_res = read_workbook(file_in, sheet_name=None, index_col=0)
+
+            # nothing is written next to the workbook
+            self.assertListEqual(['model.xlsx'], os.listdir(data_dir))
+            self.assertEqual(1, len(os.listdir(cache_dir)))
+            self.assertListEqual(list(true_res.keys()), list(cached_res.keys()))
+            for sheet in true_res:
+                pd.testing.assert_frame_equal(true_res[sheet], res[sheet])
+                pd.testing.assert_frame_equal(true_res[sheet], cached_res[sheet])
+
+            stoic_df = read_workbook(file_in, sheet_name='stoic', index_col=0, cache_dir=cache_dir)
+            pd.testing.assert_frame_equal(true_res['stoic'], stoic_df)
+            self.assertEqual(2, len(os.listdir(cache_dir)))
+
+            # a workbook with the same name in another folder gets its own entry
+            other_file_in = os.path.join(tmp_dir, 'model.xlsx')
+            shutil.copyfile(self.file_in_excel, other_file_in)
+            read_workbook(other_file_in, sheet_name=None, index_col=0, cache_dir=cache_dir)
+            self.assertEqual(3, len(os.listdir(cache_dir)))
+
+            shutil.copyfile(os.path.join(self.test_folder, '..', 'test_set_up_models', 'set_up_model',
+                                         'true_res_model_v1.xlsx'), file_in)
+            new_res = read_workbook(file_in, sheet_name=None, index_col=0, cache_dir=cache_dir)
+
+            self.assertEqual(2, len(os.listdir(cache_dir)))
+            self.assertNotEqual(list(true_res.keys()), list(new_res.keys()))
+
+    def test_lazy_workbook(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            file_in = os.path.join(self.test_folder, '..', 'test_check_models', 'HMP2360_r0_t0.xlsx')
+            true_res = pd.read_excel(file_in, sheet_name=None, index_col=0)
+            data_dict = LazyWorkbook(file_in, cache_dir=cache_dir, index_col=0,
+                                     usecols={'rxns': [0, 2]}, dtype={'rxns': {'transportRxn?': float}})
+
+            self.assertListEqual(list(true_res.keys()), list(data_dict.keys()))
+            self.assertFalse(any(data_dict.is_loaded(sheet) for sheet in data_dict))
+
+            # the workbook is hashed once, not once per sheet
+            with unittest.mock.patch('sys.stdout', new_callable=io.StringIO), \
+                    unittest.mock.patch('set_up_grasp_models.io.workbook.get_file_hash') as mock_get_file_hash:
+                check_flux_balance(data_dict)
+
+            mock_get_file_hash.assert_not_called()
+
+            self.assertSetEqual({'measRates', 'mets', 'stoic'},
+                                {sheet for sheet in data_dict if data_dict.is_loaded(sheet)})
+            pd.testing.assert_frame_equal(true_res['stoic'], data_dict['stoic'])
+            pd.testing.assert_frame_equal(true_res['measRates'], data_dict['measRates'])
+            pd.testing.assert_frame_equal(true_res['rxns'][['transportRxn?']].astype(float), data_dict['rxns'])
+
+            data_dict['new_sheet'] = true_res['mets']
+            del data_dict['kinetics1']
+            self.assertEqual('new_sheet', list(data_dict.keys())[-1])
+            self.assertNotIn('kinetics1', data_dict)
+            with self.assertRaises(KeyError):
+                data_dict['kinetics1']
+
+    def test_load_bigg_to_kegg_map(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dir = os.path.join(tmp_dir, 'data')
+            os.mkdir(data_dir)
+            file_in = os.path.join(data_dir, 'map_bigg_to_kegg_ids.csv')
+            cache_dir = os.path.join(tmp_dir, 'cache', CACHE_DIR_NAME)
+            shutil.copyfile(os.path.join(self.test_folder, '..', 'test_set_up_models', 'set_up_thermo_rxns',
+                                         'map_bigg_to_kegg_ids.csv'), file_in)
+
+            with unittest.mock.patch.dict('os.environ', {'XDG_CACHE_HOME': os.path.join(tmp_dir, 'cache')}):
+                bigg_kegg_map = load_bigg_to_kegg_map(file_in)
+
+            # nothing is written next to the mapping file
+            self.assertListEqual(['map_bigg_to_kegg_ids.csv'], os.listdir(data_dir))
+            self.assertEqual(1, len(os.listdir(cache_dir)))
+            self.assertIs(bigg_kegg_map, load_bigg_to_kegg_map(file_in, cache_dir=cache_dir))
+            self.assertDictEqual(dict(load_bigg_to_kegg_map(file_in, use_cache=False)), dict(bigg_kegg_map))
+
+            self.assertTupleEqual(('C00031',), bigg_kegg_map['glc__D'])
+            self.assertTupleEqual(('C00681', 'C03849'), bigg_kegg_map['1ag3p_SC'])
+            self.assertTupleEqual((), bigg_kegg_map['q8h2'])
+            self.assertNotIn('glc_D', bigg_kegg_map)
+
+            # a new process only has the disk cache
+            _loaded_maps.clear()
+            with unittest.mock.patch('pandas.read_csv', side_effect=RuntimeError):
+                self.assertDictEqual(dict(bigg_kegg_map), dict(load_bigg_to_kegg_map(file_in, cache_dir=cache_dir)))
@@ -0,0 +1,248 @@
+import os
+import pickle
+import unittest
+from copy import deepcopy
+
+import numpy as np
+
+from set_up_grasp_models.io.plaintext import import_model_from_plaintext
+from set_up_grasp_models.model.model import Compartment, Model
+
+
+class TestModel(unittest.TestCase):
+
+    def setUp(self):
+        this_dir, this_filename = os.path.split(__file__)
+        self.test_folder = os.path.join(this_dir, 'test_files', 'test_io')
+        self.file_in_plaintext = os.path.join(self.test_folder, 'model_with_PPP_plaintext.txt')
+        self.model = import_model_from_plaintext(self.file_in_plaintext)
+
+    def test_metabolite_and_reaction_index(self):
+        m_index = self.model.metabolite_index()
+        r_index = self.model.reaction_index()
+
+        self.assertListEqual(list(self.model.metabolites.keys()), list(m_index.keys()))
+        self.assertListEqual(list(range(len(self.model.metabolites))), list(m_index.values()))
+        self.assertListEqual(list(self.model.reactions.keys()), list(r_index.keys()))
+        self.assertListEqual(list(range(len(self.model.reactions))), list(r_index.values()))
+
+    def test_sparse_stoichiometric_matrix(self):
+        s_matrix = self.model.sparse_stoichiometric_matrix()
+        m_index = self.model.metabolite_index()
+        r_index = self.model.reaction_index()
+
+        self.assertEqual((len(self.model.metabolites), len(self.model.reactions)), s_matrix.shape)
+        self.assertEqual(sum(len(rxn.stoichiometry) for rxn in self.model.reactions.values()), s_matrix.nnz)
+        self.assertEqual(-1, s_matrix[m_index['glc_D_p'], r_index['ABC']])
+        self.assertEqual(1.5, s_matrix[m_index['g3p_ex'], r_index['G3P_EX']])
+        self.assertEqual(0, s_matrix[m_index['g3p_ex'], r_index['ABC']])
+
+    def test_stoichiometric_matrix(self):
+        true_res = [[rxn.stoichiometry.get(m_id, 0) for rxn in self.model.reactions.values()]
+                    for m_id in self.model.metabolites]
+
+        self.assertListEqual(true_res, self.model.stoichiometric_matrix())
+        self.assertTrue(np.array_equal(np.array(true_res), self.model.stoichiometric_matrix(as_array=True)))
+
+    def test_sparse_stoichiometric_matrix_after_removal(self):
+        self.model.sparse_stoichiometric_matrix()
+        self.model.remove_reactions(['ABC'])
+        s_matrix = self.model.sparse_stoichiometric_matrix()
+
+        self.assertEqual(len(self.model.reactions), s_matrix.shape[1])
+        self.assertNotIn('ABC', self.model.reaction_index())
+
+    def test_sparse_stoichiometric_matrix_interleaved_edits(self):
+        def assert_matrix_up_to_date():
+            s_matrix = self.model.sparse_stoichiometric_matrix()
+            true_res = [[rxn.stoichiometry.get(m_id, 0) for rxn in self.model.reactions.values()]
+                        for m_id in self.model.metabolites]
+            self.assertListEqual(true_res, s_matrix.toarray().tolist())
+
+        assert_matrix_up_to_date()
+        self.model.metabolite_reaction_lookup()
+
+        # new reaction with a new metabolite, replaced reaction, removed reaction
+        self.model.add_reaction_from_str('NEW1: g6p <-> 2 new_met')
+        assert_matrix_up_to_date()
+        self.model.add_reaction_from_str('PGI: g6p <-> 2 f6p')
+        assert_matrix_up_to_date()
+        self.model.remove_reaction('ABC')
+        assert_matrix_up_to_date()
+
+        # several edits between reads
+        self.model.add_reaction_from_str('NEW2: new_met + atp <-> adp')
+        self.model.remove_reaction('NEW1')
+        self.model.add_reaction_from_str('ABC: new_met <-> g3p')
+        assert_matrix_up_to_date()
+
+        self.model.remove_metabolite('new_met')
+        assert_matrix_up_to_date()
+
+    def test_incremental_lookups(self):
+        self.model.metabolite_reaction_lookup()
+        self.model.regulatory_lookup()
+        self.model.metabolite_index()
+        self.model.reaction_index()
+
+        self.model.add_reaction_from_str('NEW: g6p + atp <-> new_met + adp')
+        self.model.reactions['GLK'].regulators['pep'] = '-'
+        self.model.add_reaction(self.model.reactions['GLK'])
+        self.model.add_reaction_from_str('ZWF: g6p + nad <-> h + o_6pgl + nadh')
+        self.model.remove_reactions(['PGL', 'EDD'])
+        self.model.remove_metabolites(['co2'])
+
+        lookup = {m_id: dict(row) for m_id, row in self.model.metabolite_reaction_lookup().items()}
+        reg_lookup = {m_id: dict(row) for m_id, row in self.model.regulatory_lookup().items()}
+        true_lookup = {m_id: dict(row) for m_id, row in self.model.metabolite_reaction_lookup(
+            force_recalculate=True).items()}
+
+        self.model._reg_lookup = None
+        true_reg_lookup = {m_id: dict(row) for m_id, row in self.model.regulatory_lookup().items()}
+
+        self.assertDictEqual(true_lookup, lookup)
+        self.assertDictEqual(true_reg_lookup, reg_lookup)
+        self.assertListEqual(['GLK'], self.model.get_inhibition_targets('pep'))
+        self.assertListEqual(['NEW'], self.model.get_metabolite_producers('new_met'))
+        self.assertNotIn('nadp', [m_id for m_id, row in lookup.items() if 'ZWF' in row])
+        self.assertListEqual(list(self.model.reactions.keys()), list(self.model.reaction_index().keys()))
+        self.assertListEqual(list(self.model.metabolites.keys()), list(self.model.metabolite_index().keys()))
+
+    def test_copy(self):
+        model_copy = self.model.copy()
+
+        self.assertListEqual(self.model.to_string().split('\n'), model_copy.to_string().split('\n'))
+        for r_id, rxn in model_copy.reactions.items():
+            self.assertIsNot(self.model.reactions[r_id], rxn)
+
+    def test_copy_independent(self):
+        model_copy = self.model.copy()
+
+        model_copy.reactions['GLK'].reversible = False
+        model_copy.reactions.ZWF.stoichiometry['nadp'] = -2
+        model_copy.remove_metabolites(['h2o'])
+
+        self.assertTrue(self.model.reactions['GLK'].reversible)
+        self.assertEqual(-1, self.model.reactions['ZWF'].stoichiometry['nadp'])
+        self.assertIn('h2o', self.model.reactions['ABC'].stoichiometry)
+        self.assertIn('h2o', self.model.metabolites)
+        self.assertFalse(model_copy.reactions['GLK'].reversible)
+        self.assertNotIn('h2o', model_copy.reactions['ABC'].stoichiometry)
+
+        self.model.reactions['PGI'].reversible = False
+        self.assertTrue(model_copy.reactions['PGI'].reversible)
+
+    def test_copy_independent_values_and_references(self):
+        true_reversible = [rxn.reversible for rxn in self.model.reactions.values()]
+        true_compartments = [met.compartment for met in self.model.metabolites.values()]
+        glk = self.model.reactions['GLK']
+        model_copy = self.model.copy()
+
+        # changes made through values(), items() and get() in the copy
+        for rxn in model_copy.reactions.values():
+            rxn.reversible = not rxn.reversible
+        for m_id, met in model_copy.metabolites.items():
+            met.compartment = 'new_comp'
+        model_copy.reactions.get('ZWF').stoichiometry['nadp'] = -2
+
+        self.assertListEqual(true_reversible, [rxn.reversible for rxn in self.model.reactions.values()])
+        self.assertListEqual(true_compartments, [met.compartment for met in self.model.metabolites.values()])
+        self.assertEqual(-1, self.model.reactions['ZWF'].stoichiometry['nadp'])
+
+        # changes made through a reference held from before the copy
+        glk.stoichiometry['atp'] = -3
+        self.assertEqual(-1, model_copy.reactions['GLK'].stoichiometry['atp'])
+
+        # a second copy doesn't share elements with the first one
+        model_copy_2 = self.model.copy()
+        model_copy_2.reactions['PGI'].reversible = not model_copy_2.reactions['PGI'].reversible
+        self.assertNotEqual(model_copy.reactions['PGI'].reversible, self.model.reactions['PGI'].reversible)
+        self.assertEqual(model_copy.reactions['PGI'].reversible, model_copy_2.reactions['PGI'].reversible)
+
+    def test_copy_on_write(self):
+        glk = self.model.reactions['GLK']
+        atp = self.model.metabolites['atp']
+        model_copy = self.model.copy()
+        model_copy_2 = model_copy.copy()
+
+        # elements are shared until they are accessed through the copy
+        self.assertIs(glk, model_copy.reactions._peek('GLK'))
+        self.assertIs(glk, model_copy_2.reactions._peek('GLK'))
+        self.assertIsNot(self.model.reactions['PGI'], model_copy.reactions['PGI'])
+        self.assertIs(self.model.reactions['PGI'], self.model.reactions._peek('PGI'))
+        self.assertIs(self.model.reactions['ZWF'], model_copy_2.reactions._peek('ZWF'))
+
+        # or until they are changed in the original model
+        glk.name = 'glucokinase'
+        glk.regulators['pep'] = '-'
+        glk.metadata['EC'] = '2.7.1.2'
+        del glk.stoichiometry['atp']
+        atp.compartment = 'new_comp'
+
+        self.assertIs(glk, self.model.reactions['GLK'])
+        for model in [model_copy, model_copy_2]:
+            self.assertIsNot(glk, model.reactions._peek('GLK'))
+            self.assertEqual('GLK', model.reactions['GLK'].name)
+            self.assertListEqual([], model.reactions['GLK'].get_inhibitors())
+            self.assertNotIn('EC', model.reactions['GLK'].metadata)
+            self.assertEqual(-1, model.reactions['GLK'].stoichiometry['atp'])
+            self.assertNotEqual('new_comp', model.metabolites['atp'].compartment)
+
+        # copies with shared elements can be pickled and deep-copied
+        model_copy_3 = self.model.copy()
+        for model in [pickle.loads(pickle.dumps(model_copy_3)), deepcopy(model_copy_3)]:
+            self.assertListEqual(self.model.to_string().split('\n'), model.to_string().split('\n'))
+
+    def test_stoichiometry_view(self):
+        rxn = self.model.reactions['GLK']
+
+        self.assertListEqual([('glc_D', -1), ('atp', -1), ('adp', 1), ('h', 1), ('g6p', 1)], rxn.stoichiometry.items())
+        self.assertFalse(hasattr(rxn, '__dict__'))
+
+        rxn.stoichiometry['atp'] = -2
+        rxn.stoichiometry['new_met'] = 0.5
+        del rxn.stoichiometry['h']
+
+        self.assertDictEqual({'glc_D': -1, 'atp': -2, 'adp': 1, 'g6p': 1, 'new_met': 0.5}, dict(rxn.stoichiometry))
+        self.assertEqual('GLK: glc_D + 2.0 atp <-> adp + g6p + 0.5 new_met', rxn.to_string())
+        with self.assertRaises(KeyError):
+            del rxn.stoichiometry['h']
+
+    def test_pickle_and_deepcopy(self):
+        self.model.reactions['GLK'].metadata['EC'] = '2.7.1.2'
+        self.model.reactions['GLK'].regulators['pep'] = '-'
+
+        for model_copy in [pickle.loads(pickle.dumps(self.model)), deepcopy(self.model)]:
+            self.assertListEqual(self.model.to_string().split('\n'), model_copy.to_string().split('\n'))
+            self.assertEqual('2.7.1.2', model_copy.reactions['GLK'].metadata['EC'])
+            self.assertListEqual(['pep'], model_copy.reactions['GLK'].get_inhibitors())
+            self.assertEqual(self.model.metabolites['atp'].name, model_copy.metabolites['atp'].name)
+
+    def test_add_reactions_from_strs(self):
+        rxn_strings = self.model.to_string().split('\n')
+
+        model = Model('bulk')
+        r_ids = model.add_reactions_from_strs(rxn_strings)
+
+        self.assertListEqual(list(self.model.reactions.keys()), r_ids)
+        self.assertListEqual(rxn_strings, model.to_string().split('\n'))
+        self.assertListEqual(list(self.model.metabolites.keys()), list(model.metabolites.keys()))
+        self.assertListEqual(self.model.get_metabolite_producers('g6p'), model.get_metabolite_producers('g6p'))
+
+    def test_add_reactions_from_tuples(self):
+        model = Model('bulk')
+        model.add_compartment(Compartment('c'))
+        model.add_reaction_from_str('R1: a + b --> c', default_compartment='c')
+        model.metabolite_reaction_lookup()
+
+        model.add_reactions_from_tuples([('R2', True, {'c': -1, 'd': 2}), ('R1', False, {'a': -1, 'e': 1})],
+                                        default_compartment='c')
+
+        self.assertListEqual(['R1: a --> e', 'R2: c <-> 2.0 d'], model.to_string().split('\n'))
+        self.assertListEqual(['a', 'b', 'c', 'd', 'e'], list(model.metabolites.keys()))
+        self.assertEqual('c', model.metabolites['e'].compartment)
+        self.assertListEqual(['R2'], model.get_metabolite_producers('d'))
+        self.assertListEqual([], model.get_metabolite_reactions('b'))
+
+        with self.assertRaises(KeyError):
+            model.add_reactions_from_tuples([('R3', True, {'a': -1})], default_compartment='p')
@@ -0,0 +1,99 @@
+import os
+import unittest
+
+from set_up_grasp_models.model.parser import ReactionParser
+
+VALID_RXNS = ['R1: a + b --> c',
+              'R1: a + b <-> c',
+              'R_2:a+b-->c',
+              'R3 : 2 a + 0.5 b <-> 1e3 c + 2.5e-2 d',
+              'R4: a + a --> b + b',
+              'R5: a + 2 b --> 3 b + a',
+              'R6: --> a',
+              'R7: a -->',
+              'R8: -->',
+              'R9: a --> b [-10, 10]',
+              'R10: a <-> b [, 10]',
+              'R11: a <-> b [ -1.5e2 , ]',
+              'R12: a --> b[0,1000]@1',
+              'R13: a --> b @-0.5',
+              'R14: a <-> b [,] @2e1',
+              'R15: a --> [0, 1]',
+              'R16: a --> b   ',
+              'R17: a --> b\n',
+              'R18: a --> b [0, 1] @1\n',
+              'R19: a\t+\tb -->\tc',
+              'R20: m_1 + glc__D_e <-> M_äbc']
+
+INVALID_RXNS = ['',
+                'R1 a --> b',
+                '1R: a --> b',
+                ' R1: a --> b',
+                'R1: a -> b',
+                'R1: a <- b',
+                'R1: a + --> b',
+                'R1: + a --> b',
+                'R1: a b --> c',
+                'R1: 2a --> c',
+                'R1: 2 --> c',
+                'R1: 2. a --> c',
+                'R1: 2e a --> c',
+                'R1: 2E3 a --> c',
+                'R1: -2 a --> c',
+                'R1: a-b --> c',
+                'R1: a[c] --> b',
+                'R1: a --> b --> c',
+                'R1: a <-> b --> c',
+                'R1: a --> b [0, 1',
+                'R1: a --> b [0 1]',
+                'R1: a --> b [0, 1, 2]',
+                'R1: a --> b [a, 1]',
+                'R1: a --> b [0, 1] c',
+                'R1: a --> b @1 [0, 1]',
+                'R1: a --> b @',
+                'R1: a --> b @ 1',
+                'R1: a --> b @1 ',
+                'R1: a --> b @1\n\n',
+                'R1: a --> b\nc']
+
+
+class TestReactionParser(unittest.TestCase):
+
+    def setUp(self):
+        this_dir, this_filename = os.path.split(__file__)
+        self.file_in_plaintext = os.path.join(this_dir, 'test_files', 'test_io', 'model_with_PPP_plaintext.txt')
+
+        self.regex_parser = ReactionParser()
+        self.tokenizer_parser = ReactionParser(mode='tokenizer')
+
+    def _assert_same_result(self, rxn_str, kind):
+        true_res = self.regex_parser.parse_reaction(rxn_str, kind=kind)
+        res = self.tokenizer_parser.parse_reaction(rxn_str, kind=kind)
+
+        self.assertEqual(true_res, res, msg=repr(rxn_str))
+        self.assertListEqual(list(true_res[2].items()), list(res[2].items()), msg=repr(rxn_str))
+        self.assertListEqual([type(val) for val in true_res], [type(val) for val in res], msg=repr(rxn_str))
+        self.assertListEqual([type(val) for val in true_res[2].values()], [type(val) for val in res[2].values()],
+                             msg=repr(rxn_str))
+
+    def test_tokenizer_parity_valid(self):
+        for rxn_str in VALID_RXNS:
+            for kind in [None, 'cb']:
+                self._assert_same_result(rxn_str, kind)
+
+    def test_tokenizer_parity_invalid(self):
+        for rxn_str in INVALID_RXNS:
+            for parser in [self.regex_parser, self.tokenizer_parser]:
+                with self.assertRaises(SyntaxError, msg=f'{parser.mode}: {rxn_str!r}'):
+                    parser.parse_reaction(rxn_str)
+
+    def test_tokenizer_parity_model_file(self):
+        with open(self.file_in_plaintext, 'r') as f_in:
+            rxn_strings = [line.strip() for line in f_in if line.strip() and not line.startswith('#')]
+
+        for rxn_str in rxn_strings:
+            self._assert_same_result(rxn_str, 'cb')
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            ReactionParser(mode='fast')
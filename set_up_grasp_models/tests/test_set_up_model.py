@@ -1,4 +1,5 @@
 import os
+import tempfile
 import unittest
 from unittest.mock import patch
 import pandas as pd
@@ -14,6 +15,15 @@ class TestSetUpModel(unittest.TestCase):
         self.test_folder = os.path.join(this_dir, 'test_files', 'test_set_up_models', 'set_up_model')
         self.file_in_stoic = os.path.join(self.test_folder, 'model_with_PPP_plaintext.txt')
 
+        # keep the read caches out of the user's cache folder
+        self.cache_home = tempfile.TemporaryDirectory()
+        self.cache_home_patch = patch.dict('os.environ', {'XDG_CACHE_HOME': self.cache_home.name})
+        self.cache_home_patch.start()
+
+    def tearDown(self):
+        self.cache_home_patch.stop()
+        self.cache_home.cleanup()
+
     def test_set_up_model_empty_base(self):
 
         true_res = pd.read_excel(os.path.join(self.test_folder, 'true_res_model_v1.xlsx'), sheet_name=None)
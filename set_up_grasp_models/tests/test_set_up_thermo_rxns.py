@@ -1,11 +1,15 @@
+import io
 import os
+import tempfile
 import unittest
 from unittest.mock import patch
 
+import numpy as np
 import pandas as pd
 
 from set_up_grasp_models.set_up_models.set_up_thermo_rxns import convert_rxns_to_kegg, get_dGs, _parse_rxns, \
-    _convert_met_ids_to_kegg, _convert_rxn_str_to_kegg_ids, _set_up_model_thermo_rxns
+    get_dGs_with_covariance, set_up_thermo_rxns_sweep, _convert_met_ids_to_kegg, _convert_rxn_str_to_kegg_ids, \
+    _set_up_model_thermo_rxns
 
 
 class TestSetUpThermoRxns(unittest.TestCase):
@@ -14,6 +18,12 @@ class TestSetUpThermoRxns(unittest.TestCase):
         this_dir, this_filename = os.path.split(__file__)
         self.test_folder = os.path.join(this_dir, 'test_files', 'test_set_up_models', 'set_up_thermo_rxns',)
         self.file_bigg_kegg_ids = os.path.join(self.test_folder, 'map_bigg_to_kegg_ids.csv')
+
+        # keep the read caches out of the user's cache folder
+        self.cache_home = tempfile.TemporaryDirectory()
+        self.cache_home_patch = patch.dict('os.environ', {'XDG_CACHE_HOME': self.cache_home.name})
+        self.cache_home_patch.start()
+
         self.base_df = pd.read_excel(os.path.join(self.test_folder, 'model_v1_manual2_EX.xlsx'), sheet_name=None)
         self.rxn_list = ['R_GLCtex: m_glc__D_e <-> m_glc__D_p',
                          'R_GLCabcpp: m_glc__D_p + m_atp_c + m_h2o_c <-> m_glc__D_c + m_adp_c + m_pi_c',
@@ -47,6 +57,10 @@ class TestSetUpThermoRxns(unittest.TestCase):
                          'R_EX_pep: m_pep_c <-> m_pep_e', 'R_EX_h2o2: m_h2o2_e <-> m_h2o2_c']
         self.maxDiff = None
 
+    def tearDown(self):
+        self.cache_home_patch.stop()
+        self.cache_home.cleanup()
+
     def test_parse_rxns(self):
         true_met_bigg_ids = {'m_q8h2_c', 'm_g6p_c', 'm_f6p_c', 'm_glc__D_e', 'm_g3p_c', 'm_nadh_c', 'm_atp_c',
                              'm_pep_e', 'm_glc__D_c', 'm_6pgl_c', 'm_h2o2_e', 'm_glc__D_p', 'm_glcn_p', 'm_nad_c',
@@ -90,6 +104,43 @@ class TestSetUpThermoRxns(unittest.TestCase):
         self.assertDictEqual(true_mets_kegg_dic, mets_kegg_dic)
         self.assertListEqual(true_mets_without_kegg_id, mets_without_kegg_id)
 
+    def test_convert_met_ids_to_kegg_resolution(self):
+        map_bigg_to_kegg_ids = pd.DataFrame({'id_kegg': ['C00031', 'C00001', 'C00092', 'C00092', 'C00092', 'C00001',
+                                                         None]},
+                                            index=['glc__D', 'g6p', 'g6p', 'g6p_B', 'g6p_C', 'h2o', 'q8h2'])
+        met_bigg_ids = {'m_glc__D_c', 'm_g6p_c', 'm_h2o_c', 'm_q8h2_c'}
+
+        true_res = {'first': ({'glc__D': ['C00031'], 'g6p': ['C00001'], 'h2o': ['C00001'], 'q8h2': ''}, ['q8h2']),
+                    'most-referenced': ({'glc__D': ['C00031'], 'g6p': ['C00092'], 'h2o': ['C00001'], 'q8h2': ''},
+                                        ['q8h2']),
+                    'skip': ({'glc__D': ['C00031'], 'g6p': '', 'h2o': ['C00001'], 'q8h2': ''}, ['g6p', 'q8h2'])}
+
+        for resolution, (true_mets_kegg_dic, true_mets_without_kegg_id) in true_res.items():
+            with patch('builtins.input', side_effect=AssertionError), \
+                    patch('sys.stdout', new_callable=io.StringIO) as stdout:
+                mets_kegg_dic, mets_without_kegg_id = _convert_met_ids_to_kegg(met_bigg_ids, map_bigg_to_kegg_ids,
+                                                                               resolution=resolution)
+
+            self.assertDictEqual(true_mets_kegg_dic, mets_kegg_dic)
+            self.assertListEqual(true_mets_without_kegg_id, sorted(mets_without_kegg_id))
+            self.assertIn('q8h2: no KEGG id found', stdout.getvalue())
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_resolution = os.path.join(tmp_dir, 'kegg_id_resolution.csv')
+            pd.DataFrame({'bigg_id': ['g6p', 'q8h2'], 'kegg_id': ['C00092', '']}).to_csv(file_resolution, index=False)
+
+            with patch('builtins.input', side_effect=AssertionError), \
+                    patch('sys.stdout', new_callable=io.StringIO) as stdout:
+                mets_kegg_dic, mets_without_kegg_id = _convert_met_ids_to_kegg(met_bigg_ids, map_bigg_to_kegg_ids,
+                                                                               resolution=file_resolution)
+
+        self.assertDictEqual({'glc__D': ['C00031'], 'g6p': ['C00092'], 'h2o': ['C00001'], 'q8h2': ''}, mets_kegg_dic)
+        self.assertListEqual(['q8h2'], mets_without_kegg_id)
+        self.assertEqual('', stdout.getvalue())
+
+        with self.assertRaises(ValueError):
+            _convert_met_ids_to_kegg(met_bigg_ids, map_bigg_to_kegg_ids, resolution='last')
+
     def test_convert_rxn_str_to_kegg_ids(self):
         true_res = {'R_GLCtex': 'C00031 = C00031', 'R_GLCabcpp': 'C00031 + C00002 + C00001 = C00031 + C00008 + C00009',
                     'R_GLK': 'C00031 + C00002 = C00008 + C00092', 'R_GLCNtex': 'C00257 = C00257',
@@ -130,7 +181,9 @@ class TestSetUpThermoRxns(unittest.TestCase):
 
         rxn_dict = _convert_rxn_str_to_kegg_ids(self.rxn_list, mets_kegg_dic, mets_without_kegg_id)
 
-        self.assertDictEqual(true_res, rxn_dict)
+        self.assertDictEqual(true_res, {rxn_id: rxn.formula for rxn_id, rxn in rxn_dict.items()})
+        self.assertDictEqual({'C00027': -1, 'C00051': -2, 'C00127': 1, 'C00001': 2}, rxn_dict['R_GTHPi'].stoichiometry)
+        self.assertDictEqual({}, rxn_dict['R_GLCtex'].stoichiometry)
 
     def test_get_convert_rxns_to_kegg(self):
         true_res = {'R_GLCtex': 'C00031 = C00031', 'R_GLCabcpp': 'C00031 + C00002 + C00001 = C00031 + C00008 + C00009',
@@ -159,7 +212,7 @@ class TestSetUpThermoRxns(unittest.TestCase):
         with patch('builtins.input', side_effect=['']):
             rxn_dict = convert_rxns_to_kegg(self.rxn_list, map_bigg_to_kegg_ids)
 
-        self.assertDictEqual(true_res, rxn_dict)
+        self.assertDictEqual(true_res, {rxn_id: rxn.formula for rxn_id, rxn in rxn_dict.items()})
 
     def test_get_dGs(self):
         true_res = {'R_GLCtex': (0.0, 0.0), 'R_GLCabcpp': (-26.39, 0.31), 'R_GLK': (-17.27, 0.44),
@@ -179,6 +232,56 @@ class TestSetUpThermoRxns(unittest.TestCase):
             rxn_dG_dict = get_dGs(self.rxn_list, self.file_bigg_kegg_ids, pH=7.0, ionic_strength=0.1, digits=2)
         self.assertDictEqual(true_res, rxn_dG_dict)
 
+    def test_get_dGs_batched(self):
+        with patch('builtins.input', side_effect=['']):
+            true_res = get_dGs(self.rxn_list, self.file_bigg_kegg_ids, pH=7.0, ionic_strength=0.1, digits=2)
+
+        with patch('builtins.input', side_effect=['']):
+            rxn_dG_dict = get_dGs(self.rxn_list, self.file_bigg_kegg_ids, pH=7.0, ionic_strength=0.1, digits=2,
+                                  batched=True)
+        self.assertDictEqual(true_res, rxn_dG_dict)
+
+    def test_get_dGs_parallel(self):
+        with patch('builtins.input', side_effect=['']):
+            true_res = get_dGs(self.rxn_list, self.file_bigg_kegg_ids, pH=7.0, ionic_strength=0.1, digits=2)
+
+        with patch('builtins.input', side_effect=['']):
+            rxn_dG_dict, status_df = get_dGs(self.rxn_list, self.file_bigg_kegg_ids, pH=7.0, ionic_strength=0.1,
+                                             digits=2, workers=2, return_status=True)
+
+        self.assertListEqual(list(true_res.items()), list(rxn_dG_dict.items()))
+        self.assertListEqual(list(true_res.keys()), list(status_df.index))
+        self.assertListEqual(['balanced', 'status'], list(status_df.columns))
+        self.assertEqual('ok', status_df.loc['R_GLK', 'status'])
+
+    def test_get_dGs_with_covariance(self):
+        with patch('builtins.input', side_effect=['']):
+            true_res = get_dGs(self.rxn_list, self.file_bigg_kegg_ids, digits=2)
+
+        with patch('builtins.input', side_effect=['']):
+            rxn_ids, dG0s, dG0_cov = get_dGs_with_covariance(self.rxn_list, self.file_bigg_kegg_ids)
+
+        self.assertListEqual(list(true_res.keys()), rxn_ids)
+        self.assertTupleEqual((len(rxn_ids), len(rxn_ids)), dG0_cov.shape)
+        self.assertTrue(np.allclose(dG0_cov, dG0_cov.T))
+        self.assertListEqual(list(true_res.values()),
+                             [(round(dG0, 2), round(dG0_std, 2)) for dG0, dG0_std in
+                              zip(dG0s, np.sqrt(np.diag(dG0_cov)))])
+
+    def test_get_dGs_cache(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            dG_cache_file = os.path.join(tmp_dir, 'dG_cache.sqlite')
+
+            with patch('builtins.input', side_effect=['']):
+                true_res = get_dGs(self.rxn_list, self.file_bigg_kegg_ids, dG_cache_file=dG_cache_file)
+
+            # a warm run must not need eQuilibrator at all
+            with patch('builtins.input', side_effect=['']), \
+                    patch('equilibrator_api.ComponentContribution', side_effect=RuntimeError):
+                rxn_dG_dict = get_dGs(self.rxn_list, self.file_bigg_kegg_ids, dG_cache_file=dG_cache_file)
+
+        self.assertDictEqual(true_res, rxn_dG_dict)
+
     def test_set_up_thermo_rxns(self):
         true_res = pd.read_hdf(os.path.join(self.test_folder, 'true_res_thermo_rxns.h5'), key='df', mode='r')
 
@@ -225,4 +328,25 @@ class TestSetUpThermoRxns(unittest.TestCase):
         with patch('builtins.input', side_effect=['']):
             res = _set_up_model_thermo_rxns(self.base_df, rxns_order, rxn_list, use_equilibrator=True)
 
-        self.assertTrue(true_res.equals(res))
\ No newline at end of file
+        self.assertTrue(true_res.equals(res))
+
+    def test_set_up_thermo_rxns_sweep(self):
+        rxns_order = [rxn_str.split(':')[0] for rxn_str in self.rxn_list]
+        conditions = [(7.0, 0.1), (7.5, 0.25)]
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_out = os.path.join(tmp_dir, 'thermo_rxns.xlsx')
+
+            with patch('builtins.input', side_effect=['']):
+                res = set_up_thermo_rxns_sweep(self.base_df, rxns_order, self.rxn_list, conditions, file_out=file_out,
+                                               one_workbook=False)
+
+            self.assertListEqual(['thermo_rxns_pH7.0_I0.1.xlsx', 'thermo_rxns_pH7.5_I0.25.xlsx'],
+                                 sorted(os.listdir(tmp_dir)))
+
+        for pH, ionic_strength in conditions:
+            with patch('builtins.input', side_effect=['']):
+                true_res = _set_up_model_thermo_rxns(self.base_df, rxns_order, self.rxn_list, use_equilibrator=True,
+                                                     pH=pH, ionic_strength=ionic_strength)
+
+            pd.testing.assert_frame_equal(true_res, res[(pH, ionic_strength)], atol=0.05)
@@ -0,0 +1,109 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+from set_up_grasp_models.set_up_models.set_up_thermo_rxns import KeggReaction, get_dGs, get_dGs_sweep
+from set_up_grasp_models.set_up_models.thermo_backends import DGBackend, EquilibratorBackend, TableBackend
+
+
+class TestThermoBackends(unittest.TestCase):
+
+    def setUp(self):
+        this_dir, this_filename = os.path.split(__file__)
+        self.test_folder = os.path.join(this_dir, 'test_files', 'test_set_up_models', 'set_up_thermo_rxns')
+        self.file_bigg_kegg_ids = os.path.join(self.test_folder, 'map_bigg_to_kegg_ids.csv')
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+        # keep the read caches out of the user's cache folder
+        self.cache_home_patch = patch.dict('os.environ', {'XDG_CACHE_HOME': self.tmp_dir.name})
+        self.cache_home_patch.start()
+
+        self.rxn_list = ['R_GLK: m_glc__D_c + m_atp_c <-> m_adp_c + m_g6p_c', 'R_PGI: m_g6p_c <-> m_f6p_c',
+                         'R_FBA: m_g3p_c + m_dhap_c <-> m_fdp_c', 'R_TPI: m_g3p_c <-> m_dhap_c',
+                         'R_EX_g6p: m_g6p_c <-> m_g6p_e']
+
+        self.kegg_rxns = [KeggReaction('R_GLK', [('C00031', 1), ('C00002', 1)], [('C00008', 1), ('C00092', 1)]),
+                          KeggReaction('R_PGI', [('C00092', 1)], [('C00085', 1)]),
+                          KeggReaction('R_FBA', [('C00118', 1), ('C00111', 1)], [('C00354', 1)]),
+                          KeggReaction('R_TPI', [('C00118', 1)], [('C00111', 1)])]
+
+    def tearDown(self):
+        self.cache_home_patch.stop()
+        self.tmp_dir.cleanup()
+
+    def test_table_backend(self):
+        file_in = os.path.join(self.tmp_dir.name, 'dGs.csv')
+        pd.DataFrame({'reaction': ['R_GLK', 'C00085 = C00092', 'C00111 + C00118 = C00354'],
+                      'dG0': [-17.27, -2.52, -19.8], 'dG0_std': [0.44, 0.39, 0.54]}).to_csv(file_in, index=False)
+
+        dG_backend = TableBackend(file_in)
+        res = dG_backend.get_dGs(self.kegg_rxns, 7.0, 0.1)
+
+        self.assertListEqual([(-17.27, 0.44, True, 'ok'), (2.52, 0.39, True, 'ok'), (-19.8, 0.54, True, 'ok'),
+                              (None, None, True, 'not in table')], res)
+        self.assertTrue(dG_backend.version.startswith('table-'))
+
+        dG0s, dG0_cov, balanced_list, statuses = dG_backend.get_dGs_with_covariance(self.kegg_rxns, 7.0, 0.1)
+        self.assertTrue(np.allclose([-17.27, 2.52, -19.8, 0], dG0s))
+        self.assertTrue(np.allclose(np.diag([0.44 ** 2, 0.39 ** 2, 0.54 ** 2, 0]), dG0_cov))
+
+    def test_table_backend_conditions(self):
+        file_in = os.path.join(self.tmp_dir.name, 'dGs.csv')
+        pd.DataFrame({'reaction': ['R_PGI', 'R_PGI', 'R_TPI', 'R_TPI'], 'pH': [7.0, 7.5, 7.0, 7.5],
+                      'ionic_strength': [0.1, 0.1, 0.1, 0.1], 'dG0': [2.52, 2.6, -5.46, -5.5],
+                      'dG0_std': [0.39, 0.39, 0.56, 0.56]}).to_csv(file_in, index=False)
+
+        rxn_ids, dG0s, dG0_stds = get_dGs_sweep(self.rxn_list, self.file_bigg_kegg_ids, [(7.0, 0.1), (7.5, 0.1)],
+                                                kegg_id_resolution='first', dG_backend=TableBackend(file_in))
+
+        self.assertListEqual(['R_GLK', 'R_PGI', 'R_FBA', 'R_TPI'], rxn_ids)
+        self.assertTrue(np.allclose([[0, 2.52, 0, -5.46], [0, 2.6, 0, -5.5]], dG0s))
+        self.assertTrue(np.allclose([[0, 0.39, 0, 0.56], [0, 0.39, 0, 0.56]], dG0_stds))
+
+    def test_get_dGs_offline(self):
+        file_in = os.path.join(self.tmp_dir.name, 'dGs.csv')
+        pd.DataFrame({'reaction': ['R_GLK', 'R_PGI', 'R_FBA', 'R_TPI'], 'dG0': [-17.271, 2.52, -19.8, -5.46],
+                      'dG0_std': [0.44, 0.39, 0.54, 0.56]}).to_csv(file_in, index=False)
+
+        rxn_dG_dict = get_dGs(self.rxn_list, self.file_bigg_kegg_ids, kegg_id_resolution='first',
+                              dG_backend=TableBackend(file_in))
+
+        self.assertDictEqual({'R_GLK': (-17.27, 0.44), 'R_PGI': (2.52, 0.39), 'R_FBA': (-19.8, 0.54),
+                              'R_TPI': (-5.46, 0.56)}, rxn_dG_dict)
+
+        rxn_dG_dict = get_dGs(self.rxn_list, self.file_bigg_kegg_ids, kegg_id_resolution='first',
+                              dG_backend=TableBackend(file_in), workers=2)
+
+        self.assertDictEqual({'R_GLK': (-17.27, 0.44), 'R_PGI': (2.52, 0.39), 'R_FBA': (-19.8, 0.54),
+                              'R_TPI': (-5.46, 0.56)}, rxn_dG_dict)
+
+    @unittest.skipUnless(importlib.util.find_spec('equilibrator_api'), 'eQuilibrator is not installed')
+    def test_equilibrator_backend_sweep(self):
+        conditions = [(7.0, 0.1), (7.5, 0.25), (6.5, 0.05)]
+        dG_backend = EquilibratorBackend()
+
+        dG0s, dG0_stds, balanced_list, statuses = dG_backend.get_dGs_sweep(self.kegg_rxns, conditions)
+        true_dG0s, true_dG0_stds, true_balanced_list, true_statuses = DGBackend.get_dGs_sweep(dG_backend,
+                                                                                              self.kegg_rxns,
+                                                                                              conditions)
+
+        np.testing.assert_allclose(true_dG0s, dG0s, atol=1e-6)
+        np.testing.assert_allclose(true_dG0_stds, dG0_stds, atol=1e-6)
+        self.assertListEqual(true_balanced_list, balanced_list)
+        self.assertListEqual(true_statuses, statuses)
+
+        # without the eQuilibrator internals it falls back to one call per condition
+        get_eq_api = EquilibratorBackend._get_eq_api
+        eq_apis = iter([object()])
+        with patch.object(EquilibratorBackend, '_get_eq_api', autospec=True,
+                          side_effect=lambda self, pH, ionic_strength: next(eq_apis, None) or
+                          get_eq_api(self, pH, ionic_strength)):
+            fallback_dG0s, fallback_dG0_stds, _, _ = dG_backend.get_dGs_sweep(self.kegg_rxns, conditions)
+
+        np.testing.assert_allclose(true_dG0s, fallback_dG0s)
+        np.testing.assert_allclose(true_dG0_stds, fallback_dG0_stds)
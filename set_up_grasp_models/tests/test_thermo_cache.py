@@ -0,0 +1,56 @@
+import os
+import tempfile
+import unittest
+
+from set_up_grasp_models.set_up_models.thermo_cache import DGCache, get_canonical_kegg_rxn
+
+
+class TestThermoCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_file = os.path.join(self.tmp_dir.name, 'dG_cache.sqlite')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_get_canonical_kegg_rxn(self):
+        true_res = '-1 C00002 + 1 C00008 + 1 C00009 + -1 C00031'
+
+        self.assertEqual(true_res, get_canonical_kegg_rxn('C00031 + C00002 + C00001 = C00008 + C00009 + C00001'))
+        self.assertEqual(true_res, get_canonical_kegg_rxn('C00002 + C00031 = C00009 + C00008'))
+        self.assertEqual('-2 C00051 + 1 C00127', get_canonical_kegg_rxn('2 C00051 = C00127'))
+        self.assertEqual('1 C00001 + -0.5 C00007', get_canonical_kegg_rxn('0.5 C00007 = C00001'))
+
+    def test_get_and_put(self):
+        with DGCache(self.db_file) as dG_cache:
+            self.assertIsNone(dG_cache.get('-1 C00031 + 1 C00092', 7.0, 0.1, '0.2.6'))
+
+            dG_cache.put('-1 C00031 + 1 C00092', 7.0, 0.1, '0.2.6', -17.27, 0.44)
+            dG_cache.put('-1 C00031 + 1 C00092', 7.5, 0.1, '0.2.6', -18.1, 0.44)
+            dG_cache.put('-1 C00003 + 1 C00004', 7.0, 0.1, '0.2.6', None, None, False,
+                         'missing dissociation constants')
+
+            self.assertTupleEqual((-17.27, 0.44, True, 'ok'), dG_cache.get('-1 C00031 + 1 C00092', 7, 0.1, '0.2.6'))
+            self.assertIsNone(dG_cache.get('-1 C00031 + 1 C00092', 7.0, 0.1, '0.2.5'))
+            self.assertEqual(-18.1, dG_cache.get('-1 C00031 + 1 C00092', 7.5, 0.1, '0.2.6')[0])
+            self.assertEqual(2, dG_cache.hits)
+            self.assertEqual(2, dG_cache.misses)
+            self.assertEqual(3, len(dG_cache))
+
+        with DGCache(self.db_file) as dG_cache:
+            self.assertTupleEqual((None, None, False, 'missing dissociation constants'),
+                                  dG_cache.get('-1 C00003 + 1 C00004', 7.0, 0.1, '0.2.6'))
+            self.assertEqual(3, len(dG_cache))
+
+    def test_eviction(self):
+        with DGCache(self.db_file, max_entries=2) as dG_cache:
+            dG_cache.put('rxn1', 7.0, 0.1, '0.2.6', 1., 0.1)
+            dG_cache.put('rxn2', 7.0, 0.1, '0.2.6', 2., 0.1)
+            dG_cache.get('rxn1', 7.0, 0.1, '0.2.6')
+            dG_cache.put('rxn3', 7.0, 0.1, '0.2.6', 3., 0.1)
+
+            self.assertEqual(2, len(dG_cache))
+            self.assertIsNone(dG_cache.get('rxn2', 7.0, 0.1, '0.2.6'))
+            self.assertIsNotNone(dG_cache.get('rxn1', 7.0, 0.1, '0.2.6'))
+            self.assertIsNotNone(dG_cache.get('rxn3', 7.0, 0.1, '0.2.6'))
@@ -10,8 +10,10 @@ setuptools.setup(
     packages=setuptools.find_packages(),
     install_requires=["numpy",
                       "pandas",
+                      "scipy",
                       "XlsxWriter",
-                      "equilibrator-api==0.2.6"],
+                      "equilibrator-api==0.2.6",
+                      "importlib-metadata; python_version < '3.8'"],
     python_requires='>=3.6',
     classifiers=[
         "Programming Language :: Python :: 3.6+",